@@ -0,0 +1,49 @@
+"""
+Benchmark del costo de autenticación por petición: consultas y latencia de
+una petición condicional a un catálogo (304, sin serializar nada) con
+load_user consultando la tabla usuarios en cada petición (caché de
+identidades desactivada) y con la identidad en caché.
+
+Uso:
+    python benchmarks/bench_auth.py [--repeticiones 2000]
+"""
+import argparse
+
+from comun import cargar_app, crear_usuario_bench, cliente_autenticado, contar_consultas, medir
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--repeticiones', type=int, default=2000)
+    args = parser.parse_args()
+
+    app, db = cargar_app('auth')
+    import identidades
+
+    with app.app_context():
+        usuario_id = crear_usuario_bench(db)
+        engine = db.engine
+    cliente = cliente_autenticado(app, usuario_id)
+    ruta = '/api/catalogos/oficinas_regionales'
+    condicional = {'If-None-Match': cliente.get(ruta).headers['ETag']}
+
+    def peticion():
+        respuesta = cliente.get(ruta, headers=condicional)
+        assert respuesta.status_code == 304, respuesta.status_code
+
+    ttl = identidades.TTL_SEGUNDOS
+    print(f"{'load_user':<26} {'consultas/petición':>19} {'ms/petición':>12}")
+    for nombre, ttl_prueba in (('consulta a usuarios', 0), ('caché de identidades', ttl or 30)):
+        identidades.TTL_SEGUNDOS = ttl_prueba
+        identidades.invalidar()
+        peticion()
+        with contar_consultas(engine) as conteo:
+            for _ in range(100):
+                peticion()
+        ms = medir(peticion, repeticiones=args.repeticiones)
+        print(f"{nombre:<26} {conteo['consultas'] / 100:>19.2f} {ms:>12.3f}")
+    identidades.TTL_SEGUNDOS = ttl
+
+
+if __name__ == '__main__':
+    main()
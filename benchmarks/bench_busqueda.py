@@ -0,0 +1,79 @@
+"""
+Benchmark de /api/buscar.
+
+Genera acciones y reportes con datos_sinteticos (vocabulario con términos
+frecuentes y raros), y mide la latencia de búsquedas de uno y varios
+términos, con y sin filtros de faceta. Falla si el p95 de alguna supera el
+límite (100 ms por defecto).
+
+Uso:
+    python benchmarks/bench_busqueda.py --registros 500000
+    python benchmarks/bench_busqueda.py --reutilizar --limite-ms 100
+"""
+import argparse
+import statistics
+import sys
+import time
+
+from comun import cargar_app, cliente_autenticado, contar_consultas
+
+CONSULTAS = [
+    ('término raro', {'q': 'antorcha'}),
+    ('término con acento', {'q': 'válvula'}),
+    ('término sin acento', {'q': 'valvula'}),
+    ('dos términos', {'q': 'derrame laguna'}),
+    ('tres términos', {'q': 'bloqueo acceso pobladores'}),
+    ('prefijo', {'q': 'contamina'}),
+    ('con faceta región', {'q': 'derrame laguna', 'region': 'Sur'}),
+    ('solo reportes', {'q': 'indemnización pago', 'tipo': 'reporte'}),
+    ('segunda página', {'q': 'derrame laguna', 'pagina': 2}),
+]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--registros', type=int, default=200000, help='Acciones + reportes')
+    parser.add_argument('--repeticiones', type=int, default=30)
+    parser.add_argument('--limite-ms', type=float, default=100)
+    parser.add_argument('--reutilizar', action='store_true')
+    args = parser.parse_args()
+
+    app, db = cargar_app('busqueda', recrear=not args.reutilizar)
+    import datos_sinteticos
+    from models import DocumentoBusqueda
+
+    with app.app_context():
+        if not db.session.query(DocumentoBusqueda.id).first():
+            inicio = time.perf_counter()
+            datos_sinteticos.generar(acciones=args.registros // 2, reportes=args.registros // 2)
+            print(f"Datos e índice generados en {time.perf_counter() - inicio:.1f} s")
+        documentos = db.session.query(db.func.count(DocumentoBusqueda.id)).scalar()
+        usuario_id = datos_sinteticos.generar_usuarios()[0]
+        engine = db.engine
+
+    cliente = cliente_autenticado(app, usuario_id)
+    print(f"Documentos indexados: {documentos}")
+    print(f"{'consulta':<22} {'p50 ms':>8} {'p95 ms':>8} {'total':>8} {'consultas':>10}")
+
+    lentas = []
+    for nombre, parametros in CONSULTAS:
+        latencias = []
+        for _ in range(args.repeticiones):
+            with contar_consultas(engine) as conteo:
+                inicio = time.perf_counter()
+                datos = cliente.get('/api/buscar', query_string=parametros).get_json()
+                latencias.append((time.perf_counter() - inicio) * 1000)
+        p95 = statistics.quantiles(latencias, n=20)[18]
+        print(f"{nombre:<22} {statistics.median(latencias):>8.1f} {p95:>8.1f} {datos['total']:>8} "
+              f"{conteo['consultas']:>10}")
+        if p95 > args.limite_ms:
+            lentas.append(nombre)
+
+    if lentas:
+        print(f"✗ p95 arriba de {args.limite_ms:.0f} ms: {', '.join(lentas)}")
+        sys.exit(1)
+    print(f"✓ Todas las búsquedas con p95 menor a {args.limite_ms:.0f} ms")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,70 @@
+"""
+Benchmark de la caché de respuestas: latencia y consultas de /dashboard y
+del detalle de una acción sin caché (la entrada se descarta antes de cada
+petición) contra una entrada vigente, y costo de la primera petición
+después de una escritura que invalida la etiqueta.
+
+Uso:
+    python benchmarks/bench_cache.py --acciones 100000
+    python benchmarks/bench_cache.py --backend archivos --reutilizar
+"""
+import argparse
+import os
+from datetime import date
+
+from comun import cargar_app, crear_usuario_bench, cliente_autenticado, contar_consultas, medir, sembrar_acciones
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--acciones', type=int, default=100000)
+    parser.add_argument('--backend', default='memoria', choices=('memoria', 'archivos', 'redis'))
+    parser.add_argument('--repeticiones', type=int, default=20)
+    parser.add_argument('--reutilizar', action='store_true')
+    args = parser.parse_args()
+
+    os.environ['RESPUESTAS_CACHE'] = args.backend
+    app, db = cargar_app('cache', recrear=not args.reutilizar)
+    import cache_respuestas
+    from models import AccionPreventiva
+
+    with app.app_context():
+        usuario_id = crear_usuario_bench(db)
+        existentes = db.session.query(db.func.count(AccionPreventiva.id)).scalar()
+        sembrar_acciones(db, usuario_id, max(args.acciones - existentes, 0))
+        accion_id = db.session.query(db.func.max(AccionPreventiva.id)).scalar()
+        cliente = cliente_autenticado(app, usuario_id)
+        cache_respuestas.limpiar()
+
+        def sin_cache(ruta):
+            cache_respuestas.limpiar()
+            return cliente.get(ruta)
+
+        print(f"Backend: {args.backend}, acciones: {args.acciones}")
+        print(f"{'ruta':<22} {'sin caché ms':>13} {'consultas':>10} {'acierto ms':>11} {'consultas':>10}")
+        for ruta in ('/dashboard', f'/acciones/{accion_id}'):
+            with contar_consultas(db.engine) as fallo:
+                assert sin_cache(ruta).status_code == 200
+            with contar_consultas(db.engine) as acierto:
+                assert cliente.get(ruta).status_code == 200
+            ms_fallo = medir(lambda: sin_cache(ruta), repeticiones=args.repeticiones)
+            ms_acierto = medir(lambda: cliente.get(ruta), repeticiones=args.repeticiones)
+            print(f"{ruta:<22} {ms_fallo:>13.1f} {fallo['consultas']:>10} {ms_acierto:>11.1f} {acierto['consultas']:>10}")
+
+        # Una escritura invalida el detalle de la acción y el dashboard
+        hoy = date.today().isoformat()
+        respuesta = cliente.post('/api/seguimiento_accion/batch', json=[{
+            'accion_id': accion_id, 'fecha_seguimiento': hoy, 'estado_nuevo': 'En Proceso',
+            'porcentaje_avance': 50, 'responsable': 'Bench'}])
+        assert respuesta.get_json()['registrados'] == 1
+        with contar_consultas(db.engine) as invalidada:
+            cliente.get(f'/acciones/{accion_id}')
+        print(f"Primera petición después de registrar un seguimiento: {invalidada['consultas']} consultas")
+
+        total = cache_respuestas.estadisticas()['total']
+        print(f"Aciertos: {total['aciertos']}, fallos: {total['fallos']}, invalidadas: {total['invalidadas']}, "
+              f"tasa de aciertos: {total['tasa_aciertos']}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,81 @@
+"""
+Benchmark del cálculo de cumplimiento de compromisos.
+
+Compara el cálculo a partir del JSON (leer avances_mensuales de cada
+compromiso y hacer json.loads en Python) contra cumplimiento.calcular()
+sobre la tabla normalizada, completo e incremental después de modificar
+una fracción de los compromisos, y verifica que ambos lleguen al mismo
+estatus.
+
+Uso:
+    python benchmarks/bench_cumplimiento.py --reportes 100000
+    python benchmarks/bench_cumplimiento.py --reutilizar --modificados 1000
+"""
+import argparse
+import json
+import random
+import time
+
+from comun import cargar_app
+
+
+def _segundos(funcion):
+    inicio = time.perf_counter()
+    resultado = funcion()
+    return time.perf_counter() - inicio, resultado
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--reportes', type=int, default=100000)
+    parser.add_argument('--modificados', type=int, default=1000)
+    parser.add_argument('--reutilizar', action='store_true')
+    args = parser.parse_args()
+
+    app, db = cargar_app('cumplimiento', recrear=not args.reutilizar)
+    import cumplimiento
+    import datos_sinteticos
+    from models import SeguimientoCompromiso
+
+    with app.app_context():
+        if not db.session.query(SeguimientoCompromiso.id).first():
+            datos_sinteticos.generar(acciones=0, reportes=args.reportes)
+        estatus = cumplimiento._ids_estatus()
+
+        def desde_json():
+            calculado = {}
+            for seguimiento_id, texto, creado in db.session.query(
+                    SeguimientoCompromiso.id, SeguimientoCompromiso.avances_mensuales,
+                    SeguimientoCompromiso.fecha_creacion):
+                maximo = max((p for _, _, p in cumplimiento.parsear_avances(texto, creado.year)), default=0)
+                calculado[seguimiento_id] = estatus[2 if maximo >= 100 else 1 if maximo > 0 else 0]
+            return calculado
+
+        s_json, esperado = _segundos(desde_json)
+        s_completo, completo = _segundos(lambda: cumplimiento.calcular(completo=True))
+        s_vacio, _ = _segundos(cumplimiento.calcular)
+
+        rng = random.Random(18)
+        compromisos = SeguimientoCompromiso.query.filter(
+            SeguimientoCompromiso.id.in_(rng.sample(sorted(esperado), args.modificados))).all()
+        for compromiso in compromisos:
+            avances = {f'{m:02d}': rng.randrange(0, 101, 25) for m in range(1, 13)}
+            compromiso.avances_mensuales = json.dumps(avances)
+        db.session.commit()
+
+        s_incremental, incremental = _segundos(cumplimiento.calcular)
+        _, esperado = _segundos(desde_json)
+        actual = dict(db.session.query(SeguimientoCompromiso.id, SeguimientoCompromiso.estatus_cumplimiento_final_id))
+        assert actual == esperado, 'El estatus calculado no coincide con el cálculo desde el JSON'
+
+    print(f"Compromisos: {len(esperado)}")
+    print(f"Desde el JSON (json.loads por fila):  {s_json * 1000:9.1f} ms")
+    print(f"calcular(completo=True):              {s_completo * 1000:9.1f} ms ({completo['cambiados']} cambiados)")
+    print(f"calcular() sin pendientes:            {s_vacio * 1000:9.1f} ms")
+    print(f"calcular() con {args.modificados} modificados:      {s_incremental * 1000:9.1f} ms "
+          f"({incremental['calculados']} calculados, {incremental['cambiados']} cambiados)")
+    print('Estatus consistente con el cálculo desde el JSON ✓')
+
+
+if __name__ == '__main__':
+    main()
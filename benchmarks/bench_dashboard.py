@@ -0,0 +1,47 @@
+"""
+Benchmark de /dashboard: número de consultas y latencia por petición
+a distintos volúmenes de AccionPreventiva. Mide también
+/api/dashboard/summary completo y como petición condicional (If-None-Match
+con el ETag vigente), que debe responder 304 sin calcular los agregados.
+
+Uso:
+    python benchmarks/bench_dashboard.py [10000 100000 1000000]
+"""
+import sys
+
+from comun import cargar_app, crear_usuario_bench, cliente_autenticado, contar_consultas, medir, sembrar_acciones
+
+
+def main(escalas):
+    app, db = cargar_app('dashboard')
+    with app.app_context():
+        usuario_id = crear_usuario_bench(db)
+        cliente = cliente_autenticado(app, usuario_id)
+        sembradas = 0
+
+        print(f"{'filas':>10} {'consultas':>10} {'ms/petición':>12} {'summary ms':>11} "
+              f"{'304 consultas':>14} {'304 ms':>7}")
+        for escala in escalas:
+            sembrar_acciones(db, usuario_id, escala - sembradas)
+            sembradas = escala
+
+            with contar_consultas(db.engine) as conteo:
+                respuesta = cliente.get('/dashboard')
+            assert respuesta.status_code == 200, respuesta.status_code
+
+            ms = medir(lambda: cliente.get('/dashboard'), repeticiones=10)
+
+            etag = cliente.get('/api/dashboard/summary').headers['ETag']
+            ms_summary = medir(lambda: cliente.get('/api/dashboard/summary'), repeticiones=10)
+            condicional = {'If-None-Match': etag}
+            with contar_consultas(db.engine) as conteo_304:
+                respuesta = cliente.get('/api/dashboard/summary', headers=condicional)
+            assert respuesta.status_code == 304, respuesta.status_code
+            ms_304 = medir(lambda: cliente.get('/api/dashboard/summary', headers=condicional), repeticiones=10)
+
+            print(f"{escala:>10} {conteo['consultas']:>10} {ms:>12.1f} {ms_summary:>11.1f} "
+                  f"{conteo_304['consultas']:>14} {ms_304:>7.1f}")
+
+
+if __name__ == '__main__':
+    main([int(x) for x in sys.argv[1:]] or [10000, 100000, 1000000])
@@ -0,0 +1,141 @@
+"""
+Benchmark del almacén de documentos.
+
+Sube un archivo grande por partes (PUT /api/documentos/cargas/<id>) con un
+cuerpo generado al vuelo, de modo que ni el cliente ni el servidor lo tienen
+completo en memoria, y reporta el pico de memoria de Python (tracemalloc)
+contra el tamaño del archivo. Después vuelve a subir el mismo contenido para
+verificar la deduplicación (ni archivo ni fila nuevos) y mide la descarga
+completa, la de un rango (206) y la revalidación con If-None-Match (304).
+
+Uso:
+    python benchmarks/bench_documentos.py --mb 50
+"""
+import argparse
+import os
+import random
+import shutil
+import time
+import tracemalloc
+
+DIRECTORIO = '/tmp/pemex_documentos'
+
+
+class ParteGenerada:
+    """
+    Parte de `longitud` bytes leída de un generador pseudoaleatorio. tell y
+    seek solo existen porque el cliente de pruebas mide el flujo con ellos.
+    """
+
+    def __init__(self, aleatorio, longitud):
+        self.aleatorio = aleatorio
+        self.longitud = longitud
+        self.posicion = 0
+
+    def tell(self):
+        return self.posicion
+
+    def seek(self, desplazamiento, origen=0):
+        self.posicion = self.longitud + desplazamiento if origen == 2 else desplazamiento
+        return self.posicion
+
+    def read(self, n=-1):
+        restante = self.longitud - self.posicion
+        if n is None or n < 0 or n > restante:
+            n = restante
+        self.posicion += n
+        return self.aleatorio.randbytes(n)
+
+
+def _archivos(directorio):
+    return sum(len(archivos) for _, _, archivos in os.walk(directorio))
+
+
+def subir_por_partes(cliente, nombre, tamano, parte, semilla):
+    inicio = cliente.post('/api/documentos/cargas', json={'nombre': nombre, 'tamano': tamano}).get_json()
+    carga_id = inicio['carga']['id']
+    # Un solo generador para todas las partes, como el archivo que lee el cliente
+    aleatorio = random.Random(semilla)
+    for desplazamiento in range(0, tamano, parte):
+        longitud = min(parte, tamano - desplazamiento)
+        resp = cliente.put(f'/api/documentos/cargas/{carga_id}', input_stream=ParteGenerada(aleatorio, longitud),
+                           headers={
+                               'Content-Type': 'application/octet-stream',
+                               'Content-Range': f'bytes {desplazamiento}-{desplazamiento + longitud - 1}/{tamano}',
+                           })
+        assert resp.status_code == 200, resp.get_json()
+    return cliente.post(f'/api/documentos/cargas/{carga_id}/completar')
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--mb', type=int, default=50)
+    parser.add_argument('--repeticiones', type=int, default=20)
+    args = parser.parse_args()
+
+    shutil.rmtree(DIRECTORIO, ignore_errors=True)
+    os.environ['DOCUMENTOS_DIR'] = DIRECTORIO
+    os.environ.setdefault('DOCUMENTOS_MAX_MB', str(max(args.mb * 2, 100)))
+
+    from comun import cargar_app, crear_usuario_bench, cliente_autenticado, medir
+    app, db = cargar_app('documentos')
+    import documentos
+    from models import Documento
+
+    tamano = args.mb * 1024 * 1024
+    with app.app_context():
+        usuario_id = crear_usuario_bench(db)
+        cliente = cliente_autenticado(app, usuario_id)
+
+        tracemalloc.start()
+        inicio = time.perf_counter()
+        resp = subir_por_partes(cliente, 'registro.pdf', tamano, documentos.TAMANO_PARTE, semilla=1)
+        s_subida = time.perf_counter() - inicio
+        _, pico = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        assert resp.status_code == 201, resp.get_json()
+        documento = resp.get_json()['documento']
+        archivos = _archivos(DIRECTORIO)
+
+        inicio = time.perf_counter()
+        repetido = subir_por_partes(cliente, 'copia.pdf', tamano, documentos.TAMANO_PARTE, semilla=1)
+        s_repetido = time.perf_counter() - inicio
+        assert repetido.status_code == 200 and repetido.get_json()['duplicado']
+        assert repetido.get_json()['documento']['sha256'] == documento['sha256']
+        assert _archivos(DIRECTORIO) == archivos, 'La carga repetida dejó archivos nuevos'
+        assert db.session.query(db.func.count(Documento.id)).scalar() == 1
+
+        url = f"/api/documentos/{documento['sha256']}"
+        completo = cliente.get(url)
+        etag = completo.headers['ETag']
+        assert len(completo.data) == tamano
+        completo.close()
+
+        rango = cliente.get(url, headers={'Range': 'bytes=1048576-2097151'})
+        assert rango.status_code == 206 and len(rango.data) == 1024 * 1024
+        rango.close()
+        revalidacion = cliente.get(url, headers={'If-None-Match': etag})
+        assert revalidacion.status_code == 304
+
+        def descargar(**kwargs):
+            resp = cliente.get(url, **kwargs)
+            resp.data
+            resp.close()
+
+        ms_completo = medir(descargar, repeticiones=max(args.repeticiones // 4, 1))
+        ms_rango = medir(lambda: descargar(headers={'Range': 'bytes=1048576-2097151'}),
+                         repeticiones=args.repeticiones)
+        ms_304 = medir(lambda: descargar(headers={'If-None-Match': etag}), repeticiones=args.repeticiones)
+
+    mb = tamano / (1024 * 1024)
+    print(f"Archivo: {mb:.0f} MB en partes de {documentos.TAMANO_PARTE // (1024 * 1024)} MB")
+    print(f"Subida por partes:       {s_subida:7.2f} s ({mb / s_subida:.0f} MB/s), "
+          f"pico de memoria {pico / (1024 * 1024):.1f} MB")
+    print(f"Misma subida (dedup):    {s_repetido:7.2f} s, archivos en disco: {archivos}, documentos: 1")
+    print(f"Descarga completa:       {ms_completo:7.1f} ms")
+    print(f"Rango de 1 MB (206):     {ms_rango:7.1f} ms")
+    print(f"If-None-Match (304):     {ms_304:7.1f} ms")
+
+
+if __name__ == '__main__':
+    main()
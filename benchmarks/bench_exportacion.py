@@ -0,0 +1,64 @@
+"""
+Benchmark de /api/acciones/export: filas por segundo y memoria pico (RSS).
+
+La siembra y cada medición corren en procesos aparte porque el RSS pico de un
+proceso nunca baja; así se compara la memoria de exportar 1k contra la de
+exportar 2M filas sin que la siembra la contamine.
+
+Uso:
+    python benchmarks/bench_exportacion.py [1000 100000 2000000] [--formato xlsx]
+"""
+import os
+import resource
+import subprocess
+import sys
+import time
+
+from comun import cargar_app, crear_usuario_bench, cliente_autenticado, sembrar_acciones
+
+
+def _sembrar(escala):
+    app, db = cargar_app(f'exportacion_{escala}')
+    with app.app_context():
+        sembrar_acciones(db, crear_usuario_bench(db), escala)
+
+
+def _medir(escala, formato):
+    app, db = cargar_app(f'exportacion_{escala}', recrear=False)
+    with app.app_context():
+        usuario_id = crear_usuario_bench(db)
+    cliente = cliente_autenticado(app, usuario_id)
+
+    rss_inicial = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    inicio = time.perf_counter()
+    respuesta = cliente.get('/api/acciones/export', query_string={'formato': formato}, buffered=False)
+    total_bytes = sum(len(bloque) for bloque in respuesta.response)
+    segundos = time.perf_counter() - inicio
+    rss_pico = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+    print(f"{escala:>10} {escala / segundos:>12.0f} {total_bytes / 1e6:>10.1f} "
+          f"{rss_inicial / 1024:>12.1f} {rss_pico / 1024:>10.1f}")
+
+
+def main(escalas, formato):
+    print(f"{'filas':>10} {'filas/s':>12} {'MB salida':>10} {'RSS base MB':>12} {'RSS pico':>10}")
+    for escala in escalas:
+        subprocess.run([sys.executable, os.path.abspath(__file__), '--sembrar', str(escala)], check=True)
+        subprocess.run([sys.executable, os.path.abspath(__file__), '--escala', str(escala),
+                        '--formato', formato], check=True)
+
+
+if __name__ == '__main__':
+    argumentos = sys.argv[1:]
+    formato = 'csv'
+    if '--formato' in argumentos:
+        i = argumentos.index('--formato')
+        formato = argumentos[i + 1]
+        del argumentos[i:i + 2]
+
+    if argumentos[:1] == ['--sembrar']:
+        _sembrar(int(argumentos[1]))
+    elif argumentos[:1] == ['--escala']:
+        _medir(int(argumentos[1]), formato)
+    else:
+        main([int(x) for x in argumentos] or [1000, 100000, 2000000], formato)
@@ -0,0 +1,84 @@
+"""
+Benchmark de las consultas geoespaciales de acciones.
+
+Genera acciones con datos_sinteticos (coordenadas repartidas en el
+territorio nacional) y mide, con el cliente de pruebas, la latencia de
+/api/acciones/area, /api/acciones/cercanas y /api/acciones/mapa a distintos
+tamaños de rectángulo, radio y zoom. Como referencia mide también el mismo
+rectángulo filtrado directamente sobre coordenadas_x/coordenadas_y, que no
+tienen índice.
+
+Uso:
+    python benchmarks/bench_geoespacial.py --acciones 500000
+    python benchmarks/bench_geoespacial.py --reutilizar
+"""
+import argparse
+import statistics
+import time
+
+from comun import cargar_app, cliente_autenticado, contar_consultas
+
+CONSULTAS = [
+    ('área ciudad', '/api/acciones/area', {'oeste': -99.3, 'sur': 19.2, 'este': -98.9, 'norte': 19.6}),
+    ('área estado', '/api/acciones/area', {'oeste': -94.2, 'sur': 17.2, 'este': -90.9, 'norte': 18.7}),
+    ('área país', '/api/acciones/area', {'oeste': -118, 'sur': 14, 'este': -86, 'norte': 33}),
+    ('radio 10 km', '/api/acciones/cercanas', {'x': -93.2, 'y': 18.4, 'radio_km': 10}),
+    ('radio 100 km', '/api/acciones/cercanas', {'x': -93.2, 'y': 18.4, 'radio_km': 100}),
+    ('mapa zoom 5', '/api/acciones/mapa', {'zoom': 5}),
+    ('mapa zoom 7 región', '/api/acciones/mapa', {'zoom': 7, 'oeste': -100, 'sur': 16, 'este': -90, 'norte': 22}),
+    ('mapa zoom 11 ciudad', '/api/acciones/mapa', {'zoom': 11, 'oeste': -99.3, 'sur': 19.2, 'este': -98.9, 'norte': 19.6}),
+]
+
+
+def _medir(funcion, repeticiones):
+    latencias = []
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        resultado = funcion()
+        latencias.append((time.perf_counter() - inicio) * 1000)
+    return statistics.median(latencias), statistics.quantiles(latencias, n=20)[18], resultado
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--acciones', type=int, default=500000)
+    parser.add_argument('--repeticiones', type=int, default=20)
+    parser.add_argument('--reutilizar', action='store_true')
+    args = parser.parse_args()
+
+    app, db = cargar_app('geoespacial', recrear=not args.reutilizar)
+    import datos_sinteticos
+    from models import AccionPreventiva, UbicacionAccion
+
+    with app.app_context():
+        if not db.session.query(AccionPreventiva.id).first():
+            inicio = time.perf_counter()
+            datos_sinteticos.generar(acciones=args.acciones, reportes=0)
+            print(f"Datos e índices generados en {time.perf_counter() - inicio:.1f} s")
+        ubicaciones = db.session.query(db.func.count(UbicacionAccion.accion_id)).scalar()
+        usuario_id = datos_sinteticos.generar_usuarios()[0]
+        engine = db.engine
+
+        # Referencia: el rectángulo del estado sobre las columnas sin índice
+        rectangulo = dict(CONSULTAS[1][2])
+        p50, p95, filas = _medir(lambda: db.session.query(AccionPreventiva.id).filter(
+            AccionPreventiva.coordenadas_x.between(rectangulo['oeste'], rectangulo['este']),
+            AccionPreventiva.coordenadas_y.between(rectangulo['sur'], rectangulo['norte'])
+        ).all(), 5)
+
+    cliente = cliente_autenticado(app, usuario_id)
+    print(f"Acciones con ubicación: {ubicaciones}")
+    print(f"Referencia sin índice (área estado, {len(filas)} filas): p50 {p50:.1f} ms, p95 {p95:.1f} ms")
+    print(f"{'consulta':<22} {'p50 ms':>8} {'p95 ms':>8} {'filas':>8} {'consultas':>10}")
+
+    for nombre, ruta, parametros in CONSULTAS:
+        cliente.get(ruta, query_string=parametros)  # calentamiento
+        with contar_consultas(engine) as conteo:
+            p50, p95, datos = _medir(lambda: cliente.get(ruta, query_string=parametros).get_json(),
+                                     args.repeticiones)
+        filas = len(datos.get('acciones', datos.get('grupos', [])))
+        print(f"{nombre:<22} {p50:>8.1f} {p95:>8.1f} {filas:>8} {conteo['consultas'] // args.repeticiones:>10}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,115 @@
+"""
+Benchmark de la importación masiva (importacion.py).
+
+Genera un CSV de acciones con el formato de exportación (con un porcentaje de
+filas inválidas), lo importa midiendo el tiempo, simula una interrupción a la
+mitad para comprobar que el checkpoint reanuda sin duplicar, y verifica que
+el resumen mensual coincide con una reconstrucción completa.
+
+Uso:
+    python benchmarks/bench_importacion.py [--filas 100000] [--lote 1000]
+"""
+import argparse
+import csv
+import os
+import sys
+import time
+from datetime import date, timedelta
+
+from comun import cargar_app, crear_usuario_bench, ESTADOS_ACCION, NIVELES_IMPACTO, REGIONES
+
+RUTA_CSV = '/tmp/pemex_importacion.csv'
+
+
+class Interrupcion(Exception):
+    pass
+
+
+def generar_csv(total, cada_invalida=50):
+    """Escribe el CSV y regresa cuántas filas deberían rechazarse"""
+    import exportacion
+
+    hoy = date.today()
+    invalidas = 0
+    with open(RUTA_CSV, 'w', newline='', encoding='utf-8-sig') as archivo:
+        escritor = csv.writer(archivo)
+        escritor.writerow([encabezado for encabezado, _ in exportacion.COLUMNAS_ACCIONES])
+        for i in range(total):
+            fecha = hoy - timedelta(days=i % 1095)
+            fecha_registro = fecha.strftime('%d/%m/%Y')
+            if i % cada_invalida == 0:
+                fecha_registro = '31/02/2024'
+                invalidas += 1
+            escritor.writerow([
+                '', 'Bench', REGIONES[i % len(REGIONES)], fecha.year, '', fecha_registro,
+                'Tabasco', 'Centro', 'Villahermosa', 'Activo Bench', 'Instalación Bench', 'Social',
+                'Descripción histórica', 'Comunidad', NIVELES_IMPACTO[i % len(NIVELES_IMPACTO)],
+                'Acción histórica', fecha.strftime('%d/%m/%Y'), (fecha + timedelta(days=90)).strftime('%d/%m/%Y'),
+                '15000.50', 'Responsable Bench', 'Área Bench', '', ESTADOS_ACCION[i % len(ESTADOS_ACCION)],
+                i % 101, '',
+            ])
+    return invalidas
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--filas', type=int, default=100000)
+    parser.add_argument('--lote', type=int, default=1000)
+    args = parser.parse_args()
+
+    app, db = cargar_app('importacion')
+    import importacion
+    import resumen_mensual
+    from models import AccionPreventiva, ResumenMensualAccion
+
+    with app.app_context():
+        usuario_id = crear_usuario_bench(db)
+
+        invalidas = generar_csv(args.filas)
+        if os.path.exists(importacion.ruta_checkpoint(RUTA_CSV)):
+            os.remove(importacion.ruta_checkpoint(RUTA_CSV))
+
+        # Primer intento: se interrumpe al pasar la mitad del archivo
+        def _interrumpir(fila):
+            if fila > args.filas // 2:
+                raise Interrupcion()
+
+        inicio = time.perf_counter()
+        try:
+            importacion.importar(RUTA_CSV, 'acciones', usuario_id, lote=args.lote, progreso=_interrumpir)
+        except Interrupcion:
+            pass
+        parciales = db.session.query(db.func.count(AccionPreventiva.id)).scalar()
+
+        resultado = importacion.importar(RUTA_CSV, 'acciones', usuario_id, lote=args.lote)
+        segundos = time.perf_counter() - inicio
+
+        total = db.session.query(db.func.count(AccionPreventiva.id)).scalar()
+        en_resumen = db.session.query(db.func.sum(ResumenMensualAccion.total)).scalar()
+        resumen_mensual.reconstruir_resumen()
+        db.session.commit()
+        reconstruido = db.session.query(db.func.sum(ResumenMensualAccion.total)).scalar()
+
+    print(f"Filas en el archivo:   {args.filas}")
+    print(f"Insertadas antes del corte: {parciales}")
+    print(f"Insertadas en total:   {total} ({resultado['rechazadas']} rechazadas)")
+    print(f"Tiempo total:          {segundos:.1f} s ({args.filas / segundos:,.0f} filas/s)")
+
+    esperadas = args.filas - invalidas
+    fallas = []
+    if total != esperadas or resultado['insertadas'] != esperadas:
+        fallas.append(f'se esperaban {esperadas} filas insertadas')
+    if resultado['rechazadas'] != invalidas:
+        fallas.append(f'se esperaban {invalidas} filas rechazadas')
+    if en_resumen != reconstruido:
+        fallas.append(f'resumen mensual incremental ({en_resumen}) != reconstruido ({reconstruido})')
+
+    for falla in fallas:
+        print(f"✗ {falla}")
+    if fallas:
+        sys.exit(1)
+    print("✓ Importación reanudada sin duplicados y resumen mensual consistente")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,79 @@
+"""
+Benchmark de inicios de sesión simultáneos (cambio de turno).
+
+Crea capturistas con un hash de parámetros viejos y lanza todos sus
+POST /login desde varios hilos: la primera oleada valida y regenera cada
+hash con la política vigente (rehash), la segunda solo valida. Reporta
+inicios de sesión por segundo y por núcleo para cada política.
+
+Uso:
+    python benchmarks/bench_login.py --usuarios 200 --concurrencia 32
+    python benchmarks/bench_login.py --politicas scrypt:16384 pbkdf2:sha256:600000
+"""
+import argparse
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from werkzeug.security import generate_password_hash
+
+from comun import cargar_app
+
+PASSWORD = 'turno-bench'
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--usuarios', type=int, default=200)
+    parser.add_argument('--concurrencia', type=int, default=32)
+    parser.add_argument('--politicas', nargs='+', default=['scrypt:32768', 'scrypt:16384', 'pbkdf2:sha256:600000'],
+                        help='algoritmo:costo, p. ej. scrypt:32768 o pbkdf2:sha256:600000')
+    args = parser.parse_args()
+
+    app, db = cargar_app('login')
+    import contrasenas
+    from models import Usuario
+
+    hash_viejo = generate_password_hash(PASSWORD, method='pbkdf2:sha256:1000')
+    with app.app_context():
+        db.session.execute(Usuario.__table__.insert(), [{
+            'username': f'turno_{i:04d}', 'email': f'turno_{i:04d}@ejemplo.local', 'nombre': 'Turno',
+            'apellido_paterno': 'Bench', 'password_hash': hash_viejo, 'rol': 'Capturista', 'activo': True,
+        } for i in range(args.usuarios)])
+        db.session.commit()
+
+    def iniciar_sesion(i):
+        respuesta = app.test_client().post('/login', data={'username': f'turno_{i:04d}', 'password': PASSWORD})
+        return respuesta.status_code
+
+    def oleada():
+        inicio = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=args.concurrencia) as pool:
+            codigos = list(pool.map(iniciar_sesion, range(args.usuarios)))
+        segundos = time.perf_counter() - inicio
+        assert all(c == 302 for c in codigos), sorted(set(codigos))
+        return args.usuarios / segundos
+
+    nucleos = len(os.sched_getaffinity(0)) if hasattr(os, 'sched_getaffinity') else os.cpu_count()
+    print(f"Usuarios: {args.usuarios}, concurrencia: {args.concurrencia}, núcleos: {nucleos}, "
+          f"hilos de hash: {contrasenas._config['hilos']}")
+    print(f"{'política':<24} {'con rehash/s':>13} {'/s/núcleo':>10} {'login/s':>9} {'/s/núcleo':>10}")
+    for politica in args.politicas:
+        algoritmo, _, costo = politica.rpartition(':')
+        metodo = contrasenas.configurar(algoritmo, int(costo))
+        with app.app_context():
+            db.session.execute(Usuario.__table__.update().where(Usuario.username.like('turno_%'))
+                               .values(password_hash=hash_viejo))
+            db.session.commit()
+
+        con_rehash = oleada()
+        with app.app_context():
+            regenerados = db.session.query(Usuario).filter(Usuario.username.like('turno_%'),
+                                                           Usuario.password_hash.like(f'{metodo}$%')).count()
+        assert regenerados == args.usuarios, f'{regenerados} hashes regenerados de {args.usuarios}'
+        estable = oleada()
+        print(f"{metodo:<24} {con_rehash:>13.1f} {con_rehash / nucleos:>10.1f} {estable:>9.1f} {estable / nucleos:>10.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,92 @@
+"""
+Prueba de carga del pool de conexiones.
+
+Lanza N hilos (como los workers gthread de gunicorn dentro de un proceso) que
+piden rutas de lectura de app.py durante unos segundos, y reporta el
+throughput, la latencia y lo que reporta el pool (espera por conexión,
+overflow alcanzado, conexiones agotadas) para cada número de hilos. Al correr
+en un solo proceso el throughput lo limita el GIL; lo que interesa es cómo
+crecen la espera por conexión y la latencia según el tamaño del pool.
+
+Los parámetros del pool se toman del entorno (DB_POOL_SIZE, DB_MAX_OVERFLOW,
+DB_POOL_TIMEOUT...), así que se pueden comparar configuraciones:
+
+    python benchmarks/bench_pool.py --hilos 1 2 4 8 16 32
+    DB_POOL_SIZE=2 DB_MAX_OVERFLOW=0 python benchmarks/bench_pool.py
+    BENCH_DATABASE_URL=mysql+mysqlconnector://... DB_DRIVER=mysqlclient python benchmarks/bench_pool.py
+"""
+import argparse
+import statistics
+import threading
+import time
+
+from comun import cargar_app, crear_usuario_bench, cliente_autenticado, sembrar_acciones
+
+RUTAS = ['/api/acciones', '/api/acciones?estado_accion=En Proceso', '/api/catalogos/oficinas_regionales']
+
+
+def _worker(app, usuario_id, fin, latencias, errores):
+    cliente = cliente_autenticado(app, usuario_id)
+    i = 0
+    while time.perf_counter() < fin:
+        inicio = time.perf_counter()
+        respuesta = cliente.get(RUTAS[i % len(RUTAS)])
+        latencias.append(time.perf_counter() - inicio)
+        if respuesta.status_code >= 400:
+            errores.append(respuesta.status_code)
+        i += 1
+
+
+def _reiniciar_metricas(pool):
+    with pool._lock_metricas:
+        pool.solicitudes = 0
+        pool.espera_total = 0.0
+        pool.espera_maxima = 0.0
+        pool.agotado = 0
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--hilos', type=int, nargs='+', default=[1, 2, 4, 8, 16, 32])
+    parser.add_argument('--segundos', type=float, default=5)
+    parser.add_argument('--acciones', type=int, default=20000)
+    args = parser.parse_args()
+
+    app, db = cargar_app('pool')
+    import conexiones
+
+    with app.app_context():
+        usuario_id = crear_usuario_bench(db)
+        sembrar_acciones(db, usuario_id, args.acciones)
+        engine = db.engine
+
+    print(f"Pool: {conexiones.metricas(engine)}")
+    print(f"{'hilos':>5} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'espera ms':>10} "
+          f"{'espera máx':>10} {'overflow':>8} {'agotado':>7} {'errores':>7}")
+
+    for hilos in args.hilos:
+        if isinstance(engine.pool, conexiones.QueuePoolMedido):
+            _reiniciar_metricas(engine.pool)
+        latencias, errores, overflow = [], [], [0]
+        fin = time.perf_counter() + args.segundos
+        trabajadores = [threading.Thread(target=_worker, args=(app, usuario_id, fin, latencias, errores))
+                        for _ in range(hilos)]
+
+        inicio = time.perf_counter()
+        for t in trabajadores:
+            t.start()
+        while any(t.is_alive() for t in trabajadores):
+            overflow[0] = max(overflow[0], engine.pool.overflow() if hasattr(engine.pool, 'overflow') else 0)
+            time.sleep(0.05)
+        duracion = time.perf_counter() - inicio
+
+        datos = conexiones.metricas(engine)
+        cuantiles = statistics.quantiles(latencias, n=100) if len(latencias) > 1 else [0] * 99
+        print(f"{hilos:>5} {len(latencias) / duracion:>8.0f} {cuantiles[49] * 1000:>8.1f} "
+              f"{cuantiles[94] * 1000:>8.1f} {datos.get('espera_promedio_ms', 0):>10.3f} "
+              f"{datos.get('espera_maxima_ms', 0):>10.1f} {overflow[0]:>8} {datos.get('agotado', 0):>7} "
+              f"{len(errores):>7}")
+
+
+if __name__ == '__main__':
+    main()
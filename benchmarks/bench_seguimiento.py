@@ -0,0 +1,86 @@
+"""
+Benchmark del registro de seguimientos por lotes.
+
+Simula la ronda mensual de avance: un supervisor actualiza N acciones. Mide
+N peticiones a /api/seguimiento_accion contra una sola petición a
+/api/seguimiento_accion/batch con los mismos N elementos, contando las
+sentencias SQL de cada variante, y verifica que el resumen mensual quede
+igual que si se reconstruyera desde cero.
+
+Uso:
+    python benchmarks/bench_seguimiento.py --acciones 20000 --lote 50
+"""
+import argparse
+import random
+import time
+from datetime import date
+
+from comun import cargar_app, cliente_autenticado, contar_consultas
+
+ESTADOS = ['Registrado', 'En Proceso', 'Completado']
+
+
+def _elementos(ids, rng):
+    return [{
+        'accion_id': accion_id,
+        'fecha_seguimiento': date.today().isoformat(),
+        'estado_nuevo': rng.choice(ESTADOS),
+        'porcentaje_avance': rng.randint(0, 100),
+        'observaciones': 'Ronda mensual',
+        'responsable': 'Supervisor'
+    } for accion_id in ids]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--acciones', type=int, default=20000)
+    parser.add_argument('--lote', type=int, default=50)
+    parser.add_argument('--reutilizar', action='store_true')
+    args = parser.parse_args()
+
+    app, db = cargar_app('seguimiento', recrear=not args.reutilizar)
+    import datos_sinteticos
+    import resumen_mensual
+    from models import AccionPreventiva, ResumenMensualAccion
+
+    with app.app_context():
+        if not db.session.query(AccionPreventiva.id).first():
+            datos_sinteticos.generar(acciones=args.acciones, reportes=0)
+        usuario_id = datos_sinteticos.generar_usuarios()[0]
+        ids = [fila.id for fila in db.session.query(AccionPreventiva.id).limit(args.lote * 2)]
+        engine = db.engine
+
+    rng = random.Random(17)
+    cliente = cliente_autenticado(app, usuario_id)
+
+    individuales = _elementos(ids[:args.lote], rng)
+    with contar_consultas(engine) as conteo_individual:
+        inicio = time.perf_counter()
+        for elemento in individuales:
+            assert cliente.post('/api/seguimiento_accion', data=elemento).get_json()['success']
+        ms_individual = (time.perf_counter() - inicio) * 1000
+
+    lote = _elementos(ids[args.lote:], rng)
+    with contar_consultas(engine) as conteo_lote:
+        inicio = time.perf_counter()
+        respuesta = cliente.post('/api/seguimiento_accion/batch', json={'seguimientos': lote}).get_json()
+        ms_lote = (time.perf_counter() - inicio) * 1000
+    assert respuesta['registrados'] == len(lote), respuesta
+
+    print(f"{args.lote} peticiones individuales: {ms_individual:8.1f} ms, {conteo_individual['consultas']} consultas")
+    print(f"1 petición por lotes:       {ms_lote:8.1f} ms, {conteo_lote['consultas']} consultas")
+
+    with app.app_context():
+        resumen = lambda: sorted(tuple(fila) for fila in db.session.query(
+            ResumenMensualAccion.anio, ResumenMensualAccion.mes, ResumenMensualAccion.region,
+            ResumenMensualAccion.estado_accion, ResumenMensualAccion.nivel_impacto,
+            ResumenMensualAccion.total).filter(ResumenMensualAccion.total != 0))
+        incremental = resumen()
+        resumen_mensual.reconstruir_resumen()
+        db.session.commit()
+        assert incremental == resumen(), 'El resumen incremental no coincide con la reconstrucción'
+    print('Resumen mensual consistente con la reconstrucción ✓')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,80 @@
+"""
+Benchmark de "todos los reportes con el tipo de atención X".
+
+Compara recorrer los reportes haciendo json.loads de la columna
+tipos_atencion contra la consulta sobre el índice
+(tipo_atencion_id, reporte_id) de reporte_tipo_atencion, verifica que ambas
+regresen los mismos reportes y mide la migración desde el JSON y la primera
+página de /api/reportes/tipo_atencion/<id>.
+
+Uso:
+    python benchmarks/bench_tipos_atencion.py --reportes 100000
+    python benchmarks/bench_tipos_atencion.py --reutilizar
+"""
+import argparse
+import json
+import time
+
+from comun import cargar_app, crear_usuario_bench, cliente_autenticado, contar_consultas, medir
+
+
+def _segundos(funcion):
+    inicio = time.perf_counter()
+    resultado = funcion()
+    return time.perf_counter() - inicio, resultado
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--reportes', type=int, default=100000)
+    parser.add_argument('--repeticiones', type=int, default=5)
+    parser.add_argument('--reutilizar', action='store_true')
+    args = parser.parse_args()
+
+    app, db = cargar_app('tipos_atencion', recrear=not args.reutilizar)
+    import datos_sinteticos
+    import tipos_atencion
+    from models import ReporteAccionPreventiva, ReporteTipoAtencion, TipoAtencion
+
+    with app.app_context():
+        if not db.session.query(ReporteAccionPreventiva.id).first():
+            datos_sinteticos.generar(acciones=0, reportes=args.reportes)
+        usuario_id = crear_usuario_bench(db)
+        tipo_id = db.session.query(TipoAtencion.id).order_by(TipoAtencion.id).first()[0]
+        total = db.session.query(db.func.count(ReporteAccionPreventiva.id)).scalar()
+
+        def escaneo():
+            return sorted(reporte_id for reporte_id, texto in db.session.query(
+                ReporteAccionPreventiva.id, ReporteAccionPreventiva.tipos_atencion)
+                if tipo_id in json.loads(texto or '[]'))
+
+        def indice():
+            return sorted(r for (r,) in db.session.query(ReporteTipoAtencion.reporte_id)
+                          .filter(ReporteTipoAtencion.tipo_atencion_id == tipo_id))
+
+        esperado, obtenido = escaneo(), indice()
+        assert esperado == obtenido, 'La tabla de relación no coincide con el JSON'
+        ms_escaneo = medir(escaneo, repeticiones=args.repeticiones)
+        ms_indice = medir(indice, repeticiones=args.repeticiones)
+
+        db.session.query(ReporteTipoAtencion).delete()
+        db.session.commit()
+        s_migracion, migradas = _segundos(tipos_atencion.migrar)
+        assert indice() == esperado, 'La migración no reproduce el JSON'
+
+        cliente = cliente_autenticado(app, usuario_id)
+        ruta = f'/api/reportes/tipo_atencion/{tipo_id}'
+        with contar_consultas(db.engine) as conteo:
+            pagina = cliente.get(ruta).get_json()
+        assert pagina['success']
+        ms_api = medir(lambda: cliente.get(ruta), repeticiones=args.repeticiones * 4)
+
+    print(f"Reportes: {total}, con el tipo {tipo_id}: {len(esperado)}")
+    print(f"Recorrido + json.loads:         {ms_escaneo:9.1f} ms")
+    print(f"Índice (tipo_atencion_id, ...): {ms_indice:9.1f} ms ({ms_escaneo / ms_indice:.0f}x)")
+    print(f"migrar():                       {s_migracion * 1000:9.1f} ms ({migradas} filas)")
+    print(f"API, primera página:            {ms_api:9.1f} ms ({conteo['consultas']} consultas)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,81 @@
+"""
+Benchmark de la cola de trabajos en segundo plano.
+
+Compara lo que tarda en responder /api/acciones/export encolando el trabajo
+contra la exportación en la misma petición (?sincrono=1), mide la latencia
+de /api/acciones (lo que usa un capturista) mientras el trabajador exporta y
+el tiempo que tarda el trabajador en vaciar la cola con hilos y con
+procesos.
+
+Uso:
+    python benchmarks/bench_trabajos.py --acciones 100000
+    python benchmarks/bench_trabajos.py --reutilizar --trabajos 8
+"""
+import argparse
+import statistics
+import threading
+import time
+
+from comun import cargar_app, cliente_autenticado
+
+
+def _ms(funcion):
+    inicio = time.perf_counter()
+    resultado = funcion()
+    return (time.perf_counter() - inicio) * 1000, resultado
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--acciones', type=int, default=100000)
+    parser.add_argument('--trabajos', type=int, default=4, help='Exportaciones encoladas por corrida')
+    parser.add_argument('--reutilizar', action='store_true')
+    args = parser.parse_args()
+
+    app, db = cargar_app('trabajos', recrear=not args.reutilizar)
+    app.config['EXPORTACIONES_DIR'] = '/tmp/pemex_bench_exportaciones'
+    import datos_sinteticos
+    import trabajos
+    from models import AccionPreventiva, Trabajo
+
+    with app.app_context():
+        if not db.session.query(AccionPreventiva.id).first():
+            datos_sinteticos.generar(acciones=args.acciones, reportes=0)
+        usuario_id = datos_sinteticos.generar_usuarios()[0]
+        db.session.query(Trabajo).delete()
+        db.session.commit()
+
+    cliente = cliente_autenticado(app, usuario_id)
+
+    sincrono, respuesta = _ms(lambda: cliente.get('/api/acciones/export?sincrono=1').get_data())
+    encolado, _ = _ms(lambda: cliente.get('/api/acciones/export').get_json())
+    print(f"Exportación en la petición:  {sincrono:8.1f} ms ({len(respuesta) / 1e6:.1f} MB)")
+    print(f"Exportación encolada:        {encolado:8.1f} ms")
+
+    # Latencia del listado con el trabajador exportando en paralelo
+    parar = threading.Event()
+    hilo = threading.Thread(target=trabajos.ejecutar_trabajador, args=(app,),
+                            kwargs={'concurrencia': 1, 'intervalo': 0.05, 'parar': parar})
+    latencias_base = [_ms(lambda: cliente.get('/api/acciones').get_data())[0] for _ in range(30)]
+    hilo.start()
+    latencias = [_ms(lambda: cliente.get('/api/acciones').get_data())[0] for _ in range(30)]
+    parar.set()
+    hilo.join()
+    print(f"/api/acciones p50 sin trabajador {statistics.median(latencias_base):.1f} ms, "
+          f"con el trabajador exportando {statistics.median(latencias):.1f} ms")
+
+    # Las exportaciones usan CPU en Python: con hilos compiten por el GIL
+    for modo, concurrencia in (('hilos', 1), ('hilos', 4), ('procesos', 4)):
+        with app.app_context():
+            for _ in range(args.trabajos):
+                trabajos.encolar('exportar_acciones', {'formato': 'csv'})
+        duracion, _ = _ms(lambda: trabajos.ejecutar_trabajador(app, concurrencia=concurrencia, modo=modo,
+                                                               intervalo=0.05, agotar=True))
+        with app.app_context():
+            completados = Trabajo.query.filter_by(estado='Completado').count()
+        print(f"{args.trabajos} exportaciones, {concurrencia} {modo}: {duracion / 1000:6.1f} s "
+              f"({completados} completados en total)")
+
+
+if __name__ == '__main__':
+    main()
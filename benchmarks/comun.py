@@ -0,0 +1,130 @@
+"""
+Utilidades compartidas por los benchmarks del sistema.
+
+Los benchmarks corren contra una base SQLite desechable (o contra la base
+indicada en BENCH_DATABASE_URL) usando el cliente de pruebas de Flask, de modo
+que miden las rutas reales de app.py.
+"""
+import os
+import sys
+import time
+from contextlib import contextmanager
+from datetime import date, datetime, timedelta
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(RAIZ, 'sistema_pemex'))
+
+
+def cargar_app(nombre='bench', recrear=True):
+    """Configura DATABASE_URL antes de importar app.py y crea el esquema"""
+    url = os.environ.get('BENCH_DATABASE_URL')
+    if not url:
+        ruta = os.path.join('/tmp', f'pemex_{nombre}.db')
+        # El archivo solo se borra antes de la primera importación; después el
+        # engine ya tiene conexiones abiertas y basta con drop_all/create_all
+        if recrear and 'app' not in sys.modules and os.path.exists(ruta):
+            os.remove(ruta)
+        url = f'sqlite:///{ruta}'
+    os.environ['DATABASE_URL'] = url
+    # Las rutas se miden renderizando; bench_cache.py mide la caché aparte
+    os.environ.setdefault('RESPUESTAS_CACHE', 'ninguno')
+
+    from app import app, db
+    with app.app_context():
+        if recrear:
+            db.drop_all()
+        db.create_all()
+    return app, db
+
+
+def crear_usuario_bench(db, rol='Administrador'):
+    """Crea (o reutiliza) el usuario con el que se autentican los benchmarks"""
+    from models import Usuario
+    usuario = Usuario.query.filter_by(username='bench').first()
+    if not usuario:
+        usuario = Usuario(username='bench', email='bench@ejemplo.local', nombre='Bench',
+                          apellido_paterno='Sistema', rol=rol)
+        usuario.set_password('bench')
+        db.session.add(usuario)
+        db.session.commit()
+    return usuario.id
+
+
+def cliente_autenticado(app, usuario_id):
+    """Cliente de pruebas con la sesión de Flask-Login ya iniciada"""
+    cliente = app.test_client()
+    with cliente.session_transaction() as sesion:
+        sesion['_user_id'] = str(usuario_id)
+        sesion['_fresh'] = True
+    return cliente
+
+
+@contextmanager
+def contar_consultas(engine):
+    """Cuenta las sentencias SQL ejecutadas dentro del bloque"""
+    from sqlalchemy import event
+
+    resultado = {'consultas': 0}
+
+    def _antes(conn, cursor, statement, parameters, context, executemany):
+        resultado['consultas'] += 1
+
+    event.listen(engine, 'before_cursor_execute', _antes)
+    try:
+        yield resultado
+    finally:
+        event.remove(engine, 'before_cursor_execute', _antes)
+
+
+def medir(funcion, repeticiones=20):
+    """Ejecuta la función varias veces y regresa la latencia media en ms"""
+    inicio = time.perf_counter()
+    for _ in range(repeticiones):
+        funcion()
+    return (time.perf_counter() - inicio) * 1000 / repeticiones
+
+
+ESTADOS_ACCION = ['Registrado', 'En Proceso', 'Completado', 'Cancelado', 'Borrador']
+NIVELES_IMPACTO = ['Alto', 'Medio', 'Bajo']
+REGIONES = ['Norte', 'Sur', 'Sureste', 'Centro', 'Golfo']
+
+
+def sembrar_acciones(db, usuario_id, total, lote=10000):
+    """Inserta `total` acciones preventivas sintéticas con executemany por lotes"""
+    from models import AccionPreventiva
+
+    tabla = AccionPreventiva.__table__
+    hoy = date.today()
+    ahora = datetime.utcnow()
+    existentes = db.session.query(db.func.count(AccionPreventiva.id)).scalar()
+
+    for base in range(existentes, existentes + total, lote):
+        filas = []
+        for i in range(base, min(base + lote, existentes + total)):
+            fecha = hoy - timedelta(days=i % 1095)
+            filas.append({
+                'folio': f'BENCH-{i:08d}',
+                'fecha_registro': fecha,
+                'region': REGIONES[i % len(REGIONES)],
+                'activo': 'Activo Bench',
+                'instalacion': 'Instalación Bench',
+                'estado': 'Tabasco',
+                'municipio': 'Centro',
+                'localidad': 'Villahermosa',
+                'tipo_problematica': 'Social',
+                'descripcion_problematica': 'Descripción sintética',
+                'actor_social': 'Comunidad',
+                'nivel_impacto': NIVELES_IMPACTO[i % len(NIVELES_IMPACTO)],
+                'accion_preventiva': 'Acción sintética',
+                'fecha_inicio': fecha,
+                'fecha_fin': fecha + timedelta(days=90),
+                'responsable': 'Responsable Bench',
+                'area_responsable': 'Área Bench',
+                'estado_accion': ESTADOS_ACCION[i % len(ESTADOS_ACCION)],
+                'porcentaje_avance': i % 101,
+                'fecha_creacion': ahora - timedelta(minutes=i),
+                'fecha_actualizacion': ahora,
+                'usuario_id': usuario_id,
+            })
+        db.session.execute(tabla.insert(), filas)
+        db.session.commit()
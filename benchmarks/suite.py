@@ -0,0 +1,176 @@
+"""
+Suite reproducible de benchmarks de las rutas de app.py.
+
+Genera (o reutiliza) una base con datos_sinteticos a la escala indicada y
+recorre las rutas reales con el cliente de pruebas: dashboards, listado y
+detalle de acciones, APIs de catálogos y los POST de alta y seguimiento.
+Para cada ruta reporta p50/p95/p99 de latencia, consultas SQL por petición
+y códigos de respuesta, y guarda todo en un JSON junto con el commit actual.
+Con --comparar se señalan las rutas que empeoraron contra otra corrida.
+
+Uso:
+    python benchmarks/suite.py --escala chica --salida resultados.json
+    python benchmarks/suite.py --reutilizar --comparar resultados_base.json
+    BENCH_DATABASE_URL=mysql+mysqlconnector://... python benchmarks/suite.py --escala mediana
+"""
+import argparse
+import json
+import random
+import statistics
+import subprocess
+import sys
+import time
+from datetime import date, datetime
+
+from comun import cargar_app, cliente_autenticado, contar_consultas, RAIZ
+
+UMBRAL_REGRESION = 1.2  # p95 o consultas 20 % por encima de la corrida base
+
+
+def _rutas(ids_acciones, ids_entidades, rnd):
+    """(nombre, método, función que arma los argumentos de la petición)"""
+    hoy = date.today().isoformat()
+    alta = {
+        'fecha_registro': hoy, 'region': 'Sur', 'activo': 'Activo Suite', 'instalacion': 'Instalación Suite',
+        'estado': 'Entidad 01', 'municipio': 'Municipio 001', 'localidad': 'Localidad Suite',
+        'tipo_problematica': 'Bloqueo', 'descripcion_problematica': 'Alta desde la suite',
+        'actor_social': 'Comunidad', 'nivel_impacto': 'Medio', 'accion_preventiva': 'Acción de la suite',
+        'fecha_inicio': hoy, 'fecha_fin': hoy, 'responsable': 'Suite', 'area_responsable': 'Operación',
+    }
+    return [
+        ('dashboard', 'GET', lambda: ('/dashboard', {})),
+        ('admin_dashboard', 'GET', lambda: ('/admin/dashboard', {})),
+        ('dashboard_summary', 'GET', lambda: ('/api/dashboard/summary', {})),
+        ('acciones', 'GET', lambda: ('/acciones', {})),
+        ('acciones_filtro_estado', 'GET', lambda: ('/acciones?estado_accion=En Proceso', {})),
+        ('api_acciones', 'GET', lambda: ('/api/acciones', {})),
+        ('ver_accion', 'GET', lambda: (f'/acciones/{rnd.choice(ids_acciones)}', {})),
+        ('catalogo_oficinas', 'GET', lambda: ('/api/catalogos/oficinas_regionales', {})),
+        ('catalogo_entidades', 'GET', lambda: ('/api/catalogos/entidades_federativas', {})),
+        ('catalogo_municipios', 'GET', lambda: (f'/api/catalogos/municipios/{rnd.choice(ids_entidades)}', {})),
+        ('catalogo_bundle', 'GET', lambda: ('/api/catalogos/bundle', {})),
+        ('crear_accion', 'POST', lambda: ('/api/acciones', {'data': alta})),
+        ('seguimiento_accion', 'POST', lambda: ('/api/seguimiento_accion', {'data': {
+            'accion_id': rnd.choice(ids_acciones), 'fecha_seguimiento': hoy,
+            'estado_nuevo': rnd.choice(['En Proceso', 'Completado']),
+            'porcentaje_avance': rnd.randrange(0, 101, 10), 'responsable': 'Suite'}})),
+    ]
+
+
+def _percentil(valores, p):
+    ordenados = sorted(valores)
+    return ordenados[min(len(ordenados) - 1, int(round(p / 100 * (len(ordenados) - 1))))]
+
+
+def medir_ruta(engine, cliente, metodo, armar, repeticiones):
+    latencias, consultas, codigos = [], [], {}
+    for _ in range(repeticiones):
+        url, kwargs = armar()
+        with contar_consultas(engine) as conteo:
+            inicio = time.perf_counter()
+            respuesta = cliente.open(url, method=metodo, **kwargs)
+            respuesta.get_data()
+            latencias.append((time.perf_counter() - inicio) * 1000)
+        consultas.append(conteo['consultas'])
+        codigos[str(respuesta.status_code)] = codigos.get(str(respuesta.status_code), 0) + 1
+
+    return {
+        'repeticiones': repeticiones,
+        'p50_ms': round(_percentil(latencias, 50), 2),
+        'p95_ms': round(_percentil(latencias, 95), 2),
+        'p99_ms': round(_percentil(latencias, 99), 2),
+        'media_ms': round(statistics.mean(latencias), 2),
+        'consultas_media': round(statistics.mean(consultas), 2),
+        'consultas_max': max(consultas),
+        'codigos': codigos,
+    }
+
+
+def _commit_actual():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=RAIZ, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def comparar(actual, base):
+    """Rutas cuyo p95 o número de consultas creció más que UMBRAL_REGRESION"""
+    regresiones = []
+    for nombre, datos in actual['rutas'].items():
+        anterior = base.get('rutas', {}).get(nombre)
+        if not anterior:
+            continue
+        if datos['p95_ms'] > anterior['p95_ms'] * UMBRAL_REGRESION:
+            regresiones.append(f"{nombre}: p95 {anterior['p95_ms']} → {datos['p95_ms']} ms")
+        if datos['consultas_max'] > anterior['consultas_max'] * UMBRAL_REGRESION:
+            regresiones.append(f"{nombre}: consultas {anterior['consultas_max']} → {datos['consultas_max']}")
+    return regresiones
+
+
+def main():
+    import datos_sinteticos
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--escala', choices=list(datos_sinteticos.ESCALAS), default='chica')
+    parser.add_argument('--acciones', type=int)
+    parser.add_argument('--reportes', type=int)
+    parser.add_argument('--semilla', type=int, default=datos_sinteticos.SEMILLA_DEFAULT)
+    parser.add_argument('--repeticiones', type=int, default=50)
+    parser.add_argument('--reutilizar', action='store_true', help='No regenera la base si ya existe')
+    parser.add_argument('--salida', default='resultados_suite.json')
+    parser.add_argument('--comparar', help='JSON de una corrida anterior')
+    args = parser.parse_args()
+
+    volumen = dict(datos_sinteticos.ESCALAS[args.escala])
+    volumen.update({k: v for k, v in (('acciones', args.acciones), ('reportes', args.reportes)) if v is not None})
+
+    app, db = cargar_app(f'suite_{args.escala}', recrear=not args.reutilizar)
+    from models import AccionPreventiva, EntidadFederativa
+
+    with app.app_context():
+        if not args.reutilizar or not db.session.query(AccionPreventiva.id).first():
+            inicio = time.perf_counter()
+            datos_sinteticos.generar(semilla=args.semilla, **volumen)
+            print(f"Datos generados en {time.perf_counter() - inicio:.1f} s")
+        ids_usuarios = datos_sinteticos.generar_usuarios()
+        ids_acciones = [i for (i,) in db.session.query(AccionPreventiva.id).order_by(AccionPreventiva.id).limit(5000)]
+        ids_entidades = [i for (i,) in db.session.query(EntidadFederativa.id)]
+        engine = db.engine
+
+    rnd = random.Random(args.semilla)
+    administrador = cliente_autenticado(app, ids_usuarios[0])
+
+    resultado = {
+        'commit': _commit_actual(),
+        'fecha': datetime.now().isoformat(timespec='seconds'),
+        'dialecto': engine.dialect.name,
+        'escala': args.escala,
+        'volumen': volumen,
+        'semilla': args.semilla,
+        'rutas': {},
+    }
+
+    print(f"{'ruta':<26} {'p50':>8} {'p95':>8} {'p99':>8} {'consultas':>10}  códigos")
+    for nombre, metodo, armar in _rutas(ids_acciones, ids_entidades, rnd):
+        medir_ruta(engine, administrador, metodo, armar, 2)  # calentamiento
+        datos = resultado['rutas'][nombre] = medir_ruta(engine, administrador, metodo, armar, args.repeticiones)
+        print(f"{nombre:<26} {datos['p50_ms']:>8.1f} {datos['p95_ms']:>8.1f} {datos['p99_ms']:>8.1f} "
+              f"{datos['consultas_max']:>10}  {datos['codigos']}")
+
+    with open(args.salida, 'w') as archivo:
+        json.dump(resultado, archivo, indent=2, ensure_ascii=False)
+    print(f"✓ Resultados guardados en {args.salida}")
+
+    if args.comparar:
+        with open(args.comparar) as archivo:
+            regresiones = comparar(resultado, json.load(archivo))
+        for regresion in regresiones:
+            print(f"✗ {regresion}")
+        if regresiones:
+            sys.exit(1)
+        print("✓ Sin regresiones contra la corrida base")
+
+
+if __name__ == '__main__':
+    main()
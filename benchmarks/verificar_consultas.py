@@ -0,0 +1,85 @@
+"""
+Cota de consultas SQL por endpoint.
+
+Mide cuántas sentencias emite cada ruta con pocos y con muchos registros
+(acciones repartidas entre varios usuarios y una acción con cientos de
+seguimientos). Si el número crece con los datos hay un N+1; el script termina
+con código 1 si alguna ruta rebasa su cota o cambia entre escalas.
+
+Uso:
+    python benchmarks/verificar_consultas.py
+"""
+import sys
+from datetime import date, datetime
+
+from comun import cargar_app, crear_usuario_bench, cliente_autenticado, contar_consultas, sembrar_acciones
+
+# ruta -> máximo de sentencias permitidas (incluye la carga del usuario de la sesión)
+COTAS = {
+    '/dashboard': 6,
+    '/acciones': 5,
+    '/api/acciones?limite=200': 3,
+    '/acciones/1': 4,
+}
+
+USUARIOS = 25
+
+
+def _preparar(app, db, acciones, seguimientos):
+    from models import Usuario, SeguimientoAccion, AccionPreventiva
+
+    with app.app_context():
+        usuario_id = crear_usuario_bench(db)
+        for i in range(USUARIOS):
+            usuario = Usuario(username=f'capturista{i}', email=f'capturista{i}@ejemplo.local',
+                              nombre='Capturista', apellido_paterno=str(i), password_hash='x')
+            db.session.add(usuario)
+        db.session.commit()
+
+        sembrar_acciones(db, usuario_id, acciones)
+        db.session.execute(
+            AccionPreventiva.__table__.update().values(usuario_id=AccionPreventiva.id % (USUARIOS + 1) + 1)
+        )
+        db.session.execute(SeguimientoAccion.__table__.insert(), [{
+            'accion_id': 1, 'fecha_seguimiento': date.today(), 'estado_anterior': 'Registrado',
+            'estado_nuevo': 'En Proceso', 'porcentaje_avance': i % 100, 'responsable': 'Bench',
+            'fecha_creacion': datetime.utcnow(), 'usuario_id': i % (USUARIOS + 1) + 1
+        } for i in range(seguimientos)])
+        db.session.commit()
+        return usuario_id, db.engine
+
+
+def medir_escala(acciones, seguimientos):
+    app, db = cargar_app('consultas')
+    import identidades
+    # La base se recrea en cada escala; sin esto la identidad cacheada en la
+    # escala anterior ahorra la carga del usuario solo en la segunda medición
+    identidades.invalidar()
+    usuario_id, engine = _preparar(app, db, acciones, seguimientos)
+    cliente = cliente_autenticado(app, usuario_id)
+
+    resultado = {}
+    for ruta in COTAS:
+        with contar_consultas(engine) as conteo:
+            respuesta = cliente.get(ruta)
+        assert respuesta.status_code == 200, (ruta, respuesta.status_code)
+        resultado[ruta] = conteo['consultas']
+    return resultado
+
+
+def main():
+    chica = medir_escala(acciones=50, seguimientos=5)
+    grande = medir_escala(acciones=2000, seguimientos=500)
+
+    fallas = 0
+    print(f"{'ruta':<28} {'cota':>5} {'50 filas':>9} {'2000 filas':>11}")
+    for ruta, cota in COTAS.items():
+        ok = grande[ruta] <= cota and chica[ruta] == grande[ruta]
+        fallas += not ok
+        print(f"{ruta:<28} {cota:>5} {chica[ruta]:>9} {grande[ruta]:>11} {'✓' if ok else '✗'}")
+
+    sys.exit(1 if fallas else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,61 @@
+"""
+Regresión de inyección de fórmulas en las exportaciones.
+
+Captura una acción cuya narrativa empieza con una fórmula y un guion,
+exporta CSV y XLSX por /api/acciones/export?sincrono=1 y revisa que ambas
+salgan como texto: en el CSV con apóstrofo al inicio y en el XLSX como celda
+de texto, sin elemento <f> en la hoja. Termina con código 1 si alguna falla.
+
+Uso:
+    python benchmarks/verificar_exportacion.py
+"""
+import csv
+import io
+import sys
+import zipfile
+
+from comun import cargar_app, crear_usuario_bench, cliente_autenticado, sembrar_acciones
+
+FORMULA = '=HYPERLINK("http://ejemplo.local","clic")'
+GUION = '-2+3 personas bloquean el acceso'
+
+
+def main():
+    app, db = cargar_app('exportacion_formulas')
+    from models import AccionPreventiva
+
+    with app.app_context():
+        usuario_id = crear_usuario_bench(db)
+        sembrar_acciones(db, usuario_id, 1)
+        accion = AccionPreventiva.query.one()
+        accion.descripcion_problematica = FORMULA
+        accion.observaciones = GUION
+        db.session.commit()
+    cliente = cliente_autenticado(app, usuario_id)
+
+    fallas = 0
+    texto = cliente.get('/api/acciones/export?sincrono=1&formato=csv').get_data(as_text=True)
+    renglon = list(csv.reader(io.StringIO(texto.lstrip('\ufeff'))))[1]
+    ok = "'" + FORMULA in renglon and "'" + GUION in renglon
+    fallas += not ok
+    print(f"CSV con apóstrofo:          {'✓' if ok else '✗'}")
+
+    try:
+        from openpyxl import load_workbook
+    except ImportError:
+        print("✗ openpyxl no está instalado; se omite el XLSX")
+        sys.exit(1 if fallas else 0)
+
+    datos = cliente.get('/api/acciones/export?sincrono=1&formato=xlsx').get_data()
+    with zipfile.ZipFile(io.BytesIO(datos)) as libro:
+        hoja = libro.read('xl/worksheets/sheet1.xml').decode('utf-8')
+    celdas = [c.value for c in next(load_workbook(io.BytesIO(datos)).active.iter_rows(min_row=2, max_row=2))]
+    ok = '<f>' not in hoja and FORMULA in celdas
+    fallas += not ok
+    print(f"XLSX sin fórmulas:          {'✓' if ok else '✗'}")
+
+    sys.exit(1 if fallas else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,121 @@
+"""
+Regresión del historial de ediciones y de las evidencias sin registro.
+
+Historial: edita un reporte desde un trabajo en segundo plano y revisa que la
+edición quede atribuida al usuario que encoló el trabajo; un trabajo
+encolado sin usuario no debe heredar la atribución del anterior.
+
+Evidencias: envía seguimientos y acciones con archivo adjunto que se
+rechazan (formulario incompleto, acción inexistente) y revisa que no quede
+fila en documentos ni archivo en el almacén; un seguimiento válido sí
+registra su evidencia. Termina con código 1 si alguna revisión falla.
+
+Uso:
+    python benchmarks/verificar_historial.py
+"""
+import io
+import os
+import shutil
+import sys
+from datetime import date
+
+DIRECTORIO = '/tmp/pemex_documentos_historial'
+
+
+def _archivos(directorio):
+    return sum(len(archivos) for raiz, _, archivos in os.walk(directorio)
+               if os.path.basename(raiz) != 'cargas')
+
+
+def main():
+    shutil.rmtree(DIRECTORIO, ignore_errors=True)
+    os.environ['DOCUMENTOS_DIR'] = DIRECTORIO
+
+    from comun import cargar_app, crear_usuario_bench, cliente_autenticado
+    app, db = cargar_app('historial')
+    import datos_sinteticos
+    import trabajos
+    from models import AccionPreventiva, Documento, HistorialEdicion, ReporteAccionPreventiva, SeguimientoAccion
+
+    @trabajos.tarea('verificar_historial')
+    def _editar_reporte(contexto, reporte_id, descripcion):
+        db.session.get(ReporteAccionPreventiva, reporte_id).descripcion_evento = descripcion
+        return {'reporte_id': reporte_id}
+
+    def ejecutar_pendientes():
+        trabajador = trabajos.nombre_trabajador()
+        while (trabajo := trabajos.tomar(trabajador)) is not None:
+            trabajos.ejecutar(trabajo, trabajador)
+
+    def ediciones(reporte_id):
+        return (HistorialEdicion.query
+                .filter_by(reporte_id=reporte_id, campo_editado='descripcion_evento')
+                .order_by(HistorialEdicion.id).all())
+
+    fallas = 0
+
+    with app.app_context():
+        usuario_id = crear_usuario_bench(db)
+        datos_sinteticos.generar(acciones=5, reportes=2, usuarios=2)
+        reporte_id = db.session.query(db.func.min(ReporteAccionPreventiva.id)).scalar()
+        accion_id = db.session.query(db.func.min(AccionPreventiva.id)).scalar()
+
+        trabajos.encolar('verificar_historial', {'reporte_id': reporte_id, 'descripcion': 'Editado por trabajo'},
+                         usuario_id=usuario_id)
+        ejecutar_pendientes()
+        registradas = ediciones(reporte_id)
+        ok = len(registradas) == 1 and registradas[0].usuario_id == usuario_id
+        fallas += not ok
+        print(f"{'Edición de trabajo atribuida:':38} {'✓' if ok else '✗'}")
+
+        trabajos.encolar('verificar_historial', {'reporte_id': reporte_id, 'descripcion': 'Sin usuario'})
+        ejecutar_pendientes()
+        ok = len(ediciones(reporte_id)) == 1
+        fallas += not ok
+        print(f"{'Trabajo sin usuario no atribuido:':38} {'✓' if ok else '✗'}")
+
+    cliente = cliente_autenticado(app, usuario_id)
+
+    def estado_almacen():
+        with app.app_context():
+            return db.session.query(db.func.count(Documento.id)).scalar(), _archivos(DIRECTORIO)
+
+    def enviar(ruta, datos, contenido):
+        datos = dict(datos, evidencia_documento=(io.BytesIO(contenido), 'evidencia.pdf'),
+                     documento_1=(io.BytesIO(contenido), 'documento.pdf'))
+        return cliente.post(ruta, data=datos, content_type='multipart/form-data').get_json()
+
+    seguimiento = {
+        'accion_id': accion_id,
+        'fecha_seguimiento': date.today().isoformat(),
+        'estado_nuevo': 'En Proceso',
+        'porcentaje_avance': 40,
+        'responsable': 'Supervisor',
+    }
+    rechazados = [
+        ('Seguimiento incompleto', '/api/seguimiento_accion',
+         {k: v for k, v in seguimiento.items() if k != 'fecha_seguimiento'}),
+        ('Acción inexistente', '/api/seguimiento_accion', dict(seguimiento, accion_id=10 ** 9)),
+        ('Acción incompleta', '/api/acciones', {'region': 'Norte'}),
+    ]
+    inicial = estado_almacen()
+    for i, (nombre, ruta, datos) in enumerate(rechazados):
+        respuesta = enviar(ruta, datos, f'rechazado {i}'.encode())
+        ok = not respuesta['success'] and estado_almacen() == inicial
+        fallas += not ok
+        print(f"{nombre + ' sin huérfanos:':38} {'✓' if ok else '✗'}")
+
+    respuesta = enviar('/api/seguimiento_accion', seguimiento, b'evidencia valida')
+    with app.app_context():
+        evidencia = (db.session.query(SeguimientoAccion.evidencia_documento)
+                     .filter_by(accion_id=accion_id).order_by(SeguimientoAccion.id.desc()).limit(1).scalar())
+        registrada = evidencia and Documento.query.filter_by(sha256=evidencia).first()
+    ok = respuesta['success'] and bool(registrada) and estado_almacen() == (inicial[0] + 1, inicial[1] + 1)
+    fallas += not ok
+    print(f"{'Seguimiento válido con evidencia:':38} {'✓' if ok else '✗'}")
+
+    sys.exit(1 if fallas else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,122 @@
+"""
+Regresión de planes de consulta.
+
+Recorre las rutas principales de app.py con el cliente de pruebas, captura
+cada SELECT que emiten y le aplica EXPLAIN (EXPLAIN QUERY PLAN en SQLite).
+Termina con código 1 si alguna consulta recorre completa una tabla de datos
+sin usar un índice. Los catálogos cat_* se excluyen: se leen completos a
+propósito y los sirve la caché.
+
+Uso:
+    python benchmarks/verificar_planes.py
+    BENCH_DATABASE_URL=mysql+mysqlconnector://... python benchmarks/verificar_planes.py
+"""
+import sys
+from datetime import date
+
+from sqlalchemy import event, text
+
+from comun import cargar_app, crear_usuario_bench, cliente_autenticado, sembrar_acciones
+
+TABLAS_EXCLUIDAS = ('cat_', 'usuarios', 'secuencias_folio')
+
+
+def _sembrar_catalogos(db):
+    from models import (OficinaRegional, TipoReporte, EntidadFederativa, Municipio,
+                        ActorInterno, TipoAtencion, EstatusGeneral)
+
+    oficina = OficinaRegional(nombre='Oficina Regional Sur', abreviatura='ORS')
+    db.session.add(oficina)
+    db.session.flush()
+    entidad = EntidadFederativa(nombre='Tabasco', abreviatura='TAB', oficina_regional_id=oficina.id)
+    db.session.add(entidad)
+    db.session.flush()
+    db.session.add_all([
+        TipoReporte(nombre='Acción Preventiva', abreviatura='AP'),
+        Municipio(nombre='Centro', entidad_federativa_id=entidad.id),
+        ActorInterno(nombre='Seguridad Física'),
+        TipoAtencion(nombre='Mesa de diálogo'),
+        EstatusGeneral(nombre='En proceso', tipo='reporte'),
+        EstatusGeneral(nombre='Atendido', tipo='reporte'),
+    ])
+    db.session.commit()
+
+
+def _recorrer_rutas(cliente):
+    """Peticiones que ejercitan las consultas frecuentes de app.py"""
+    reporte = cliente.post('/api/registro_reporte', json={
+        'tipo_reporte': 'Acción Preventiva', 'oficina_regional': 'Oficina Regional Sur',
+        'entidad_federativa': 'Tabasco', 'municipio': 'Centro', 'fecha_solicitud': date.today().isoformat(),
+        'actor_interno': 'Seguridad Física', 'tipo_atencion': 'Mesa de diálogo',
+        'descripcion_hechos': 'Bloqueo de acceso', 'causa_motivo': 'Empleo', 'solicitante': 'Ejido'
+    }).get_json()
+
+    cliente.get('/dashboard')
+    cliente.get('/acciones')
+    for filtro in ({'estado_accion': 'En Proceso'}, {'region': 'Norte'}, {'nivel_impacto': 'Alto'},
+                   {'fecha_desde': '2025-01-01', 'fecha_hasta': '2025-06-30'}):
+        pagina = cliente.get('/api/acciones', query_string=filtro).get_json()
+        if pagina['siguiente']:
+            cliente.get('/api/acciones', query_string=dict(filtro, cursor=pagina['siguiente']))
+    cliente.get('/acciones/1')
+    cliente.post('/api/seguimiento_accion', data={
+        'accion_id': 1, 'fecha_seguimiento': date.today().isoformat(), 'estado_nuevo': 'En Proceso',
+        'porcentaje_avance': 40, 'responsable': 'Bench'
+    })
+    cliente.get(f"/api/buscar_reporte/{reporte.get('folio')}")
+    cliente.get('/api/reportes/tipo_atencion/1')
+    cliente.get('/api/reportes/1/historial', query_string={'desde': '2025-01-01', 'hasta': date.today().isoformat()})
+    cliente.get('/api/estadisticas-admin')
+
+
+def _escaneos_completos(db, sentencia, parametros):
+    """Tablas que el plan de la sentencia recorre completas"""
+    dialecto = db.engine.dialect.name
+    conexion = db.session.connection()
+
+    if dialecto == 'sqlite':
+        plan = conexion.exec_driver_sql(f'EXPLAIN QUERY PLAN {sentencia}', parametros).all()
+        detalles = [fila[-1] for fila in plan]
+        return [d.split()[1] for d in detalles if d.startswith('SCAN ') and ' USING ' not in d]
+
+    plan = conexion.exec_driver_sql(f'EXPLAIN {sentencia}', parametros).mappings().all()
+    return [fila['table'] for fila in plan if fila['type'] == 'ALL']
+
+
+def main():
+    app, db = cargar_app('planes')
+    capturadas = []
+
+    with app.app_context():
+        usuario_id = crear_usuario_bench(db)
+        _sembrar_catalogos(db)
+        sembrar_acciones(db, usuario_id, 2000)
+        db.session.execute(text('ANALYZE'))
+        db.session.commit()
+
+        def _capturar(conn, cursor, statement, parameters, context, executemany):
+            if statement.lstrip().upper().startswith('SELECT') and not executemany:
+                capturadas.append((statement, parameters))
+
+        event.listen(db.engine, 'before_cursor_execute', _capturar)
+        _recorrer_rutas(cliente_autenticado(app, usuario_id))
+        event.remove(db.engine, 'before_cursor_execute', _capturar)
+
+        fallas = {}
+        for sentencia, parametros in capturadas:
+            tablas = [t for t in _escaneos_completos(db, sentencia, parametros)
+                      if not t.startswith(TABLAS_EXCLUIDAS)]
+            if tablas:
+                fallas[' '.join(sentencia.split())] = tablas
+
+    print(f"Consultas analizadas: {len(capturadas)}")
+    for sentencia, tablas in fallas.items():
+        print(f"✗ Escaneo completo de {', '.join(tablas)}:\n    {sentencia[:300]}")
+
+    if fallas:
+        sys.exit(1)
+    print("✓ Ninguna consulta frecuente recorre completa una tabla de datos")
+
+
+if __name__ == '__main__':
+    main()
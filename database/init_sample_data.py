@@ -11,7 +11,8 @@ IMPORTANTE: En producción, las credenciales se manejan via:
 """
 
 from app import app, db
-from models import Usuario, ReporteProbematica, AccionPreventiva
+from models import Usuario
+import datos_sinteticos
 import os
 
 def init_sample_data():
@@ -36,7 +37,8 @@ def init_sample_data():
         admin_usuario = Usuario(
             username='admin_demo',
             email='admin.demo@ejemplo.local',  # EMAIL FICTICIO
-            nombre_completo='Administrador Demo',
+            nombre='Administrador',
+            apellido_paterno='Demo',
             rol='Administrador'
         )
         # Contraseña temporal solo para demo local
@@ -47,7 +49,8 @@ def init_sample_data():
         capturista_usuario = Usuario(
             username='capturista_demo',
             email='capturista.demo@ejemplo.local',  # EMAIL FICTICIO
-            nombre_completo='Capturista Demo',
+            nombre='Capturista',
+            apellido_paterno='Demo',
             rol='Capturista'
         )
         # Contraseña temporal solo para demo local
@@ -75,14 +78,16 @@ def init_sample_data():
             db.session.rollback()
             print(f"❌ Error creando usuarios: {e}")
 
-def create_sample_reports():
+def create_sample_reports(acciones=500, reportes=500):
     """
-    Crea reportes de ejemplo para demo (datos ficticios)
+    Crea catálogos, reportes y acciones de ejemplo para demo (datos ficticios).
+    Usa el generador determinista de datos_sinteticos; para volúmenes de
+    benchmark usar `flask generar-datos --escala ...`.
     """
     print("📄 Creando reportes de ejemplo...")
-    # Aquí irían reportes ficticios para demo
-    # (sin datos reales de PEMEX)
-    pass
+    with app.app_context():
+        datos_sinteticos.generar(acciones=acciones, reportes=reportes)
+    print(f"✅ {reportes} reportes y {acciones} acciones de ejemplo creados")
 
 if __name__ == '__main__':
     print("🚀 Inicializando base de datos con datos de ejemplo...")
@@ -0,0 +1,146 @@
+"""
+Historial de ediciones de reportes (historial_ediciones).
+
+Un evento after_flush de la sesión compara, para cada reporte y cada
+seguimiento de compromisos modificados, el valor anterior y el nuevo de sus
+columnas (historial de atributos del ORM) y junta una fila de
+HistorialEdicion por campo cambiado. Todas las filas del flush se insertan
+con un solo executemany en la misma transacción, así que el historial se
+confirma o se revierte junto con la edición y el costo por edición es una
+sentencia, no una por campo.
+
+La edición se atribuye a current_user; fuera de una petición se usa
+session.info['usuario_id'], que trabajos.ejecutar() llena con el usuario que
+encoló el trabajo y el comando importar-registros con --usuario. Si no hay
+ninguno, la edición no se registra.
+
+Las consultas del historial siempre filtran por reporte y por rango de
+fecha_edicion sobre el índice (reporte_id, fecha_edicion), de modo que solo
+se leen las entradas del periodo pedido.
+"""
+import base64
+import logging
+from datetime import datetime, date
+
+from flask import has_request_context
+from flask_login import current_user
+from sqlalchemy import event, insert, inspect as sa_inspect, tuple_
+from sqlalchemy.orm import Session, selectinload
+
+from models import HistorialEdicion, ReporteAccionPreventiva, SeguimientoCompromiso
+
+log = logging.getLogger('pemex.auditoria')
+
+LIMITE_DEFAULT = 100
+LIMITE_MAXIMO = 500
+
+# Modelo auditado -> (atributo con el id del reporte, prefijo de campo_editado)
+MODELOS_AUDITADOS = {
+    ReporteAccionPreventiva: ('id', ''),
+    SeguimientoCompromiso: ('reporte_id', 'compromiso.'),
+}
+# Columnas que cambian solas o que no son datos capturados
+CAMPOS_EXCLUIDOS = {'id', 'fecha_creacion', 'fecha_actualizacion', 'estatus_cumplimiento_final_id'}
+
+
+def _texto(valor):
+    if valor is None:
+        return None
+    if isinstance(valor, (datetime, date)):
+        return valor.isoformat()
+    return str(valor)
+
+
+def _usuario_id(session):
+    if has_request_context() and current_user.is_authenticated:
+        return current_user.id
+    return session.info.get('usuario_id')
+
+
+def diferencias(objeto):
+    """[(campo, valor_anterior, valor_nuevo)] de las columnas modificadas del objeto"""
+    estado = sa_inspect(objeto)
+    cambios = []
+    for columna in estado.mapper.column_attrs:
+        if columna.key in CAMPOS_EXCLUIDOS:
+            continue
+        historial = estado.attrs[columna.key].history
+        if not historial.has_changes():
+            continue
+        anterior = _texto(historial.deleted[0]) if historial.deleted else None
+        nuevo = _texto(historial.added[0]) if historial.added else None
+        if anterior != nuevo:
+            cambios.append((columna.key, anterior, nuevo))
+    return cambios
+
+
+@event.listens_for(Session, 'after_flush')
+def _registrar_ediciones(session, flush_context):
+    editados = [o for o in session.dirty if type(o) in MODELOS_AUDITADOS and session.is_modified(o)]
+    if not editados:
+        return
+
+    usuario_id = _usuario_id(session)
+    if usuario_id is None:
+        log.warning('Edición de %d registros sin usuario; no se registra en el historial', len(editados))
+        return
+
+    ahora = datetime.utcnow()
+    filas = []
+    for objeto in editados:
+        atributo_reporte, prefijo = MODELOS_AUDITADOS[type(objeto)]
+        reporte_id = getattr(objeto, atributo_reporte)
+        filas.extend({
+            'reporte_id': reporte_id,
+            'campo_editado': prefijo + campo,
+            'valor_anterior': anterior,
+            'valor_nuevo': nuevo,
+            'usuario_id': usuario_id,
+            'fecha_edicion': ahora,
+        } for campo, anterior, nuevo in diferencias(objeto))
+
+    if filas:
+        session.connection().execute(insert(HistorialEdicion), filas)
+
+
+# ========== CONSULTA ==========
+
+def codificar_cursor(edicion):
+    """Cursor opaco a partir de la última edición de la página"""
+    crudo = f"{edicion.fecha_edicion.isoformat()}|{edicion.id}"
+    return base64.urlsafe_b64encode(crudo.encode()).decode()
+
+
+def decodificar_cursor(cursor):
+    """Regresa (fecha_edicion, id) o None si el cursor no es válido"""
+    try:
+        fecha, id_ = base64.urlsafe_b64decode(cursor.encode()).decode().split('|')
+        return datetime.fromisoformat(fecha), int(id_)
+    except (ValueError, UnicodeDecodeError):
+        return None
+
+
+def historial_reporte(reporte_id, desde=None, hasta=None, cursor=None, limite=LIMITE_DEFAULT):
+    """
+    Regresa (ediciones, siguiente_cursor) del reporte, de la más reciente a
+    la más antigua. `desde` y `hasta` (datetime) acotan fecha_edicion:
+    desde <= fecha_edicion < hasta.
+    """
+    limite = min(max(limite, 1), LIMITE_MAXIMO)
+    consulta = HistorialEdicion.query.filter(HistorialEdicion.reporte_id == reporte_id)
+    if desde:
+        consulta = consulta.filter(HistorialEdicion.fecha_edicion >= desde)
+    if hasta:
+        consulta = consulta.filter(HistorialEdicion.fecha_edicion < hasta)
+
+    posicion = decodificar_cursor(cursor) if cursor else None
+    if posicion:
+        consulta = consulta.filter(tuple_(HistorialEdicion.fecha_edicion, HistorialEdicion.id) < posicion)
+
+    # Se pide una fila extra para saber si existe una página siguiente
+    filas = consulta.options(selectinload(HistorialEdicion.usuario)) \
+        .order_by(HistorialEdicion.fecha_edicion.desc(), HistorialEdicion.id.desc()) \
+        .limit(limite + 1).all()
+    ediciones = filas[:limite]
+    siguiente = codificar_cursor(ediciones[-1]) if len(filas) > limite else None
+    return ediciones, siguiente
@@ -0,0 +1,339 @@
+"""
+Búsqueda de texto completo sobre las narrativas de acciones y reportes.
+
+Cada acción y cada reporte tiene un documento en busqueda_documentos con el
+texto de sus campos narrativos y los valores de faceta (región y estado).
+En MySQL se consulta con MATCH ... AGAINST sobre el índice FULLTEXT (columna
+con colación sin acentos); en SQLite, con la tabla virtual FTS5 busqueda_fts
+(tokenizador unicode61 con remove_diacritics). Ambos motores ordenan por
+relevancia.
+
+Los documentos se actualizan en la misma transacción que el registro
+mediante eventos de sesión. Las cargas masivas que usan executemany
+(importacion, datos_sinteticos) llaman a indexar_folios() o reconstruir().
+"""
+import re
+import unicodedata
+from html import escape
+
+from sqlalchemy import event, func, insert, select, delete, literal, text, inspect as sa_inspect
+from sqlalchemy.orm import Session
+
+from models import (db, AccionPreventiva, ReporteAccionPreventiva, DocumentoBusqueda,
+                    OficinaRegional, EntidadFederativa)
+
+LIMITE_DEFAULT = 20
+LIMITE_MAXIMO = 100
+LARGO_FRAGMENTO = 200
+MAX_CONTEO = 10000
+# En SQLite solo se ordenan por relevancia las MAX_RANQUEO coincidencias más
+# recientes; con términos muy comunes bm25 casi no distingue entre documentos
+# y ordenarlos todos es lo que más cuesta
+MAX_RANQUEO = 1000
+
+CAMPOS = {
+    'accion': ('descripcion_problematica', 'accion_preventiva', 'observaciones'),
+    'reporte': ('descripcion_evento', 'exigencia_reclamacion', 'compromisos_acuerdos'),
+}
+
+# Palabras vacías del español que no aportan a la búsqueda; MySQL además
+# ignora términos de menos de 3 letras (innodb_ft_min_token_size)
+PALABRAS_VACIAS = frozenset('''
+    a al ante con contra de del desde el en entre es esta este esto hacia hasta la las le les lo los
+    mas me mi no nos o para pero por que se si sin sobre su sus un una uno unos unas y ya
+'''.split())
+
+
+class BusquedaError(ValueError):
+    """Consulta de búsqueda sin términos utilizables"""
+
+
+# ========== NORMALIZACIÓN Y RESALTADO ==========
+
+def _sin_acento(caracter):
+    return unicodedata.normalize('NFKD', caracter)[0].lower()
+
+
+def normalizar(texto):
+    """Minúsculas y sin acentos; conserva la longitud para poder resaltar"""
+    return ''.join(_sin_acento(c) for c in texto)
+
+
+def terminos(consulta):
+    """Términos normalizados de la consulta, sin palabras vacías ni repetidos"""
+    vistos = []
+    for termino in re.findall(r'\w+', normalizar(consulta or '')):
+        if len(termino) >= 3 and termino not in PALABRAS_VACIAS and termino not in vistos:
+            vistos.append(termino)
+    return vistos
+
+
+def resaltar(texto, lista_terminos, largo=LARGO_FRAGMENTO):
+    """
+    Fragmento HTML del texto alrededor de la primera coincidencia, con las
+    coincidencias (por prefijo, sin distinguir acentos) dentro de <mark>.
+    """
+    normalizado = normalizar(texto)
+    patron = re.compile(r'\b(?:' + '|'.join(re.escape(t) for t in lista_terminos) + r')\w*')
+    coincidencias = list(patron.finditer(normalizado))
+
+    inicio = max(0, coincidencias[0].start() - largo // 4) if coincidencias else 0
+    if inicio > 0:
+        # Empezar en el inicio de una palabra
+        espacio = texto.find(' ', inicio, coincidencias[0].start())
+        inicio = espacio + 1 if espacio >= 0 else coincidencias[0].start()
+    fin = min(len(texto), inicio + largo)
+    partes, posicion = [], inicio
+    for m in coincidencias:
+        if m.start() < inicio or m.end() > fin:
+            continue
+        partes.append(escape(texto[posicion:m.start()]))
+        partes.append(f'<mark>{escape(texto[m.start():m.end()])}</mark>')
+        posicion = m.end()
+    partes.append(escape(texto[posicion:fin]))
+
+    return ('…' if inicio > 0 else '') + ''.join(partes) + ('…' if fin < len(texto) else '')
+
+
+# ========== INDEXACIÓN ==========
+
+def _texto(*campos):
+    """Concatena columnas como expresión SQL ('||' en SQLite, concat() en MySQL)"""
+    expresion = func.coalesce(campos[0], '')
+    for campo in campos[1:]:
+        expresion = expresion + '\n' + func.coalesce(campo, '')
+    return expresion
+
+
+def _select_acciones():
+    return select(
+        literal('accion'), AccionPreventiva.id, AccionPreventiva.folio,
+        func.coalesce(AccionPreventiva.region, ''), func.coalesce(AccionPreventiva.estado, ''),
+        _texto(*(getattr(AccionPreventiva, c) for c in CAMPOS['accion']))
+    )
+
+
+def _select_reportes():
+    return select(
+        literal('reporte'), ReporteAccionPreventiva.id, ReporteAccionPreventiva.folio,
+        func.coalesce(OficinaRegional.nombre, ''), func.coalesce(EntidadFederativa.nombre, ''),
+        _texto(*(getattr(ReporteAccionPreventiva, c) for c in CAMPOS['reporte']))
+    ).select_from(ReporteAccionPreventiva).outerjoin(
+        OficinaRegional, OficinaRegional.id == ReporteAccionPreventiva.oficina_regional_id
+    ).outerjoin(
+        EntidadFederativa, EntidadFederativa.id == ReporteAccionPreventiva.entidad_federativa_id
+    )
+
+
+_COLUMNAS_DOCUMENTO = ['tipo', 'registro_id', 'folio', 'region', 'estado', 'texto']
+_SELECTS = {'accion': (_select_acciones, AccionPreventiva), 'reporte': (_select_reportes, ReporteAccionPreventiva)}
+
+
+def _reindexar(conexion, tipo, condicion):
+    """Reemplaza los documentos de los registros que cumplen la condición"""
+    armar, modelo = _SELECTS[tipo]
+    ids = select(modelo.id).where(condicion)
+    conexion.execute(delete(DocumentoBusqueda).where(
+        DocumentoBusqueda.tipo == tipo, DocumentoBusqueda.registro_id.in_(ids)
+    ))
+    conexion.execute(insert(DocumentoBusqueda).from_select(_COLUMNAS_DOCUMENTO, armar().where(condicion)))
+
+
+def indexar_folios(modelo, folios):
+    """Indexa registros recién insertados por executemany; no hace commit"""
+    tipo = 'accion' if modelo is AccionPreventiva else 'reporte'
+    if folios:
+        _reindexar(db.session.connection(), tipo, modelo.folio.in_(list(folios)))
+
+
+def reconstruir():
+    """Regenera todos los documentos (después de cargas masivas o migraciones)"""
+    conexion = db.session.connection()
+    conexion.execute(delete(DocumentoBusqueda))
+    conexion.execute(insert(DocumentoBusqueda).from_select(_COLUMNAS_DOCUMENTO, _select_acciones()))
+    conexion.execute(insert(DocumentoBusqueda).from_select(_COLUMNAS_DOCUMENTO, _select_reportes()))
+    if conexion.dialect.name == 'sqlite':
+        conexion.execute(text("INSERT INTO busqueda_fts(busqueda_fts) VALUES ('optimize')"))
+    db.session.commit()
+    return db.session.query(func.count(DocumentoBusqueda.id)).scalar()
+
+
+# Campos que, si cambian, obligan a regenerar el documento
+_CAMPOS_VIGILADOS = {
+    'accion': CAMPOS['accion'] + ('folio', 'region', 'estado'),
+    'reporte': CAMPOS['reporte'] + ('folio', 'oficina_regional_id', 'entidad_federativa_id'),
+}
+
+
+def _tipo(objeto):
+    if isinstance(objeto, AccionPreventiva):
+        return 'accion'
+    if isinstance(objeto, ReporteAccionPreventiva):
+        return 'reporte'
+    return None
+
+
+def _cambio_relevante(objeto, tipo):
+    estado = sa_inspect(objeto)
+    return any(estado.attrs[campo].history.has_changes() for campo in _CAMPOS_VIGILADOS[tipo])
+
+
+@event.listens_for(Session, 'after_flush')
+def _sincronizar_documentos(session, flush_context):
+    por_indexar = {'accion': set(), 'reporte': set()}
+    por_borrar = {'accion': set(), 'reporte': set()}
+
+    for objeto in session.new:
+        tipo = _tipo(objeto)
+        if tipo:
+            por_indexar[tipo].add(objeto.id)
+    for objeto in session.dirty:
+        tipo = _tipo(objeto)
+        if tipo and _cambio_relevante(objeto, tipo):
+            por_indexar[tipo].add(objeto.id)
+    for objeto in session.deleted:
+        tipo = _tipo(objeto)
+        if tipo:
+            por_borrar[tipo].add(objeto.id)
+
+    if not any(por_indexar.values()) and not any(por_borrar.values()):
+        return
+
+    conexion = session.connection()
+    for tipo, (_, modelo) in _SELECTS.items():
+        if por_indexar[tipo]:
+            _reindexar(conexion, tipo, modelo.id.in_(por_indexar[tipo]))
+        if por_borrar[tipo]:
+            conexion.execute(delete(DocumentoBusqueda).where(
+                DocumentoBusqueda.tipo == tipo, DocumentoBusqueda.registro_id.in_(por_borrar[tipo])
+            ))
+
+
+# ========== CONSULTA ==========
+
+def _expresion_motor(dialecto, lista_terminos):
+    """
+    Consulta en la sintaxis del motor: todos los términos requeridos y el
+    último por prefijo (se está escribiendo); expandir por prefijo todos los
+    términos comunes es lo más caro de la consulta
+    """
+    *completos, ultimo = lista_terminos
+    if dialecto == 'mysql':
+        return ' '.join([f'+{t}' for t in completos] + [f'+{ultimo}*'])
+    return ' '.join([f'"{t}"' for t in completos] + [f'"{ultimo}"*'])
+
+
+def _filtros_sql(filtros):
+    return ''.join(f' AND d.{campo} = :{campo}' for campo, valor in filtros.items() if valor)
+
+
+def _resultados(dialecto, filtros, parametros, por_relevancia):
+    """
+    Página de documentos ordenada por relevancia. En SQLite el orden es
+    aproximado: se ranquean solo las MAX_RANQUEO coincidencias más recientes
+    y, si hay más de MAX_CONTEO, la página se ordena por recencia (bm25 de
+    FTS5 recorre todas las coincidencias de cada término y con términos tan
+    comunes casi no distingue entre documentos).
+    """
+    if dialecto == 'mysql':
+        return db.session.execute(text(
+            'SELECT d.tipo, d.registro_id, d.folio, d.region, d.estado, d.texto, '
+            'MATCH(d.texto) AGAINST (:consulta IN BOOLEAN MODE) AS rango FROM busqueda_documentos d '
+            'WHERE MATCH(d.texto) AGAINST (:consulta IN BOOLEAN MODE)' + _filtros_sql(filtros) +
+            ' ORDER BY rango DESC, d.id LIMIT :limite OFFSET :desplazamiento'
+        ), parametros).all()
+
+    if not por_relevancia:
+        # CROSS JOIN obliga a SQLite a recorrer primero las coincidencias de
+        # FTS5; si empieza por el índice de región evalúa el MATCH por fila
+        return db.session.execute(text(
+            'SELECT d.tipo, d.registro_id, d.folio, d.region, d.estado, d.texto, 0 AS rango '
+            'FROM busqueda_fts CROSS JOIN busqueda_documentos d ON d.id = busqueda_fts.rowid '
+            'WHERE busqueda_fts MATCH :consulta' + _filtros_sql(filtros) +
+            ' ORDER BY busqueda_fts.rowid DESC LIMIT :limite OFFSET :desplazamiento'
+        ), parametros).all()
+
+    if not any(filtros.values()):
+        # Sin filtros FTS5 ordena por rank sin tocar la tabla de documentos
+        # y después solo se leen los documentos de la página
+        return db.session.execute(text(
+            'SELECT d.tipo, d.registro_id, d.folio, d.region, d.estado, d.texto, f.rank AS rango '
+            'FROM (SELECT rowid, rank FROM (SELECT rowid, rank FROM busqueda_fts '
+            'WHERE busqueda_fts MATCH :consulta ORDER BY rowid DESC LIMIT :max_ranqueo) '
+            'ORDER BY rank LIMIT :limite OFFSET :desplazamiento) f '
+            'JOIN busqueda_documentos d ON d.id = f.rowid ORDER BY f.rank'
+        ), {**parametros, 'max_ranqueo': MAX_RANQUEO}).all()
+
+    return db.session.execute(text(
+        'SELECT f.tipo, f.registro_id, f.folio, f.region, f.estado, f.texto, f.rango '
+        'FROM (SELECT d.tipo, d.registro_id, d.folio, d.region, d.estado, d.texto, busqueda_fts.rank AS rango '
+        'FROM busqueda_fts CROSS JOIN busqueda_documentos d ON d.id = busqueda_fts.rowid '
+        'WHERE busqueda_fts MATCH :consulta' + _filtros_sql(filtros) +
+        ' ORDER BY busqueda_fts.rowid DESC LIMIT :max_ranqueo) f '
+        'ORDER BY f.rango LIMIT :limite OFFSET :desplazamiento'
+    ), {**parametros, 'max_ranqueo': MAX_RANQUEO}).all()
+
+
+def _conteos(dialecto, filtros, parametros):
+    """
+    Coincidencias por (tipo, región, estado) en una sola consulta; se leen
+    a lo más MAX_CONTEO coincidencias, así que con términos muy comunes los
+    conteos son un mínimo y no el total exacto.
+    """
+    if dialecto == 'mysql':
+        coincidencias = ('SELECT d.tipo, d.region, d.estado FROM busqueda_documentos d '
+                         'WHERE MATCH(d.texto) AGAINST (:consulta IN BOOLEAN MODE)' + _filtros_sql(filtros))
+    else:
+        coincidencias = ('SELECT d.tipo, d.region, d.estado FROM busqueda_fts '
+                         'CROSS JOIN busqueda_documentos d ON d.id = busqueda_fts.rowid '
+                         'WHERE busqueda_fts MATCH :consulta' + _filtros_sql(filtros))
+
+    return db.session.execute(text(
+        f'SELECT c.tipo, c.region, c.estado, COUNT(*) FROM ({coincidencias} LIMIT :max_conteo) c '
+        'GROUP BY c.tipo, c.region, c.estado'
+    ), {**parametros, 'max_conteo': MAX_CONTEO + 1}).all()
+
+
+def buscar(consulta, tipo=None, region=None, estado=None, limite=LIMITE_DEFAULT, pagina=1):
+    """
+    Regresa {'total', 'total_exacto', 'resultados', 'facetas'}. Las facetas
+    cuentan las coincidencias por tipo, región y estado con los filtros
+    aplicados.
+    """
+    lista_terminos = terminos(consulta)
+    if not lista_terminos:
+        raise BusquedaError('La búsqueda debe incluir al menos una palabra de 3 letras o más')
+
+    dialecto = db.engine.dialect.name
+    limite = min(max(limite, 1), LIMITE_MAXIMO)
+    filtros = {'tipo': tipo, 'region': region, 'estado': estado}
+    parametros = {
+        'consulta': _expresion_motor(dialecto, lista_terminos),
+        'limite': limite,
+        'desplazamiento': (max(pagina, 1) - 1) * limite,
+        **{campo: valor for campo, valor in filtros.items() if valor},
+    }
+
+    facetas = {campo: {} for campo in filtros}
+    total = 0
+    for fila_tipo, fila_region, fila_estado, cuenta in _conteos(dialecto, filtros, parametros):
+        total += cuenta
+        for campo, valor in (('tipo', fila_tipo), ('region', fila_region), ('estado', fila_estado)):
+            facetas[campo][valor] = facetas[campo].get(valor, 0) + cuenta
+
+    filas = _resultados(dialecto, filtros, parametros, por_relevancia=total <= MAX_CONTEO)
+
+    return {
+        'total': min(total, MAX_CONTEO),
+        'total_exacto': total <= MAX_CONTEO,
+        'resultados': [{
+            'tipo': fila.tipo,
+            'id': fila.registro_id,
+            'folio': fila.folio,
+            'region': fila.region,
+            'estado': fila.estado,
+            'fragmento': resaltar(fila.texto, lista_terminos),
+            'rango': round(abs(float(fila.rango)), 4),
+        } for fila in filas],
+        'facetas': {campo: dict(sorted(valores.items(), key=lambda v: -v[1])) for campo, valores in facetas.items()},
+    }
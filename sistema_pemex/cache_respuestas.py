@@ -0,0 +1,479 @@
+"""
+Caché de respuestas renderizadas con invalidación por etiquetas.
+
+Las vistas decoradas con @cachear(...) guardan el cuerpo de la respuesta bajo
+una clave formada por el endpoint, los argumentos de la ruta y del query
+string, el rol del usuario y la fecha. Cada entrada lleva etiquetas como
+'accion:15', 'dashboard' o 'catalog:*' junto con la versión que tenía cada
+etiqueta al guardarla, y es válida mientras ninguna haya subido de versión.
+
+Las etiquetas se emiten solas: un evento after_flush de la sesión junta las
+de los objetos escritos (etiquetas_de()) y after_commit sube sus versiones,
+así que una transacción revertida no invalida nada. Las escrituras masivas
+que no pasan por el ORM llaman a etiquetar().
+
+El nombre del usuario se inserta al servir la respuesta (las plantillas usan
+nombre_usuario()), de modo que una entrada sirve a todos los usuarios del
+mismo rol. No se guardan respuestas de peticiones con mensajes flash
+pendientes.
+
+Variables de entorno:
+    RESPUESTAS_CACHE         memoria (default), archivos, redis o ninguno
+    RESPUESTAS_CACHE_URL     directorio (archivos, default instance/cache_respuestas)
+                             o URL del servidor (redis)
+    RESPUESTAS_CACHE_MAX_MB  tamaño máximo de la LRU en memoria (default 64)
+    RESPUESTAS_CACHE_TTL     vigencia máxima de una entrada en segundos (default 60)
+
+Con 'memoria' cada proceso tiene su propia LRU y sus propias versiones de
+etiquetas: una escritura invalida en el proceso que la hizo y los demás
+dependen del TTL. Con varios procesos conviene 'archivos' (mismo servidor) o
+'redis', que comparten entradas y versiones.
+
+Fuera de la memoria del proceso las entradas se guardan como una línea de
+metadatos JSON seguida del cuerpo en bytes, nunca con pickle: quien pueda
+escribir en el directorio o en Redis solo puede alterar respuestas, no
+ejecutar código. El directorio de 'archivos' se crea con permisos 0700 y
+se rechaza si pertenece a otro usuario o si otros pueden leerlo o escribirlo.
+"""
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict, namedtuple
+from datetime import date
+from functools import wraps
+from itertools import chain
+
+from flask import g, request, session, make_response, Response
+from flask_login import current_user
+from markupsafe import escape
+from sqlalchemy import event, inspect as sa_inspect
+from sqlalchemy.orm import Session
+
+from models import (db, Usuario, AccionPreventiva, SeguimientoAccion, ReporteAccionPreventiva,
+                    ReporteTipoAtencion, SeguimientoCompromiso, HistorialEdicion)
+import catalogos
+
+log = logging.getLogger('pemex.cache_respuestas')
+
+TTL_DEFAULT = 60
+MAX_MB_DEFAULT = 64
+# Se sustituye por el nombre del usuario al servir la respuesta
+MARCADOR_USUARIO = '%%NOMBRE_USUARIO_CACHE%%'
+# Cambios de Usuario que se ven en las páginas (nombre de quien capturó)
+CAMPOS_USUARIO = ('nombre', 'apellido_paterno', 'apellido_materno')
+
+Entrada = namedtuple('Entrada', 'expira versiones status mimetype cuerpo')
+
+_backend = None
+_ttl = TTL_DEFAULT
+_estadisticas = {}
+_lock_estadisticas = threading.Lock()
+
+
+def _serializar(entrada):
+    """Metadatos JSON en la primera línea y después el cuerpo tal cual"""
+    metadatos = {'expira': entrada.expira, 'versiones': entrada.versiones,
+                 'status': entrada.status, 'mimetype': entrada.mimetype}
+    return json.dumps(metadatos).encode('utf-8') + b'\n' + entrada.cuerpo
+
+
+def _deserializar(datos):
+    """Entrada a partir de _serializar(); None si los datos no son válidos"""
+    metadatos, separador, cuerpo = datos.partition(b'\n')
+    if not separador:
+        return None
+    try:
+        metadatos = json.loads(metadatos)
+        versiones = tuple((str(etiqueta), int(version)) for etiqueta, version in metadatos['versiones'])
+        return Entrada(float(metadatos['expira']), versiones,
+                       int(metadatos['status']), str(metadatos['mimetype']), cuerpo)
+    except (ValueError, TypeError, KeyError):
+        return None
+
+
+# ========== BACKENDS ==========
+
+class MemoriaLRU:
+    """LRU en proceso acotada por el tamaño total de los cuerpos"""
+
+    nombre = 'memoria'
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.bytes = 0
+        self.desalojos = 0
+        self._entradas = OrderedDict()
+        self._etiquetas = {}
+        self._lock = threading.Lock()
+
+    def obtener(self, clave):
+        with self._lock:
+            entrada = self._entradas.get(clave)
+            if entrada is not None:
+                self._entradas.move_to_end(clave)
+            return entrada
+
+    def guardar(self, clave, entrada):
+        tamano = len(entrada.cuerpo)
+        if tamano > self.max_bytes:
+            return
+        with self._lock:
+            anterior = self._entradas.pop(clave, None)
+            if anterior is not None:
+                self.bytes -= len(anterior.cuerpo)
+            self._entradas[clave] = entrada
+            self.bytes += tamano
+            while self.bytes > self.max_bytes:
+                _, desalojada = self._entradas.popitem(last=False)
+                self.bytes -= len(desalojada.cuerpo)
+                self.desalojos += 1
+
+    def borrar(self, clave):
+        with self._lock:
+            entrada = self._entradas.pop(clave, None)
+            if entrada is not None:
+                self.bytes -= len(entrada.cuerpo)
+
+    def versiones(self, etiquetas):
+        return [self._etiquetas.get(etiqueta, 0) for etiqueta in etiquetas]
+
+    def incrementar(self, etiquetas):
+        with self._lock:
+            for etiqueta in etiquetas:
+                self._etiquetas[etiqueta] = self._etiquetas.get(etiqueta, 0) + 1
+
+    def limpiar(self):
+        with self._lock:
+            self._entradas.clear()
+            self.bytes = 0
+
+    def info(self):
+        return {'entradas': len(self._entradas), 'bytes': self.bytes, 'max_bytes': self.max_bytes,
+                'desalojos': self.desalojos}
+
+
+class Archivos:
+    """
+    Un archivo por entrada, compartido por los procesos del mismo servidor.
+    La versión de una etiqueta es el tamaño de su archivo: incrementarla es
+    agregar un byte con O_APPEND, atómico entre procesos.
+    """
+
+    nombre = 'archivos'
+
+    def __init__(self, directorio):
+        self.directorio = directorio
+        for ruta in (directorio, os.path.join(directorio, 'etiquetas')):
+            os.makedirs(ruta, mode=0o700, exist_ok=True)
+            estado = os.stat(ruta)
+            if estado.st_uid != os.getuid() or estado.st_mode & 0o077:
+                raise PermissionError(f'{ruta} debe pertenecer al usuario del servidor con permisos 0700')
+
+    def _ruta(self, clave):
+        return os.path.join(self.directorio, hashlib.sha1(clave.encode('utf-8')).hexdigest())
+
+    def _ruta_etiqueta(self, etiqueta):
+        return os.path.join(self.directorio, 'etiquetas', hashlib.sha1(etiqueta.encode('utf-8')).hexdigest())
+
+    def obtener(self, clave):
+        try:
+            with open(self._ruta(clave), 'rb') as archivo:
+                entrada = _deserializar(archivo.read())
+        except FileNotFoundError:
+            return None
+        except OSError:
+            entrada = None
+        if entrada is None:
+            self.borrar(clave)
+        return entrada
+
+    def guardar(self, clave, entrada):
+        ruta = self._ruta(clave)
+        temporal = f'{ruta}.{os.getpid()}.{threading.get_ident()}.tmp'
+        with open(os.open(temporal, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600), 'wb') as archivo:
+            archivo.write(_serializar(entrada))
+        os.replace(temporal, ruta)
+
+    def borrar(self, clave):
+        try:
+            os.remove(self._ruta(clave))
+        except FileNotFoundError:
+            pass
+
+    def versiones(self, etiquetas):
+        versiones = []
+        for etiqueta in etiquetas:
+            try:
+                versiones.append(os.stat(self._ruta_etiqueta(etiqueta)).st_size)
+            except FileNotFoundError:
+                versiones.append(0)
+        return versiones
+
+    def incrementar(self, etiquetas):
+        for etiqueta in etiquetas:
+            descriptor = os.open(self._ruta_etiqueta(etiqueta), os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o600)
+            try:
+                os.write(descriptor, b'.')
+            finally:
+                os.close(descriptor)
+
+    def limpiar(self):
+        for nombre in os.listdir(self.directorio):
+            ruta = os.path.join(self.directorio, nombre)
+            if os.path.isfile(ruta):
+                os.remove(ruta)
+
+    def info(self):
+        archivos = [e for e in os.scandir(self.directorio) if e.is_file()]
+        return {'entradas': len(archivos), 'bytes': sum(e.stat().st_size for e in archivos),
+                'directorio': self.directorio}
+
+
+class Redis:
+    """Servidor compatible con Redis; las entradas expiran con SETEX"""
+
+    nombre = 'redis'
+
+    def __init__(self, url):
+        import redis
+        self._cliente = redis.Redis.from_url(url)
+
+    @staticmethod
+    def _llave(clave):
+        return 'pemex:respuesta:' + hashlib.sha1(clave.encode('utf-8')).hexdigest()
+
+    def obtener(self, clave):
+        datos = self._cliente.get(self._llave(clave))
+        return _deserializar(datos) if datos else None
+
+    def guardar(self, clave, entrada):
+        ttl = max(int(entrada.expira - time.time()), 1)
+        self._cliente.setex(self._llave(clave), ttl, _serializar(entrada))
+
+    def borrar(self, clave):
+        self._cliente.delete(self._llave(clave))
+
+    def versiones(self, etiquetas):
+        if not etiquetas:
+            return []
+        return [int(v or 0) for v in self._cliente.mget(['pemex:etiqueta:' + e for e in etiquetas])]
+
+    def incrementar(self, etiquetas):
+        canal = self._cliente.pipeline(transaction=False)
+        for etiqueta in etiquetas:
+            canal.incr('pemex:etiqueta:' + etiqueta)
+        canal.execute()
+
+    def limpiar(self):
+        llaves = list(self._cliente.scan_iter('pemex:respuesta:*'))
+        if llaves:
+            self._cliente.delete(*llaves)
+
+    def info(self):
+        return {'entradas': sum(1 for _ in self._cliente.scan_iter('pemex:respuesta:*'))}
+
+
+def _crear_backend(tipo, url, max_mb, directorio):
+    if tipo in ('', 'ninguno', '0', 'no'):
+        return None
+    if tipo == 'archivos':
+        try:
+            return Archivos(url or directorio)
+        except PermissionError as e:
+            print(f"✗ RESPUESTAS_CACHE=archivos: {e}; se usa la caché en memoria")
+    if tipo == 'redis':
+        try:
+            return Redis(url or 'redis://localhost:6379/0')
+        except ImportError:
+            print("✗ RESPUESTAS_CACHE=redis pero el paquete redis no está instalado; se usa la caché en memoria")
+    return MemoriaLRU(max_mb * 1024 * 1024)
+
+
+def init_app(app):
+    """Configura el backend desde las variables de entorno y registra nombre_usuario() en las plantillas"""
+    global _backend, _ttl
+    _ttl = int(os.environ.get('RESPUESTAS_CACHE_TTL', TTL_DEFAULT))
+    _backend = _crear_backend(os.environ.get('RESPUESTAS_CACHE', 'memoria').strip().lower(),
+                              os.environ.get('RESPUESTAS_CACHE_URL', ''),
+                              int(os.environ.get('RESPUESTAS_CACHE_MAX_MB', MAX_MB_DEFAULT)),
+                              os.path.join(app.instance_path, 'cache_respuestas'))
+
+    @app.context_processor
+    def _nombre_usuario():
+        def nombre_usuario():
+            if g.get('cache_respuesta'):
+                return MARCADOR_USUARIO
+            return current_user.nombre_completo if current_user.is_authenticated else ''
+        return {'nombre_usuario': nombre_usuario}
+
+
+# ========== ESTADÍSTICAS ==========
+
+def _contar(endpoint, evento):
+    with _lock_estadisticas:
+        contadores = _estadisticas.setdefault(endpoint, dict.fromkeys(
+            ('aciertos', 'fallos', 'invalidadas', 'omitidas', 'errores'), 0))
+        contadores[evento] += 1
+
+
+def _tasa(contadores):
+    consultas = contadores['aciertos'] + contadores['fallos'] + contadores['invalidadas']
+    return round(contadores['aciertos'] / consultas, 4) if consultas else None
+
+
+def estadisticas():
+    """Aciertos, fallos y tasa de aciertos por endpoint y en total"""
+    with _lock_estadisticas:
+        endpoints = {nombre: dict(c, tasa_aciertos=_tasa(c)) for nombre, c in _estadisticas.items()}
+    total = {campo: sum(c[campo] for c in endpoints.values())
+             for campo in ('aciertos', 'fallos', 'invalidadas', 'omitidas', 'errores')}
+    total['tasa_aciertos'] = _tasa(total)
+    resultado = {'backend': _backend.nombre if _backend else 'ninguno', 'ttl': _ttl,
+                 'total': total, 'endpoints': endpoints}
+    if _backend:
+        try:
+            resultado.update(_backend.info())
+        except Exception:
+            log.exception('No se pudo leer el estado del backend de caché')
+    return resultado
+
+
+def reiniciar_estadisticas():
+    with _lock_estadisticas:
+        _estadisticas.clear()
+
+
+# ========== CACHÉ DE VISTAS ==========
+
+def _clave():
+    argumentos = sorted((request.view_args or {}).items())
+    consulta = sorted(request.args.items(multi=True))
+    return f"{request.endpoint}|{argumentos}|{consulta}|{current_user.rol}|{date.today().isoformat()}"
+
+
+def _vigente(entrada):
+    if entrada.expira < time.time():
+        return False
+    etiquetas = [etiqueta for etiqueta, _ in entrada.versiones]
+    return [version for _, version in entrada.versiones] == _backend.versiones(etiquetas)
+
+
+def _personalizar(cuerpo):
+    if MARCADOR_USUARIO.encode() not in cuerpo:
+        return cuerpo
+    return cuerpo.replace(MARCADOR_USUARIO.encode(), str(escape(current_user.nombre_completo)).encode('utf-8'))
+
+
+def cachear(etiquetas, ttl=None):
+    """
+    Guarda la respuesta de la vista en la caché. `etiquetas` recibe los
+    argumentos de la ruta y regresa las etiquetas que invalidan la entrada.
+    Debe ir debajo de @login_required.
+    """
+    def decorador(vista):
+        @wraps(vista)
+        def envoltura(**kwargs):
+            endpoint = request.endpoint
+            if _backend is None or request.method != 'GET' or session.get('_flashes'):
+                _contar(endpoint, 'omitidas')
+                return vista(**kwargs)
+
+            clave = _clave()
+            try:
+                entrada = _backend.obtener(clave)
+                if entrada is not None and _vigente(entrada):
+                    _contar(endpoint, 'aciertos')
+                    return Response(_personalizar(entrada.cuerpo), status=entrada.status, mimetype=entrada.mimetype)
+                _contar(endpoint, 'invalidadas' if entrada is not None else 'fallos')
+                lista = sorted(set(etiquetas(**kwargs)))
+                # Versiones leídas antes de renderizar: si algo se escribe
+                # mientras tanto, la entrada ya nace invalidada
+                versiones = _backend.versiones(lista)
+            except Exception:
+                log.exception('Error al leer la caché de respuestas')
+                _contar(endpoint, 'errores')
+                return vista(**kwargs)
+
+            g.cache_respuesta = True
+            try:
+                respuesta = make_response(vista(**kwargs))
+            finally:
+                g.pop('cache_respuesta', None)
+
+            if respuesta.status_code == 200 and not respuesta.direct_passthrough:
+                cuerpo = respuesta.get_data()
+                try:
+                    _backend.guardar(clave, Entrada(time.time() + (ttl or _ttl), tuple(zip(lista, versiones)),
+                                                    respuesta.status_code, respuesta.mimetype, cuerpo))
+                except Exception:
+                    log.exception('Error al guardar en la caché de respuestas')
+                    _contar(endpoint, 'errores')
+                respuesta.set_data(_personalizar(cuerpo))
+            return respuesta
+        return envoltura
+    return decorador
+
+
+def limpiar():
+    """Descarta todas las entradas (las versiones de etiquetas se conservan)"""
+    if _backend:
+        _backend.limpiar()
+
+
+# ========== INVALIDACIÓN POR ETIQUETAS ==========
+
+def invalidar(etiquetas):
+    """Sube la versión de las etiquetas; las entradas que las llevan dejan de servirse"""
+    if _backend is None or not etiquetas:
+        return
+    try:
+        _backend.incrementar(sorted(etiquetas))
+    except Exception:
+        log.exception('Error al invalidar etiquetas de la caché de respuestas')
+
+
+def etiquetar(*etiquetas):
+    """Etiquetas a invalidar cuando se confirme la transacción actual (escrituras masivas)"""
+    db.session.info.setdefault('etiquetas_cache', set()).update(etiquetas)
+
+
+def _cambio(objeto, campos):
+    estado = sa_inspect(objeto)
+    return any(estado.attrs[campo].history.has_changes() for campo in campos)
+
+
+def etiquetas_de(objeto):
+    """Etiquetas que invalida la escritura de un objeto del modelo"""
+    if isinstance(objeto, AccionPreventiva):
+        return {f'accion:{objeto.id}', 'dashboard'}
+    if isinstance(objeto, SeguimientoAccion):
+        return {f'accion:{objeto.accion_id}'}
+    if isinstance(objeto, ReporteAccionPreventiva):
+        return {f'reporte:{objeto.id}', 'dashboard'}
+    if isinstance(objeto, (ReporteTipoAtencion, SeguimientoCompromiso, HistorialEdicion)):
+        return {f'reporte:{objeto.reporte_id}'}
+    if isinstance(objeto, catalogos.MODELOS_CATALOGO):
+        return {f'catalog:{objeto.__tablename__}', 'catalog:*', 'dashboard'}
+    if isinstance(objeto, Usuario) and _cambio(objeto, CAMPOS_USUARIO):
+        return {f'usuario:{objeto.id}', 'usuarios'}
+    return set()
+
+
+@event.listens_for(Session, 'after_flush')
+def _registrar_etiquetas(session, flush_context):
+    pendientes = session.info.setdefault('etiquetas_cache', set())
+    for objeto in chain(session.new, session.dirty, session.deleted):
+        pendientes.update(etiquetas_de(objeto))
+
+
+@event.listens_for(Session, 'after_commit')
+def _invalidar_al_confirmar(session):
+    invalidar(session.info.pop('etiquetas_cache', None))
+
+
+@event.listens_for(Session, 'after_rollback')
+def _descartar_etiquetas(session):
+    session.info.pop('etiquetas_cache', None)
@@ -0,0 +1,221 @@
+"""
+Caché en proceso para los catálogos (tablas cat_*).
+
+Los catálogos casi nunca cambian, pero cada formulario los pide completos.
+Aquí se guarda el JSON ya serializado de cada catálogo con un TTL y un número
+de versión por tabla. La versión sube cuando se confirma (commit) una
+transacción que escribió en esa tabla, lo que invalida las entradas afectadas.
+Las respuestas llevan ETag y Cache-Control para que el navegador haga GET
+condicionales y reciba 304 sin que se serialice nada.
+
+También mantiene en memoria los índices nombre -> id de cada catálogo para
+resolver los valores de los formularios sin consultar la base.
+"""
+import hashlib
+import json
+import os
+import threading
+import time
+
+from flask import Response, request
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from models import (OficinaRegional, TipoReporte, EntidadFederativa, Municipio,
+                    TipoAtencion, ActorInterno, TipoProblematica, GradoClasificacion,
+                    EstatusGeneral)
+
+TTL_SEGUNDOS = int(os.environ.get('CATALOGOS_CACHE_TTL', 300))
+
+MODELOS_CATALOGO = (OficinaRegional, TipoReporte, EntidadFederativa, Municipio,
+                    TipoAtencion, ActorInterno, TipoProblematica, GradoClasificacion,
+                    EstatusGeneral)
+
+_TABLAS_CATALOGO = {modelo.__tablename__ for modelo in MODELOS_CATALOGO}
+
+_versiones = {tabla: 0 for tabla in _TABLAS_CATALOGO}
+_entradas = {}
+_indices = {}
+_lock = threading.Lock()
+
+
+# ========== SERIALIZACIÓN DE CADA CATÁLOGO ==========
+
+def _oficinas_regionales():
+    return [{'id': o.id, 'nombre': o.nombre, 'abreviacion': o.abreviatura}
+            for o in OficinaRegional.query.all()]
+
+def _tipos_reporte():
+    return [{'id': t.id, 'nombre': t.nombre} for t in TipoReporte.query.all()]
+
+def _entidades_federativas():
+    return [{'id': e.id, 'nombre': e.nombre} for e in EntidadFederativa.query.all()]
+
+def _municipios(entidad_id=None):
+    if entidad_id is None:
+        return [{'id': m.id, 'nombre': m.nombre, 'entidad_federativa_id': m.entidad_federativa_id}
+                for m in Municipio.query.all()]
+    return [{'id': m.id, 'nombre': m.nombre}
+            for m in Municipio.query.filter_by(entidad_federativa_id=entidad_id).all()]
+
+def _actores_internos():
+    return [{'id': a.id, 'nombre': a.nombre} for a in ActorInterno.query.all()]
+
+def _tipos_atencion():
+    return [{'id': t.id, 'nombre': t.nombre} for t in TipoAtencion.query.all()]
+
+# nombre del catálogo -> (función que lo carga, tablas de las que depende)
+CATALOGOS = {
+    'oficinas_regionales': (_oficinas_regionales, ('cat_oficina_regional',)),
+    'tipos_reporte': (_tipos_reporte, ('cat_tipo_reporte',)),
+    'entidades_federativas': (_entidades_federativas, ('cat_entidad_federativa',)),
+    'municipios': (_municipios, ('cat_municipio',)),
+    'actores_internos': (_actores_internos, ('cat_actor_interno',)),
+    'tipos_atencion': (_tipos_atencion, ('cat_tipo_atencion',)),
+}
+
+_INDIVIDUALES = dict(CATALOGOS)
+
+def _bundle():
+    return {nombre: cargar() for nombre, (cargar, _) in _INDIVIDUALES.items()}
+
+CATALOGOS['bundle'] = (_bundle, tuple(sorted({t for _, tablas in _INDIVIDUALES.values() for t in tablas})))
+
+
+# ========== CACHÉ ==========
+
+def version(tablas):
+    """Sello de versión combinado de una o varias tablas de catálogo"""
+    return tuple(_versiones[tabla] for tabla in tablas)
+
+
+def obtener(nombre, *args):
+    """
+    Regresa (cuerpo_json, etag) del catálogo, desde la caché si la entrada
+    sigue vigente y su versión coincide con la actual.
+    """
+    cargar, tablas = CATALOGOS[nombre]
+    clave = (nombre,) + args
+    sello = version(tablas)
+    ahora = time.monotonic()
+
+    entrada = _entradas.get(clave)
+    if entrada and entrada[0] == sello and entrada[1] > ahora:
+        return entrada[2], entrada[3]
+
+    cuerpo = json.dumps(cargar(*args), ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+    etag = hashlib.sha1(cuerpo).hexdigest()
+    with _lock:
+        _entradas[clave] = (sello, ahora + TTL_SEGUNDOS, cuerpo, etag)
+    return cuerpo, etag
+
+
+def respuesta(nombre, *args):
+    """Respuesta HTTP del catálogo con ETag; 304 si el cliente ya tiene la versión"""
+    cuerpo, etag = obtener(nombre, *args)
+
+    if request.if_none_match.contains(etag):
+        resp = Response(status=304)
+    else:
+        resp = Response(cuerpo, mimetype='application/json')
+    resp.set_etag(etag)
+    resp.cache_control.private = True
+    resp.cache_control.no_cache = True
+    return resp
+
+
+def invalidar(tablas=None):
+    """Sube la versión de las tablas indicadas (o de todas) y descarta sus entradas"""
+    tablas = set(tablas or _TABLAS_CATALOGO)
+    with _lock:
+        for tabla in tablas:
+            _versiones[tabla] += 1
+        for clave in [c for c in _entradas if tablas & set(CATALOGOS[c[0]][1])]:
+            del _entradas[clave]
+        for tabla in tablas:
+            _indices.pop(tabla, None)
+
+
+# ========== RESOLUCIÓN NOMBRE -> ID ==========
+
+class CatalogoError(ValueError):
+    """El valor recibido no corresponde a ningún registro del catálogo"""
+
+
+def _normalizar(nombre):
+    return ' '.join(str(nombre).split()).casefold()
+
+
+def _indice(modelo):
+    """
+    Índice en memoria del catálogo: {clave_normalizada: (id, abreviatura)}.
+    Para municipios la clave es (entidad_federativa_id, nombre), porque el
+    nombre solo es único dentro de su entidad.
+    """
+    tabla = modelo.__tablename__
+    sello = _versiones[tabla]
+    ahora = time.monotonic()
+
+    entrada = _indices.get(tabla)
+    if entrada and entrada[0] == sello and entrada[1] > ahora:
+        return entrada[2]
+
+    columnas = [modelo.id, modelo.nombre]
+    if hasattr(modelo, 'abreviatura'):
+        columnas.append(modelo.abreviatura)
+    if modelo is Municipio:
+        columnas.append(Municipio.entidad_federativa_id)
+
+    indice = {}
+    for fila in modelo.query.with_entities(*columnas).all():
+        clave = _normalizar(fila.nombre)
+        if modelo is Municipio:
+            clave = (fila.entidad_federativa_id, clave)
+        indice[clave] = (fila.id, getattr(fila, 'abreviatura', None))
+
+    with _lock:
+        _indices[tabla] = (sello, ahora + TTL_SEGUNDOS, indice)
+    return indice
+
+
+def resolver(modelo, nombre, campo, entidad_federativa_id=None):
+    """
+    Regresa (id, abreviatura) del registro del catálogo con ese nombre.
+    Lanza CatalogoError con un mensaje listo para mostrar si no existe.
+    """
+    clave = _normalizar(nombre)
+    if modelo is Municipio:
+        clave = (entidad_federativa_id, clave)
+
+    encontrado = _indice(modelo).get(clave)
+    if not encontrado:
+        raise CatalogoError(f'El valor "{nombre}" no es válido para el campo {campo}')
+    return encontrado
+
+
+def resolver_id(modelo, nombre, campo, entidad_federativa_id=None):
+    """Atajo de resolver() que solo regresa el id"""
+    return resolver(modelo, nombre, campo, entidad_federativa_id)[0]
+
+
+# ========== INVALIDACIÓN AUTOMÁTICA POR SESIÓN ==========
+
+@event.listens_for(Session, 'after_flush')
+def _registrar_escrituras(session, flush_context):
+    tablas = session.info.setdefault('catalogos_modificados', set())
+    for objeto in list(session.new) + list(session.dirty) + list(session.deleted):
+        tabla = getattr(objeto, '__tablename__', None)
+        if tabla in _TABLAS_CATALOGO:
+            tablas.add(tabla)
+
+
+@event.listens_for(Session, 'after_commit')
+def _invalidar_al_confirmar(session):
+    tablas = session.info.pop('catalogos_modificados', None)
+    if tablas:
+        invalidar(tablas)
+
+
+@event.listens_for(Session, 'after_rollback')
+def _descartar_escrituras(session):
+    session.info.pop('catalogos_modificados', None)
@@ -0,0 +1,163 @@
+"""
+Configuración del pool de conexiones a la base de datos.
+
+Todos los parámetros se leen de variables de entorno para ajustarlos por
+despliegue (cada worker de gunicorn tiene su propio pool, así que el total de
+conexiones es workers × (DB_POOL_SIZE + DB_MAX_OVERFLOW)):
+
+    DB_POOL_SIZE       conexiones permanentes por proceso (10)
+    DB_MAX_OVERFLOW    conexiones extra en picos (20)
+    DB_POOL_TIMEOUT    segundos de espera por una conexión libre (30)
+    DB_POOL_RECYCLE    segundos antes de reciclar una conexión (1800); debe ser
+                       menor que wait_timeout de MySQL para evitar
+                       "MySQL server has gone away" tras periodos inactivos
+    DB_POOL_PRE_PING   valida la conexión antes de usarla (true)
+    DB_DRIVER          'mysqlclient' para usar el driver en C (MySQLdb) en lugar
+                       de mysql-connector; si no está instalado se conserva el
+                       de la URL
+
+En SQLite (desarrollo y pruebas) las conexiones usan journal_mode=WAL para
+que las lecturas largas no bloqueen las escrituras de otras conexiones, como
+el avance de la cola de trabajos. Además la transacción se abre con un BEGIN
+explícito: el driver sqlite3 no lo emite antes de un SAVEPOINT, y sin él el
+RELEASE de begin_nested() confirmaría la transacción completa.
+
+El pool registra cuánto esperan las peticiones por una conexión; metricas()
+regresa esos datos junto con el estado actual del pool.
+"""
+import os
+import sqlite3
+import threading
+import time
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from sqlalchemy.engine import make_url
+from sqlalchemy.pool import Pool, QueuePool
+
+
+def _entero(nombre, default):
+    return int(os.environ.get(nombre, default))
+
+
+def _booleano(nombre, default):
+    return os.environ.get(nombre, str(default)).strip().lower() in ('1', 'true', 'si', 'sí', 'yes')
+
+
+class QueuePoolMedido(QueuePool):
+    """QueuePool que acumula el tiempo de espera al obtener una conexión"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._lock_metricas = threading.Lock()
+        self.solicitudes = 0
+        self.espera_total = 0.0
+        self.espera_maxima = 0.0
+        self.agotado = 0
+
+    def _do_get(self):
+        inicio = time.perf_counter()
+        try:
+            return super()._do_get()
+        except Exception:
+            with self._lock_metricas:
+                self.agotado += 1
+            raise
+        finally:
+            espera = time.perf_counter() - inicio
+            with self._lock_metricas:
+                self.solicitudes += 1
+                self.espera_total += espera
+                self.espera_maxima = max(self.espera_maxima, espera)
+
+
+def url_base_datos(url):
+    """Cambia el driver a mysqlclient si DB_DRIVER lo pide y está disponible"""
+    if os.environ.get('DB_DRIVER', '').lower() != 'mysqlclient':
+        return url
+
+    url_parseada = make_url(url)
+    if url_parseada.get_backend_name() != 'mysql':
+        return url
+    try:
+        import MySQLdb  # noqa: F401
+    except ImportError:
+        print("✗ DB_DRIVER=mysqlclient pero MySQLdb no está instalado; se usa el driver de la URL")
+        return url
+    return url_parseada.set(drivername='mysql+mysqldb').render_as_string(hide_password=False)
+
+
+def opciones_engine(url):
+    """Valor para SQLALCHEMY_ENGINE_OPTIONS según la URL y el entorno"""
+    url_parseada = make_url(url)
+    opciones = {
+        'pool_pre_ping': _booleano('DB_POOL_PRE_PING', True),
+        'pool_recycle': _entero('DB_POOL_RECYCLE', 1800),
+    }
+
+    # SQLite en memoria usa un pool de una sola conexión por hilo
+    if url_parseada.get_backend_name() == 'sqlite' and url_parseada.database in (None, '', ':memory:'):
+        return opciones
+
+    opciones.update(
+        poolclass=QueuePoolMedido,
+        pool_size=_entero('DB_POOL_SIZE', 10),
+        max_overflow=_entero('DB_MAX_OVERFLOW', 20),
+        pool_timeout=_entero('DB_POOL_TIMEOUT', 30),
+    )
+    return opciones
+
+
+@event.listens_for(Engine, 'connect')
+def _sqlite_wal(conexion_dbapi, registro):
+    if isinstance(conexion_dbapi, sqlite3.Connection):
+        cursor = conexion_dbapi.cursor()
+        cursor.execute('PRAGMA journal_mode=WAL')
+        cursor.close()
+        # El BEGIN lo emite _sqlite_begin, no el driver
+        conexion_dbapi.isolation_level = None
+
+
+@event.listens_for(Engine, 'begin')
+def _sqlite_begin(conexion):
+    if conexion.dialect.name == 'sqlite':
+        conexion.exec_driver_sql('BEGIN')
+
+
+_invalidaciones = {'total': 0}
+
+
+@event.listens_for(Pool, 'invalidate')
+def _conexion_invalidada(conexion_dbapi, registro, excepcion):
+    """Cuenta las desconexiones detectadas por pre-ping o por errores de la base"""
+    _invalidaciones['total'] += 1
+
+
+def metricas(engine):
+    """Estado del pool del engine y tiempos de espera acumulados"""
+    pool = engine.pool
+    datos = {
+        'driver': engine.dialect.driver,
+        'pool': type(pool).__name__,
+        'invalidadas': _invalidaciones['total'],
+    }
+    if not isinstance(pool, QueuePool):
+        return datos
+
+    datos.update({
+        'tamano': pool.size(),
+        'en_uso': pool.checkedout(),
+        'disponibles': pool.checkedin(),
+        'overflow': pool.overflow(),
+        'max_overflow': pool._max_overflow,
+        'timeout': pool.timeout(),
+    })
+    if isinstance(pool, QueuePoolMedido):
+        with pool._lock_metricas:
+            datos.update({
+                'solicitudes': pool.solicitudes,
+                'espera_promedio_ms': round(pool.espera_total * 1000 / pool.solicitudes, 3) if pool.solicitudes else 0,
+                'espera_maxima_ms': round(pool.espera_maxima * 1000, 3),
+                'agotado': pool.agotado,
+            })
+    return datos
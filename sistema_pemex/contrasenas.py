@@ -0,0 +1,104 @@
+"""
+Política de hash de contraseñas.
+
+El algoritmo y su costo se toman del entorno; generar() produce hashes con
+los parámetros vigentes y requiere_rehash() indica si un hash guardado usa
+otros, para que login() lo regenere al validar la contraseña en claro.
+
+verificar() calcula el hash en un pool acotado de hilos: en el cambio de
+turno cientos de capturistas inician sesión a la vez y, sin límite, cada
+petición pone un hash de CPU intensiva a competir con las demás. Con el
+pool a lo más PASSWORD_HASH_HILOS hashes corren al mismo tiempo por proceso
+(hashlib libera el GIL mientras calcula) y, si ya hay PASSWORD_HASH_COLA
+verificaciones esperando, la nueva se rechaza con HashSaturado en lugar de
+retener el hilo del servidor.
+
+Variables de entorno:
+    PASSWORD_HASH_ALGORITMO  scrypt (default), pbkdf2:sha256 o pbkdf2:sha512
+    PASSWORD_HASH_COSTO      N de scrypt (potencia de 2, default 32768) o
+                             iteraciones de pbkdf2 (default 1000000)
+    PASSWORD_HASH_HILOS      hashes simultáneos por proceso (default: núcleos)
+    PASSWORD_HASH_COLA       verificaciones en espera antes de rechazar (default 64)
+"""
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from werkzeug.security import generate_password_hash, check_password_hash
+
+COSTO_DEFAULT = {'scrypt': 32768, 'pbkdf2': 1000000}
+
+_config = {}
+_pool = None
+_pool_pid = None
+_cola = None
+_lock = threading.Lock()
+
+
+class HashSaturado(RuntimeError):
+    """Hay demasiadas verificaciones de contraseña en espera"""
+
+
+def configurar(algoritmo=None, costo=None, hilos=None, cola=None):
+    """Fija la política; los argumentos omitidos se toman del entorno"""
+    global _pool, _pool_pid, _cola
+    algoritmo = (algoritmo or os.environ.get('PASSWORD_HASH_ALGORITMO', 'scrypt')).strip().lower()
+    familia = algoritmo.split(':')[0]
+    if familia not in COSTO_DEFAULT:
+        raise ValueError(f"Algoritmo de hash no soportado: {algoritmo}")
+    costo = int(costo or os.environ.get('PASSWORD_HASH_COSTO') or COSTO_DEFAULT[familia])
+    hilos = int(hilos or os.environ.get('PASSWORD_HASH_HILOS') or os.cpu_count() or 1)
+    cola = int(cola or os.environ.get('PASSWORD_HASH_COLA') or 64)
+
+    if familia == 'scrypt':
+        metodo = f'scrypt:{costo}:8:1'
+    else:
+        metodo = f"pbkdf2:{algoritmo.partition(':')[2] or 'sha256'}:{costo}"
+
+    with _lock:
+        if _pool is not None:
+            _pool.shutdown(wait=False)
+        _config.update(metodo=metodo, hilos=hilos, cola=cola)
+        _pool, _pool_pid = None, None
+        _cola = threading.BoundedSemaphore(hilos + cola)
+    return metodo
+
+
+def metodo():
+    """Método vigente en el formato de werkzeug, p. ej. 'scrypt:32768:8:1'"""
+    return _config['metodo']
+
+
+def generar(password):
+    return generate_password_hash(password, method=_config['metodo'])
+
+
+def requiere_rehash(password_hash):
+    """True si el hash guardado se generó con otro algoritmo o costo"""
+    return not password_hash or password_hash.split('$', 1)[0] != _config['metodo']
+
+
+def _obtener_pool():
+    global _pool, _pool_pid
+    with _lock:
+        # Los procesos hijos (trabajos) crean su propio pool
+        if _pool is None or _pool_pid != os.getpid():
+            _pool = ThreadPoolExecutor(max_workers=_config['hilos'], thread_name_prefix='hash-contrasena')
+            _pool_pid = os.getpid()
+        return _pool
+
+
+def verificar(password_hash, password):
+    """Compara la contraseña con el hash en el pool; lanza HashSaturado si la cola está llena"""
+    if not password_hash:
+        return False
+    cola = _cola
+    if not cola.acquire(blocking=False):
+        raise HashSaturado('Demasiados inicios de sesión simultáneos, intenta de nuevo en unos segundos')
+    try:
+        return _obtener_pool().submit(check_password_hash, password_hash, password).result()
+    finally:
+        cola.release()
+
+
+configurar()
@@ -0,0 +1,252 @@
+"""
+Avances mensuales y estatus de cumplimiento de los compromisos.
+
+SeguimientoCompromiso.avances_mensuales sigue siendo el JSON que se captura;
+cada cambio se refleja en la misma transacción (eventos de sesión) en
+avances_mensuales_compromiso, una fila (seguimiento_id, anio, mes,
+porcentaje) por mes, y el compromiso queda marcado en
+cumplimiento_pendientes.
+
+calcular() recalcula estatus_cumplimiento_final_id por páginas de
+compromisos: el mayor avance de cada uno se agrega en SQL sobre la llave
+primaria de la tabla normalizada (sin json.loads por fila) y la
+clasificación y la comparación con el estatus actual se hacen sobre
+arreglos de NumPy para toda la página. Por defecto solo procesa los
+compromisos marcados desde la corrida anterior. Sin NumPy se usa el mismo
+cálculo en Python puro.
+
+Los estatus calculados son registros de cat_estatus_general con
+tipo='cumplimiento' y, por defecto, los nombres que muestra el formulario
+de seguimiento: 'Sin iniciar', 'En proceso' y 'Cumplido'. Si el catálogo
+usa otros nombres se indican en CUMPLIMIENTO_ESTATUS, separados por comas
+y en ese orden (sin avance, avance parcial, 100 %).
+"""
+import json
+import os
+from datetime import date
+
+from sqlalchemy import event, func, select, delete, insert, update, inspect as sa_inspect
+from sqlalchemy.orm import Session
+
+from models import db, SeguimientoCompromiso, AvanceMensualCompromiso, CumplimientoPendiente, EstatusGeneral
+
+LOTE_CALCULO = 10000
+
+# Clases de estatus según el mayor avance registrado, la misma regla y los
+# mismos nombres que calcularEstatusFinal() en seguimiento_acuerdos.html
+SIN_AVANCE, PARCIAL, CUMPLIDO = 0, 1, 2
+ESTATUS_CALCULADO = tuple(nombre.strip() for nombre in
+                          os.environ.get('CUMPLIMIENTO_ESTATUS', 'Sin iniciar,En proceso,Cumplido').split(','))
+if len(ESTATUS_CALCULADO) != 3:
+    raise ValueError('CUMPLIMIENTO_ESTATUS debe tener tres nombres: sin avance, parcial y cumplido')
+
+
+class CumplimientoError(ValueError):
+    """El catálogo de estatus no permite calcular el cumplimiento"""
+
+
+# ========== AVANCES NORMALIZADOS ==========
+
+def parsear_avances(texto, anio):
+    """
+    Lista ordenada de (anio, mes, porcentaje) a partir del JSON de
+    avances_mensuales. Acepta las claves 'MM', 'mes_M' (formulario) y
+    'AAAA-MM'; las dos primeras se asignan a `anio`. Los valores no numéricos
+    o fuera de rango se omiten.
+    """
+    if not texto:
+        return []
+    try:
+        datos = json.loads(texto)
+    except ValueError:
+        return []
+    if not isinstance(datos, dict):
+        return []
+
+    avances = {}
+    for clave, valor in datos.items():
+        clave = str(clave).strip().lower()
+        if clave.startswith('mes_'):
+            clave = clave[4:]
+        partes = clave.split('-')
+        try:
+            periodo = (int(partes[0]), int(partes[1])) if len(partes) == 2 else (anio, int(clave))
+            porcentaje = int(valor)
+        except (TypeError, ValueError):
+            continue
+        if 1 <= periodo[1] <= 12 and 0 <= porcentaje <= 100:
+            avances[periodo] = porcentaje
+    return [(a, m, p) for (a, m), p in sorted(avances.items())]
+
+
+def _filas(compromisos):
+    """Filas de avances_mensuales_compromiso para (id, avances_mensuales, fecha_creacion)"""
+    filas = []
+    for seguimiento_id, texto, creado in compromisos:
+        anio = creado.year if creado else date.today().year
+        filas.extend({'seguimiento_id': seguimiento_id, 'anio': a, 'mes': m, 'porcentaje': p}
+                     for a, m, p in parsear_avances(texto, anio))
+    return filas
+
+
+def _marcar(conexion, ids):
+    # Borrar e insertar: si calcular() tiene bloqueada la marca, se espera a
+    # que confirme y la marca nueva queda para la siguiente corrida
+    conexion.execute(delete(CumplimientoPendiente).where(CumplimientoPendiente.seguimiento_id.in_(ids)))
+    conexion.execute(insert(CumplimientoPendiente), [{'seguimiento_id': i} for i in ids])
+
+
+def _reindexar(conexion, compromisos):
+    ids = [c[0] for c in compromisos]
+    conexion.execute(delete(AvanceMensualCompromiso).where(AvanceMensualCompromiso.seguimiento_id.in_(ids)))
+    filas = _filas(compromisos)
+    if filas:
+        conexion.execute(insert(AvanceMensualCompromiso), filas)
+    _marcar(conexion, ids)
+
+
+def reconstruir(lote=LOTE_CALCULO):
+    """Regenera los avances normalizados desde el JSON y recalcula todos los estatus"""
+    conexion = db.session.connection()
+    conexion.execute(delete(AvanceMensualCompromiso))
+    conexion.execute(delete(CumplimientoPendiente))
+
+    total, ultimo = 0, 0
+    while True:
+        pagina = conexion.execute(
+            select(SeguimientoCompromiso.id, SeguimientoCompromiso.avances_mensuales,
+                   SeguimientoCompromiso.fecha_creacion)
+            .where(SeguimientoCompromiso.id > ultimo)
+            .order_by(SeguimientoCompromiso.id).limit(lote)
+        ).all()
+        if not pagina:
+            break
+        filas = _filas(pagina)
+        if filas:
+            conexion.execute(insert(AvanceMensualCompromiso), filas)
+        total += len(filas)
+        ultimo = pagina[-1][0]
+    db.session.commit()
+
+    calcular(completo=True, lote=lote)
+    return total
+
+
+def _avances_cambiaron(objeto):
+    return sa_inspect(objeto).attrs.avances_mensuales.history.has_changes()
+
+
+@event.listens_for(Session, 'after_flush')
+def _sincronizar_avances(session, flush_context):
+    por_indexar = [o for o in session.new if isinstance(o, SeguimientoCompromiso)]
+    por_indexar += [o for o in session.dirty if isinstance(o, SeguimientoCompromiso) and _avances_cambiaron(o)]
+    por_borrar = [o.id for o in session.deleted if isinstance(o, SeguimientoCompromiso)]
+    if not por_indexar and not por_borrar:
+        return
+
+    conexion = session.connection()
+    if por_indexar:
+        _reindexar(conexion, [(o.id, o.avances_mensuales, o.fecha_creacion) for o in por_indexar])
+    if por_borrar:
+        conexion.execute(delete(AvanceMensualCompromiso)
+                         .where(AvanceMensualCompromiso.seguimiento_id.in_(por_borrar)))
+        conexion.execute(delete(CumplimientoPendiente)
+                         .where(CumplimientoPendiente.seguimiento_id.in_(por_borrar)))
+
+
+# ========== CÁLCULO DEL ESTATUS ==========
+
+def _ids_estatus():
+    """Ids de cat_estatus_general para SIN_AVANCE, PARCIAL y CUMPLIDO"""
+    nombres = dict(db.session.query(EstatusGeneral.nombre, EstatusGeneral.id)
+                   .filter(EstatusGeneral.tipo == 'cumplimiento'))
+    faltantes = [nombre for nombre in ESTATUS_CALCULADO if nombre not in nombres]
+    if faltantes:
+        raise CumplimientoError(
+            f"Faltan estatus de cumplimiento en el catálogo: {', '.join(faltantes)}. Agrégalos a "
+            f"cat_estatus_general con tipo='cumplimiento' o indica los existentes en CUMPLIMIENTO_ESTATUS")
+    return [nombres[nombre] for nombre in ESTATUS_CALCULADO]
+
+
+def _cambios(filas, estatus):
+    """
+    {estatus_id: [ids]} de los compromisos cuyo estatus calculado difiere del
+    actual. `filas` son (id, estatus actual, mayor avance) y `estatus` los ids
+    de SIN_AVANCE, PARCIAL y CUMPLIDO.
+    """
+    try:
+        import numpy as np
+    except ImportError:
+        cambios = {}
+        for seguimiento_id, actual, maximo in filas:
+            maximo = maximo or 0
+            nuevo = estatus[CUMPLIDO if maximo >= 100 else PARCIAL if maximo > 0 else SIN_AVANCE]
+            if nuevo != actual:
+                cambios.setdefault(nuevo, []).append(seguimiento_id)
+        return cambios
+
+    # None (sin estatus o sin avances) queda como NaN
+    datos = np.array([tuple(fila) for fila in filas], dtype=np.float64).reshape(-1, 3)
+    maximos = np.nan_to_num(datos[:, 2])
+    clases = np.where(maximos >= 100, CUMPLIDO, np.where(maximos > 0, PARCIAL, SIN_AVANCE))
+    nuevos = np.asarray(estatus, dtype=np.float64)[clases]
+    cambio = nuevos != datos[:, 1]
+    return {estatus_id: datos[cambio & (nuevos == estatus_id), 0].astype(np.int64).tolist()
+            for estatus_id in estatus if np.any(cambio & (nuevos == estatus_id))}
+
+
+def calcular(completo=False, lote=LOTE_CALCULO):
+    """
+    Recalcula estatus_cumplimiento_final_id. Por defecto solo los
+    compromisos con avances modificados desde la corrida anterior; con
+    completo=True, todos. Confirma por página y regresa
+    {'calculados': n, 'cambiados': m}.
+    """
+    estatus = _ids_estatus()
+    calculados = cambiados = 0
+    ultimo = 0
+
+    while True:
+        if completo:
+            ids = db.session.execute(
+                select(SeguimientoCompromiso.id).where(SeguimientoCompromiso.id > ultimo)
+                .order_by(SeguimientoCompromiso.id).limit(lote)
+            ).scalars().all()
+        else:
+            ids = db.session.execute(
+                select(CumplimientoPendiente.seguimiento_id).where(CumplimientoPendiente.seguimiento_id > ultimo)
+                .order_by(CumplimientoPendiente.seguimiento_id).limit(lote).with_for_update()
+            ).scalars().all()
+        if not ids:
+            break
+        ultimo = ids[-1]
+
+        # Rango contiguo de la llave primaria en la corrida completa; lista de ids en la incremental
+        if completo:
+            en_pagina = lambda columna: columna.between(ids[0], ultimo)
+        else:
+            en_pagina = lambda columna: columna.in_(ids)
+
+        # El mayor avance de cada compromiso se agrega sobre la llave primaria de los avances
+        filas = db.session.execute(
+            select(SeguimientoCompromiso.id, SeguimientoCompromiso.estatus_cumplimiento_final_id,
+                   func.max(AvanceMensualCompromiso.porcentaje))
+            .outerjoin(AvanceMensualCompromiso, AvanceMensualCompromiso.seguimiento_id == SeguimientoCompromiso.id)
+            .where(en_pagina(SeguimientoCompromiso.id))
+            .group_by(SeguimientoCompromiso.id)
+        ).all()
+
+        # El estatus calculado no cuenta como edición del compromiso
+        for estatus_id, seguimiento_ids in _cambios(filas, estatus).items():
+            db.session.execute(
+                update(SeguimientoCompromiso.__table__)
+                .where(SeguimientoCompromiso.id.in_(seguimiento_ids))
+                .values(estatus_cumplimiento_final_id=estatus_id,
+                        fecha_actualizacion=SeguimientoCompromiso.fecha_actualizacion)
+            )
+            cambiados += len(seguimiento_ids)
+        db.session.execute(delete(CumplimientoPendiente).where(en_pagina(CumplimientoPendiente.seguimiento_id)))
+        db.session.commit()
+        calculados += len(filas)
+
+    return {'calculados': calculados, 'cambiados': cambiados}
@@ -0,0 +1,406 @@
+"""
+Generador determinista de datos sintéticos para desarrollo y benchmarks.
+
+Llena todos los modelos de models.py: catálogos (oficinas → entidades →
+municipios y el resto de cat_*), usuarios, reportes con sus tipos de atención,
+seguimientos de compromisos e historial, y acciones preventivas con sus
+seguimientos. Con la misma semilla y los mismos parámetros se generan
+exactamente los mismos datos; las fechas se calculan a partir de
+FECHA_BASE y no de la fecha del día.
+
+Las filas se insertan con executemany por lotes y con ids explícitos, así
+que 5M de registros no requieren más memoria que un lote. Al terminar se
+sincronizan las secuencias de folios y se reconstruyen el resumen mensual,
+el índice de búsqueda y el índice geoespacial.
+"""
+import json
+import random
+from datetime import date, datetime, timedelta
+
+from models import (db, Usuario, OficinaRegional, TipoReporte, EntidadFederativa, Municipio,
+                    TipoAtencion, ActorInterno, TipoProblematica, GradoClasificacion, EstatusGeneral,
+                    ReporteAccionPreventiva, SeguimientoCompromiso, HistorialEdicion, ReporteTipoAtencion,
+                    AccionPreventiva, SeguimientoAccion, SecuenciaFolio)
+import catalogos
+import resumen_mensual
+import busqueda
+import geoespacial
+import cumplimiento
+import contrasenas
+import marcas
+import cache_respuestas
+
+SEMILLA_DEFAULT = 2025
+FECHA_BASE = date(2025, 6, 30)
+DIAS_HISTORIA = 3 * 365
+LOTE = 10000
+
+ESCALAS = {
+    'chica': {'acciones': 10000, 'reportes': 10000},
+    'mediana': {'acciones': 100000, 'reportes': 100000},
+    'grande': {'acciones': 1000000, 'reportes': 1000000},
+    'maxima': {'acciones': 5000000, 'reportes': 5000000},
+}
+
+OFICINAS = [
+    ('Oficina Regional Norte', 'ORN'),
+    ('Oficina Regional Centro', 'ORC'),
+    ('Oficina Regional Golfo', 'ORG'),
+    ('Oficina Regional Sur', 'ORS'),
+    ('Oficina Regional Sureste', 'ORSE'),
+]
+TIPOS_REPORTE = [('Acción Preventiva', 'AP'), ('Problemática Social', 'PS'), ('Conflicto', 'CO')]
+TIPOS_ATENCION = ['Mesa de diálogo', 'Recorrido de campo', 'Reunión informativa', 'Gestión institucional',
+                  'Apoyo social', 'Atención de queja', 'Acompañamiento', 'OTRO']
+ACTORES_INTERNOS = ['Seguridad Física', 'Responsabilidad Social', 'Jurídico', 'Operación',
+                    'Comunicación', 'Recursos Humanos', 'Mantenimiento', 'Ductos']
+TIPOS_PROBLEMATICA = ['Bloqueo', 'Toma de instalaciones', 'Manifestación', 'Demanda de empleo',
+                      'Afectación ambiental', 'Derecho de vía', 'Indemnización', 'Seguridad',
+                      'Servicios públicos', 'OTRO']
+GRADOS_CLASIFICACION = ['Bajo', 'Medio', 'Alto']
+ESTATUS = [('En proceso', 'reporte'), ('Atendido', 'reporte'), ('Cerrado', 'reporte'),
+           ('Cumplido', 'cumplimiento'), ('En proceso', 'cumplimiento'), ('Sin iniciar', 'cumplimiento'),
+           ('Alta', 'probabilidad'), ('Media', 'probabilidad'), ('Baja', 'probabilidad')]
+
+ESTADOS_ACCION = ['Registrado', 'En Proceso', 'Completado', 'Cancelado', 'Borrador']
+PESOS_ESTADO = [30, 35, 25, 5, 5]
+NIVELES_IMPACTO = ['Alto', 'Medio', 'Bajo']
+REGIONES = ['Norte', 'Centro', 'Golfo', 'Sur', 'Sureste']
+
+# Vocabulario de las narrativas; las palabras se eligen con distribución de
+# Zipf para que la búsqueda tenga términos frecuentes y raros como en los
+# registros reales
+VOCABULARIO = '''
+    bloqueo acceso instalación comunidad ejido pobladores manifestación toma pozo ducto derrame
+    fuga contaminación río laguna pesca pescadores cultivo parcela indemnización afectación daño
+    vivienda camino carretera puente obra empleo contratación proveedores mano obra local apoyo
+    escuela clínica agua potable drenaje electrificación alumbrado líderes autoridades municipio
+    asamblea reunión diálogo mesa acuerdo minuta compromiso gestión seguimiento recorrido inspección
+    vigilancia seguridad protesta paro cierre válvula batería compresión terminal almacenamiento
+    refinería plataforma gasoducto oleoducto derecho vía servidumbre predio propietario avalúo pago
+    adeudo reclamación demanda amparo denuncia ministerio protección civil ambiental remediación
+    limpieza suelo emisiones ruido olor quema antorcha tránsito pesado maquinaria excavación
+    señalización capacitación brigada médica donativo combustible asfalto despensa festividad
+    cooperativa transportistas sindicato trabajadores eventuales jornaleros comisariado delegado
+    regidor presidente municipal gobernación estatal federal secretaría coordinación comunicación
+'''.split()
+PESOS_VOCABULARIO = [1 / rango for rango in range(1, len(VOCABULARIO) + 1)]
+
+
+class _Catalogos:
+    """Ids de los catálogos ya insertados, para elegirlos al azar"""
+
+    def __init__(self):
+        self.oficinas = [(o.id, o.abreviatura) for o in OficinaRegional.query.order_by(OficinaRegional.id)]
+        self.tipos_reporte = [(t.id, t.abreviatura) for t in TipoReporte.query.order_by(TipoReporte.id)]
+        self.entidades = {}
+        for entidad in EntidadFederativa.query.order_by(EntidadFederativa.id):
+            self.entidades.setdefault(entidad.oficina_regional_id, []).append((entidad.id, entidad.nombre))
+        self.municipios = {}
+        for municipio in Municipio.query.order_by(Municipio.id):
+            self.municipios.setdefault(municipio.entidad_federativa_id, []).append((municipio.id, municipio.nombre))
+        self.tipos_atencion = [t.id for t in TipoAtencion.query.order_by(TipoAtencion.id)]
+        self.actores = [a.id for a in ActorInterno.query.order_by(ActorInterno.id)]
+        self.problematicas = [(p.id, p.nombre) for p in TipoProblematica.query.order_by(TipoProblematica.id)]
+        self.grados = [g.id for g in GradoClasificacion.query.order_by(GradoClasificacion.id)]
+        self.estatus = {}
+        for estatus in EstatusGeneral.query.order_by(EstatusGeneral.id):
+            self.estatus.setdefault(estatus.tipo, []).append(estatus.id)
+
+
+# ========== CATÁLOGOS Y USUARIOS ==========
+
+def generar_catalogos(rnd, municipios_por_entidad=40):
+    """Crea los catálogos si están vacíos; 32 entidades repartidas entre las oficinas"""
+    if OficinaRegional.query.first():
+        return
+
+    oficinas = [OficinaRegional(nombre=n, abreviatura=a) for n, a in OFICINAS]
+    db.session.add_all(oficinas)
+    db.session.flush()
+
+    for i in range(32):
+        entidad = EntidadFederativa(nombre=f'Entidad {i + 1:02d}', abreviatura=f'E{i + 1:02d}',
+                                    oficina_regional_id=oficinas[i % len(oficinas)].id)
+        db.session.add(entidad)
+        db.session.flush()
+        db.session.add_all([Municipio(nombre=f'Municipio {i + 1:02d}-{j + 1:03d}', entidad_federativa_id=entidad.id)
+                            for j in range(rnd.randint(municipios_por_entidad // 2, municipios_por_entidad))])
+
+    db.session.add_all([TipoReporte(nombre=n, abreviatura=a) for n, a in TIPOS_REPORTE])
+    db.session.add_all([TipoAtencion(nombre=n) for n in TIPOS_ATENCION])
+    db.session.add_all([ActorInterno(nombre=n) for n in ACTORES_INTERNOS])
+    db.session.add_all([TipoProblematica(nombre=n) for n in TIPOS_PROBLEMATICA])
+    db.session.add_all([GradoClasificacion(nombre=n) for n in GRADOS_CLASIFICACION])
+    db.session.add_all([EstatusGeneral(nombre=n, tipo=t) for n, t in ESTATUS])
+    db.session.commit()
+
+
+def generar_usuarios(total=20, password='sintetico'):
+    """Usuarios sintetico_NNN; el primero es administrador. Regresa sus ids"""
+    existentes = [u.id for u in Usuario.query.filter(Usuario.username.like('sintetico_%')).order_by(Usuario.id)]
+    if existentes:
+        return existentes
+
+    # Un solo hash para todos: generarlo por usuario domina el tiempo de carga
+    password_hash = contrasenas.generar(password)
+    db.session.execute(Usuario.__table__.insert(), [{
+        'username': f'sintetico_{i:03d}',
+        'email': f'sintetico_{i:03d}@ejemplo.local',
+        'nombre': 'Usuario',
+        'apellido_paterno': f'Sintético {i:03d}',
+        'password_hash': password_hash,
+        'rol': 'Administrador' if i == 1 else 'Capturista',
+        'activo': True,
+        'fecha_creacion': datetime.combine(FECHA_BASE - timedelta(days=DIAS_HISTORIA), datetime.min.time()),
+    } for i in range(1, total + 1)])
+    db.session.commit()
+    return [u.id for u in Usuario.query.filter(Usuario.username.like('sintetico_%')).order_by(Usuario.id)]
+
+
+# ========== REGISTROS ==========
+
+def _siguiente_id(modelo):
+    return (db.session.query(db.func.max(modelo.id)).scalar() or 0) + 1
+
+
+def _fecha(rnd):
+    return FECHA_BASE - timedelta(days=rnd.randrange(DIAS_HISTORIA))
+
+
+def _frase(rnd, palabras=12):
+    return ' '.join(rnd.choices(VOCABULARIO, PESOS_VOCABULARIO, k=palabras)).capitalize() + '.'
+
+
+def _insertar(modelo, filas):
+    if filas:
+        db.session.execute(modelo.__table__.insert(), filas)
+        filas.clear()
+
+
+def generar_acciones(rnd, total, usuarios, secuencias, lote=LOTE, progreso=None):
+    """Acciones preventivas y 0-3 seguimientos por acción"""
+    acciones, seguimientos = [], []
+    accion_id = _siguiente_id(AccionPreventiva)
+    seguimiento_id = _siguiente_id(SeguimientoAccion)
+
+    for i in range(total):
+        fecha = _fecha(rnd)
+        estado = rnd.choices(ESTADOS_ACCION, PESOS_ESTADO)[0]
+        secuencias[('AP', '', fecha.year)] = numero = secuencias.get(('AP', '', fecha.year), 0) + 1
+        usuario_id = rnd.choice(usuarios)
+        creada = datetime.combine(fecha, datetime.min.time()) + timedelta(seconds=rnd.randrange(86400))
+        avance = {'Completado': 100, 'Registrado': 0, 'Borrador': 0}.get(estado, rnd.randrange(5, 100, 5))
+
+        acciones.append({
+            'id': accion_id,
+            'folio': f'AP-{fecha.year}-{numero:05d}',
+            'fecha_registro': fecha,
+            'region': rnd.choice(REGIONES),
+            'activo': f'Activo {rnd.randint(1, 40):02d}',
+            'instalacion': f'Instalación {rnd.randint(1, 400):03d}',
+            'estado': f'Entidad {rnd.randint(1, 32):02d}',
+            'municipio': f'Municipio {rnd.randint(1, 40):03d}',
+            'localidad': f'Localidad {rnd.randint(1, 2000):04d}',
+            'coordenadas_x': round(rnd.uniform(-117.0, -86.7), 6),
+            'coordenadas_y': round(rnd.uniform(14.5, 32.7), 6),
+            'tipo_problematica': rnd.choice(TIPOS_PROBLEMATICA),
+            'descripcion_problematica': _frase(rnd, 20),
+            'actor_social': f'Comunidad {rnd.randint(1, 500)}',
+            'nivel_impacto': rnd.choice(NIVELES_IMPACTO),
+            'accion_preventiva': _frase(rnd, 12),
+            'fecha_inicio': fecha,
+            'fecha_fin': fecha + timedelta(days=rnd.randint(30, 365)),
+            'presupuesto': round(rnd.uniform(10000, 5000000), 2),
+            'responsable': f'Responsable {rnd.randint(1, 300)}',
+            'area_responsable': rnd.choice(ACTORES_INTERNOS),
+            'observaciones': '',
+            'estado_accion': estado,
+            'fecha_ultima_actualizacion': None,
+            'porcentaje_avance': avance,
+            'fecha_creacion': creada,
+            'fecha_actualizacion': creada,
+            'usuario_id': usuario_id,
+        })
+
+        anterior = 'Registrado'
+        for n in range(0 if estado in ('Registrado', 'Borrador') else rnd.randint(1, 3)):
+            nuevo = estado if n == 0 else 'En Proceso'
+            seguimientos.append({
+                'id': seguimiento_id,
+                'accion_id': accion_id,
+                'fecha_seguimiento': fecha + timedelta(days=15 * (n + 1)),
+                'estado_anterior': anterior,
+                'estado_nuevo': nuevo,
+                'porcentaje_avance': avance,
+                'observaciones': 'Seguimiento sintético',
+                'responsable': f'Responsable {rnd.randint(1, 300)}',
+                'fecha_creacion': creada + timedelta(days=15 * (n + 1)),
+                'usuario_id': usuario_id,
+            })
+            anterior = nuevo
+            seguimiento_id += 1
+        if seguimientos:
+            acciones[-1]['fecha_ultima_actualizacion'] = seguimientos[-1]['fecha_seguimiento']
+
+        accion_id += 1
+        if len(acciones) >= lote:
+            _insertar(AccionPreventiva, acciones)
+            _insertar(SeguimientoAccion, seguimientos)
+            db.session.commit()
+            if progreso:
+                progreso('acciones', i + 1)
+
+    _insertar(AccionPreventiva, acciones)
+    _insertar(SeguimientoAccion, seguimientos)
+    db.session.commit()
+
+
+def generar_reportes(rnd, total, usuarios, cat, secuencias, lote=LOTE, progreso=None):
+    """Reportes con tipos de atención, un seguimiento de compromisos y 0-2 ediciones en historial"""
+    reportes, tipos, compromisos, historial = [], [], [], []
+    reporte_id = _siguiente_id(ReporteAccionPreventiva)
+    tipo_id = _siguiente_id(ReporteTipoAtencion)
+    compromiso_id = _siguiente_id(SeguimientoCompromiso)
+    historial_id = _siguiente_id(HistorialEdicion)
+    oficinas = [o for o in cat.oficinas if o[0] in cat.entidades]
+
+    for i in range(total):
+        fecha = _fecha(rnd)
+        oficina_id, oficina_abrev = rnd.choice(oficinas)
+        tipo_reporte_id, tipo_abrev = rnd.choice(cat.tipos_reporte)
+        entidad_id, _ = rnd.choice(cat.entidades[oficina_id])
+        municipio_id, _ = rnd.choice(cat.municipios[entidad_id])
+        clave = (oficina_abrev, tipo_abrev, fecha.year)
+        secuencias[clave] = numero = secuencias.get(clave, 0) + 1
+        secuencias[('REPORTE', 'REGISTRO', 0)] = registro = secuencias.get(('REPORTE', 'REGISTRO', 0), 0) + 1
+        usuario_id = rnd.choice(usuarios)
+        creado = datetime.combine(fecha, datetime.min.time()) + timedelta(seconds=rnd.randrange(86400))
+        atencion = rnd.sample(cat.tipos_atencion, rnd.randint(1, 2))
+        problematica_id, _ = rnd.choice(cat.problematicas)
+
+        reportes.append({
+            'id': reporte_id,
+            'numero_registro': registro,
+            'responsable_captura_id': usuario_id,
+            'oficina_regional_id': oficina_id,
+            'año_reporte': fecha.year,
+            'folio': f'{oficina_abrev}-{tipo_abrev}-{fecha.year}-{numero:03d}',
+            'tipo_reporte_id': tipo_reporte_id,
+            'fecha_reporte': fecha,
+            'entidad_federativa_id': entidad_id,
+            'municipio_id': municipio_id,
+            'fecha_inicio_problematica': fecha - timedelta(days=rnd.randint(0, 60)),
+            'fecha_obtencion_lso': None,
+            'dias_duracion_cierre': rnd.randint(0, 30),
+            'descripcion_evento': _frase(rnd, 25),
+            'exigencia_reclamacion': _frase(rnd, 10),
+            'impacto_no_atender': 'Impacto sintético',
+            'acciones_realizar': 'Acciones sintéticas',
+            'tipos_atencion': json.dumps(atencion),
+            'otro_tipo_atencion': None,
+            'compromisos_acuerdos': _frase(rnd, 10),
+            'grupo_interes_localidad': f'Localidad {rnd.randint(1, 2000):04d}',
+            'representantes_lideres': None,
+            'actor_interno_id': rnd.choice(cat.actores),
+            'otro_actor_interno': None,
+            'actores_externos': None,
+            'instalacion_estrategica': 'N/A',
+            'proyectos_relacionados': 'N/A',
+            'tipo_problematica_id': problematica_id,
+            'otro_tipo_problematica': None,
+            'area_involucrada': None,
+            'grado_clasificacion_id': rnd.choice(cat.grados),
+            'descripcion_estatus_cierre': None,
+            'fecha_estatus_cierre': None,
+            'estatus_actual_id': rnd.choice(cat.estatus['reporte']),
+            'grado_probabilidad_id': rnd.choice(cat.estatus['probabilidad']),
+            'fecha_creacion': creado,
+            'fecha_actualizacion': creado,
+        })
+
+        for tipo_atencion_id in atencion:
+            tipos.append({'id': tipo_id, 'reporte_id': reporte_id, 'tipo_atencion_id': tipo_atencion_id})
+            tipo_id += 1
+
+        compromisos.append({
+            'id': compromiso_id,
+            'reporte_id': reporte_id,
+            'estatus_cumplimiento': 'En seguimiento',
+            'numero_proas': rnd.randint(0, 5),
+            'avances_mensuales': json.dumps({f'{m:02d}': rnd.randrange(0, 101, 10) for m in range(1, 13)}),
+            'estatus_cumplimiento_final_id': rnd.choice(cat.estatus['cumplimiento']),
+            'fecha_creacion': creado,
+            'fecha_actualizacion': creado,
+            'responsable_captura_id': usuario_id,
+        })
+        compromiso_id += 1
+
+        for n in range(rnd.randint(0, 2)):
+            historial.append({
+                'id': historial_id,
+                'reporte_id': reporte_id,
+                'campo_editado': 'descripcion_evento',
+                'valor_anterior': f'Versión {n}',
+                'valor_nuevo': f'Versión {n + 1}',
+                'usuario_id': rnd.choice(usuarios),
+                'fecha_edicion': creado + timedelta(days=n + 1),
+            })
+            historial_id += 1
+
+        reporte_id += 1
+        if len(reportes) >= lote:
+            for modelo, filas in ((ReporteAccionPreventiva, reportes), (ReporteTipoAtencion, tipos),
+                                  (SeguimientoCompromiso, compromisos), (HistorialEdicion, historial)):
+                _insertar(modelo, filas)
+            db.session.commit()
+            if progreso:
+                progreso('reportes', i + 1)
+
+    for modelo, filas in ((ReporteAccionPreventiva, reportes), (ReporteTipoAtencion, tipos),
+                          (SeguimientoCompromiso, compromisos), (HistorialEdicion, historial)):
+        _insertar(modelo, filas)
+    db.session.commit()
+
+
+def _sincronizar_secuencias(secuencias):
+    """Deja cada secuencia de folios en el último número generado"""
+    existentes = {(s.prefijo, s.tipo, s.anio): s for s in SecuenciaFolio.query.all()}
+    for (prefijo, tipo, anio), ultimo in secuencias.items():
+        secuencia = existentes.get((prefijo, tipo, anio))
+        if secuencia:
+            secuencia.ultimo_valor = max(secuencia.ultimo_valor, ultimo)
+        else:
+            db.session.add(SecuenciaFolio(prefijo=prefijo, tipo=tipo, anio=anio, ultimo_valor=ultimo))
+    db.session.commit()
+
+
+def _secuencias_actuales():
+    return {(s.prefijo, s.tipo, s.anio): s.ultimo_valor for s in SecuenciaFolio.query.all()}
+
+
+def generar(acciones=10000, reportes=10000, semilla=SEMILLA_DEFAULT, usuarios=20,
+            municipios_por_entidad=40, lote=LOTE, progreso=None):
+    """
+    Genera el conjunto completo. Se puede llamar sobre una base con datos:
+    los ids y los folios continúan a partir de los existentes.
+    """
+    rnd = random.Random(semilla)
+    generar_catalogos(rnd, municipios_por_entidad)
+    ids_usuarios = generar_usuarios(usuarios)
+    cat = _Catalogos()
+    secuencias = _secuencias_actuales()
+
+    generar_acciones(rnd, acciones, ids_usuarios, secuencias, lote, progreso)
+    generar_reportes(rnd, reportes, ids_usuarios, cat, secuencias, lote, progreso)
+
+    _sincronizar_secuencias(secuencias)
+    resumen_mensual.reconstruir_resumen()
+    busqueda.reconstruir()
+    geoespacial.reconstruir()
+    cumplimiento.reconstruir()
+    marcas.tocar()
+    cache_respuestas.etiquetar('dashboard')
+    db.session.commit()
+    catalogos.invalidar()
+    return ids_usuarios
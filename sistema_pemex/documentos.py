@@ -0,0 +1,404 @@
+"""
+Almacén de documentos y evidencias.
+
+Cada documento se guarda una sola vez, direccionado por el SHA-256 de su
+contenido: dos cuadrillas que suben la misma foto o el mismo PDF comparten el
+archivo y la fila de documentos. documento_1/documento_2 de las acciones y
+evidencia_documento de los seguimientos guardan ese sha256.
+
+Las cargas se reciben por partes (iniciar_carga, recibir_parte,
+completar_carga) o en un solo formulario (guardar_archivo); en ambos casos el
+contenido se copia del flujo de la petición al almacén en bloques de
+TAMANO_BLOQUE, sin tener nunca el archivo completo en memoria. Una carga
+interrumpida se reanuda desde `recibido`. Al completarse, el hash se calcula
+leyendo el archivo parcial en bloques y, si el contenido ya existía, el
+parcial se descarta.
+
+El registro del documento no hace commit: queda en la transacción del
+llamador, de modo que el documento y la acción o seguimiento al que se
+adjunta se confirman o se revierten juntos. Si se revierten, descartar()
+borra el contenido que no quedó registrado. Un contenido repetido reutiliza
+la fila existente, así que nombre_original y tipo_mime son los de la primera
+carga; el nombre con que se subió cada adjunto posterior no se conserva.
+
+El almacén es un objeto con la interfaz de AlmacenLocal (sistema de archivos
+bajo DOCUMENTOS_DIR); un backend de objetos se registra en ALMACENES y se
+elige con DOCUMENTOS_ALMACEN. Las descargas usan send_file con peticiones
+condicionales y de rango (206), o delegan el envío al servidor web con
+X-Sendfile (DOCUMENTOS_X_SENDFILE=1, Apache) o X-Accel-Redirect
+(DOCUMENTOS_X_ACCEL=/prefijo/interno/, nginx).
+
+Las miniaturas de las imágenes se generan en segundo plano (tarea
+'miniatura' de trabajos.py) con Pillow si está instalado.
+"""
+import hashlib
+import io
+import logging
+import os
+import uuid
+from datetime import datetime, timedelta
+from urllib.parse import quote
+
+from flask import current_app, send_file, Response
+from sqlalchemy.exc import IntegrityError
+
+from models import db, Documento, CargaDocumento, AccionPreventiva, SeguimientoAccion
+
+log = logging.getLogger('pemex.documentos')
+
+TAMANO_BLOQUE = 64 * 1024
+TAMANO_PARTE = 8 * 1024 * 1024  # tamaño de parte sugerido al cliente
+LADO_MINIATURA = 320
+VIGENCIA_CARGAS = timedelta(hours=24)
+CACHE_DESCARGA = 365 * 24 * 3600  # el contenido de un sha256 nunca cambia
+
+# El tipo MIME se deduce de la extensión, no del que declara el cliente
+TIPOS_PERMITIDOS = {
+    '.pdf': 'application/pdf',
+    '.jpg': 'image/jpeg',
+    '.jpeg': 'image/jpeg',
+    '.png': 'image/png',
+    '.webp': 'image/webp',
+    '.gif': 'image/gif',
+    '.doc': 'application/msword',
+    '.docx': 'application/vnd.openxmlformats-officedocument.wordprocessingml.document',
+    '.xls': 'application/vnd.ms-excel',
+    '.xlsx': 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+    '.txt': 'text/plain',
+}
+# Se muestran en el navegador; el resto se descarga como adjunto
+TIPOS_EN_LINEA = {'application/pdf', 'image/jpeg', 'image/png', 'image/webp', 'image/gif'}
+
+# Columnas donde se adjunta un documento
+ADJUNTOS = {
+    'documento_1': AccionPreventiva,
+    'documento_2': AccionPreventiva,
+    'evidencia_documento': SeguimientoAccion,
+}
+
+
+class DocumentoError(ValueError):
+    """Carga o documento inválido"""
+
+
+class AlmacenLocal:
+    """
+    Contenido en el sistema de archivos. Un backend de objetos implementa los
+    mismos métodos; ruta_local() regresa None si el contenido no es un
+    archivo local, y la descarga se hace entonces con abrir().
+    """
+
+    nombre = 'local'
+
+    def __init__(self, directorio):
+        self.directorio = directorio
+        os.makedirs(os.path.join(directorio, 'cargas'), exist_ok=True)
+
+    @staticmethod
+    def clave_contenido(sha256):
+        # Dos niveles de directorios para no juntar millones de archivos en uno
+        return f'{sha256[:2]}/{sha256[2:4]}/{sha256}'
+
+    def _ruta(self, clave):
+        return os.path.join(self.directorio, *clave.split('/'))
+
+    def _ruta_carga(self, carga_id):
+        return os.path.join(self.directorio, 'cargas', f'{carga_id}.parcial')
+
+    def existe(self, clave):
+        return os.path.exists(self._ruta(clave))
+
+    def ruta_local(self, clave):
+        return self._ruta(clave)
+
+    def abrir(self, clave):
+        return open(self._ruta(clave), 'rb')
+
+    def borrar(self, clave):
+        try:
+            os.remove(self._ruta(clave))
+        except FileNotFoundError:
+            pass
+
+    def guardar(self, clave, datos):
+        ruta = self._ruta(clave)
+        os.makedirs(os.path.dirname(ruta), exist_ok=True)
+        temporal = f'{ruta}.{uuid.uuid4().hex}.tmp'
+        with open(temporal, 'wb') as archivo:
+            archivo.write(datos)
+        os.replace(temporal, ruta)
+
+    def escribir_parte(self, carga_id, desplazamiento, flujo, maximo):
+        """
+        Copia `flujo` al archivo parcial a partir de `desplazamiento` (lo que
+        hubiera después se descarta: reintento de una parte). Regresa los
+        bytes escritos; lanza DocumentoError si el total pasaría de `maximo`.
+        """
+        ruta = self._ruta_carga(carga_id)
+        escritos = 0
+        with open(ruta, 'r+b' if os.path.exists(ruta) else 'wb') as archivo:
+            archivo.seek(desplazamiento)
+            archivo.truncate()
+            while True:
+                bloque = flujo.read(TAMANO_BLOQUE)
+                if not bloque:
+                    break
+                escritos += len(bloque)
+                if desplazamiento + escritos > maximo:
+                    archivo.truncate(desplazamiento)
+                    raise DocumentoError(f'El documento excede el tamaño máximo de {maximo // (1024 * 1024)} MB')
+                archivo.write(bloque)
+        return escritos
+
+    def consolidar(self, carga_id):
+        """Mueve el parcial a su clave por contenido; regresa (sha256, tamano, clave)"""
+        ruta = self._ruta_carga(carga_id)
+        huella = hashlib.sha256()
+        tamano = 0
+        with open(ruta, 'rb') as archivo:
+            while True:
+                bloque = archivo.read(TAMANO_BLOQUE)
+                if not bloque:
+                    break
+                huella.update(bloque)
+                tamano += len(bloque)
+
+        sha256 = huella.hexdigest()
+        clave = self.clave_contenido(sha256)
+        if self.existe(clave):
+            os.remove(ruta)
+        else:
+            os.makedirs(os.path.dirname(self._ruta(clave)), exist_ok=True)
+            os.replace(ruta, self._ruta(clave))
+        return sha256, tamano, clave
+
+    def descartar_carga(self, carga_id):
+        try:
+            os.remove(self._ruta_carga(carga_id))
+        except FileNotFoundError:
+            pass
+        except OSError:
+            log.warning('No se pudo borrar la carga parcial %s', carga_id, exc_info=True)
+
+
+ALMACENES = {'local': AlmacenLocal}
+
+
+def init_app(app):
+    """Configuración del almacén desde las variables de entorno"""
+    app.config.setdefault('DOCUMENTOS_ALMACEN', os.environ.get('DOCUMENTOS_ALMACEN', 'local'))
+    app.config.setdefault('DOCUMENTOS_DIR', os.environ.get(
+        'DOCUMENTOS_DIR', os.path.join(app.instance_path, 'documentos')))
+    app.config.setdefault('DOCUMENTOS_MAX_MB', int(os.environ.get('DOCUMENTOS_MAX_MB', 100)))
+    app.config.setdefault('DOCUMENTOS_X_SENDFILE',
+                          os.environ.get('DOCUMENTOS_X_SENDFILE', '').strip().lower() in ('1', 'true', 'si', 'sí'))
+    app.config.setdefault('DOCUMENTOS_X_ACCEL', os.environ.get('DOCUMENTOS_X_ACCEL', ''))
+
+
+def almacen():
+    configuracion = current_app.config
+    return ALMACENES[configuracion['DOCUMENTOS_ALMACEN']](configuracion['DOCUMENTOS_DIR'])
+
+
+def _maximo():
+    return current_app.config['DOCUMENTOS_MAX_MB'] * 1024 * 1024
+
+
+def tipo_mime(nombre):
+    """Tipo MIME según la extensión; DocumentoError si no está permitida"""
+    extension = os.path.splitext(nombre or '')[1].lower()
+    if extension not in TIPOS_PERMITIDOS:
+        raise DocumentoError(f"Tipo de archivo no permitido; se aceptan {', '.join(sorted(TIPOS_PERMITIDOS))}")
+    return TIPOS_PERMITIDOS[extension]
+
+
+def _registrar(sha256, tamano, clave, tipo, nombre, usuario_id):
+    """
+    Regresa (documento, nuevo); si el contenido ya estaba registrado reutiliza
+    su fila. Solo hace flush: el commit es del llamador.
+    """
+    existente = Documento.query.filter_by(sha256=sha256).first()
+    if existente:
+        return existente, False
+    documento = Documento(sha256=sha256, tamano=tamano, clave=clave, tipo_mime=tipo,
+                          nombre_original=(nombre or '')[:255] or None, usuario_id=usuario_id)
+    try:
+        with db.session.begin_nested():
+            db.session.add(documento)
+    except IntegrityError:
+        # Otra carga del mismo contenido se registró al mismo tiempo
+        return Documento.query.filter_by(sha256=sha256).one(), False
+    return documento, True
+
+
+def descartar(nuevos):
+    """
+    Después de un rollback, borra del almacén el contenido de los documentos
+    `nuevos` ({sha256: clave}) que no quedaron registrados por otra carga.
+    """
+    if not nuevos:
+        return
+    registrados = {sha256 for (sha256,) in db.session.query(Documento.sha256)
+                   .filter(Documento.sha256.in_(list(nuevos)))}
+    destino = almacen()
+    for sha256, clave in nuevos.items():
+        if sha256 not in registrados:
+            destino.borrar(clave)
+
+
+# ========== CARGAS ==========
+
+def iniciar_carga(usuario_id, nombre, tamano=None):
+    tipo = tipo_mime(nombre)
+    if tamano is not None and not 0 < tamano <= _maximo():
+        raise DocumentoError(f'El tamaño debe estar entre 1 byte y {_maximo() // (1024 * 1024)} MB')
+    carga = CargaDocumento(id=uuid.uuid4().hex, nombre=nombre[:255], tipo_mime=tipo, tamano=tamano,
+                           recibido=0, usuario_id=usuario_id)
+    db.session.add(carga)
+    db.session.commit()
+    return carga
+
+
+def recibir_parte(carga, desplazamiento, flujo):
+    """
+    Agrega la parte que empieza en `desplazamiento`. Debe continuar donde
+    terminó la anterior (o repetirla); si no, DocumentoError y el cliente
+    reanuda desde carga.recibido.
+    """
+    if desplazamiento is None or not 0 <= desplazamiento <= carga.recibido:
+        raise DocumentoError(f'La parte debe empezar en el byte {carga.recibido}')
+    maximo = min(carga.tamano or _maximo(), _maximo())
+    escritos = almacen().escribir_parte(carga.id, desplazamiento, flujo, maximo)
+    carga.recibido = desplazamiento + escritos
+    db.session.commit()
+    return carga
+
+
+def completar_carga(carga):
+    """Regresa (documento, nuevo) y elimina la carga; el commit es del llamador"""
+    if not carga.recibido:
+        raise DocumentoError('La carga no tiene contenido')
+    if carga.tamano is not None and carga.recibido != carga.tamano:
+        raise DocumentoError(f'Se recibieron {carga.recibido} de {carga.tamano} bytes')
+    sha256, tamano, clave = almacen().consolidar(carga.id)
+    nombre, tipo, usuario_id = carga.nombre, carga.tipo_mime, carga.usuario_id
+    db.session.delete(carga)
+    return _registrar(sha256, tamano, clave, tipo, nombre, usuario_id)
+
+
+def guardar_archivo(archivo, usuario_id):
+    """
+    Guarda un archivo de formulario (multipart) en bloques; regresa
+    (documento, nuevo). El commit es del llamador.
+    """
+    tipo = tipo_mime(archivo.filename)
+    destino = almacen()
+    carga_id = uuid.uuid4().hex
+    try:
+        if not destino.escribir_parte(carga_id, 0, archivo.stream, _maximo()):
+            raise DocumentoError('El archivo está vacío')
+    except DocumentoError:
+        destino.descartar_carga(carga_id)
+        raise
+    sha256, tamano, clave = destino.consolidar(carga_id)
+    return _registrar(sha256, tamano, clave, tipo, archivo.filename, usuario_id)
+
+
+def purgar_cargas(vigencia=VIGENCIA_CARGAS):
+    """Descarta las cargas sin actividad en `vigencia`; regresa cuántas"""
+    limite = datetime.utcnow() - vigencia
+    abandonadas = CargaDocumento.query.filter(CargaDocumento.fecha_actualizacion < limite).all()
+    destino = almacen()
+    for carga in abandonadas:
+        destino.descartar_carga(carga.id)
+        db.session.delete(carga)
+    db.session.commit()
+    return len(abandonadas)
+
+
+# ========== USO ==========
+
+def adjuntar(documento, campo, registro_id):
+    """Guarda el sha256 del documento en la columna `campo` del registro"""
+    modelo = ADJUNTOS.get(campo)
+    if modelo is None:
+        raise DocumentoError(f"Campo no válido; se acepta {', '.join(ADJUNTOS)}")
+    registro = db.session.get(modelo, registro_id)
+    if registro is None:
+        raise DocumentoError('Registro no encontrado')
+    setattr(registro, campo, documento.sha256)
+    db.session.commit()
+    return registro
+
+
+def respuesta_descarga(documento, clave=None, tipo=None, adjunto=False):
+    """
+    Respuesta con el contenido de `clave` (por defecto el documento). Con
+    X-Sendfile o X-Accel-Redirect configurados el servidor web envía el
+    archivo y atiende los rangos; si no, send_file responde 206/304.
+    """
+    clave = clave or documento.clave
+    tipo = tipo or documento.tipo_mime
+    adjunto = adjunto or tipo not in TIPOS_EN_LINEA
+    nombre = documento.nombre_original or documento.sha256
+    etag = documento.sha256 if clave == documento.clave else f'{documento.sha256}-miniatura'
+    configuracion = current_app.config
+    destino = almacen()
+    ruta = destino.ruta_local(clave)
+
+    if configuracion['DOCUMENTOS_X_ACCEL'] or (configuracion['DOCUMENTOS_X_SENDFILE'] and ruta):
+        resp = Response(mimetype=tipo)
+        if configuracion['DOCUMENTOS_X_ACCEL']:
+            resp.headers['X-Accel-Redirect'] = configuracion['DOCUMENTOS_X_ACCEL'].rstrip('/') + '/' + clave
+        else:
+            resp.headers['X-Sendfile'] = ruta
+        disposicion = 'attachment' if adjunto else 'inline'
+        resp.headers['Content-Disposition'] = f"{disposicion}; filename*=UTF-8''{quote(nombre)}"
+        resp.set_etag(etag)
+    else:
+        resp = send_file(ruta if ruta else destino.abrir(clave), mimetype=tipo, as_attachment=adjunto,
+                         download_name=nombre, conditional=True, etag=etag, max_age=CACHE_DESCARGA)
+
+    # El contenido de una clave nunca cambia, pero solo el navegador del usuario debe guardarlo
+    resp.cache_control.public = False
+    resp.cache_control.private = True
+    resp.cache_control.max_age = CACHE_DESCARGA
+    resp.headers['X-Content-Type-Options'] = 'nosniff'
+    return resp
+
+
+# ========== MINIATURAS ==========
+
+def es_imagen(documento):
+    return documento.tipo_mime.startswith('image/')
+
+
+def generar_miniatura(documento_id):
+    """
+    Genera la miniatura JPEG de una imagen y regresa su clave. Sin Pillow
+    regresa None (los documentos se sirven sin miniatura).
+    """
+    try:
+        from PIL import Image, ImageOps
+    except ImportError:
+        log.warning('Pillow no está instalado; no se generan miniaturas')
+        return None
+
+    documento = db.session.get(Documento, documento_id)
+    if documento is None or not es_imagen(documento):
+        return None
+    if documento.miniatura:
+        return documento.miniatura
+
+    destino = almacen()
+    with destino.abrir(documento.clave) as archivo:
+        imagen = ImageOps.exif_transpose(Image.open(archivo))
+        imagen.thumbnail((LADO_MINIATURA, LADO_MINIATURA))
+        salida = io.BytesIO()
+        imagen.convert('RGB').save(salida, 'JPEG', quality=80)
+
+    clave = f'miniaturas/{documento.sha256}.jpg'
+    destino.guardar(clave, salida.getvalue())
+    documento.miniatura = clave
+    db.session.commit()
+    return clave
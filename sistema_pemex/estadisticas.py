@@ -0,0 +1,106 @@
+"""
+Servicio de estadísticas para los dashboards.
+
+Calcula todos los indicadores de /dashboard con agregados condicionales
+(SUM(CASE ...)) en una sola consulta por tabla, en lugar de un COUNT(*)
+por indicador.
+"""
+from datetime import date
+
+from sqlalchemy import func, case
+
+from models import db, ReporteAccionPreventiva, AccionPreventiva, EstatusGeneral, TipoReporte, OficinaRegional
+import resumen_mensual
+
+
+def _contar_si(condicion):
+    """Expresión SUM(CASE WHEN condicion THEN 1 ELSE 0 END) que nunca es NULL"""
+    return func.coalesce(func.sum(case((condicion, 1), else_=0)), 0)
+
+
+def obtener_stats_reportes(hoy=None):
+    """Indicadores de reportes: total, en proceso, atendidos y del mes en curso"""
+    inicio_mes = (hoy or date.today()).replace(day=1)
+
+    fila = db.session.query(
+        func.count(ReporteAccionPreventiva.id),
+        _contar_si(EstatusGeneral.nombre == 'En proceso'),
+        _contar_si(EstatusGeneral.nombre == 'Atendido'),
+        _contar_si(ReporteAccionPreventiva.fecha_reporte >= inicio_mes)
+    ).outerjoin(
+        EstatusGeneral, ReporteAccionPreventiva.estatus_actual_id == EstatusGeneral.id
+    ).one()
+
+    return {
+        'total_reportes': int(fila[0]),
+        'en_proceso': int(fila[1]),
+        'atendidos': int(fila[2]),
+        'este_mes': int(fila[3])
+    }
+
+
+def obtener_stats_acciones(hoy=None):
+    """Indicadores de acciones preventivas agrupados por estado_accion"""
+    hoy = hoy or date.today()
+    inicio_mes = hoy.replace(day=1)
+
+    filas = db.session.query(
+        AccionPreventiva.estado_accion,
+        func.count(AccionPreventiva.id),
+        _contar_si(AccionPreventiva.fecha_registro >= inicio_mes),
+        _contar_si(AccionPreventiva.fecha_fin < hoy)
+    ).group_by(AccionPreventiva.estado_accion).all()
+
+    por_estado = {estado: int(total) for estado, total, _, _ in filas}
+
+    return {
+        'total_acciones': sum(por_estado.values()),
+        'acciones_completadas': por_estado.get('Completado', 0),
+        'acciones_proceso': por_estado.get('En Proceso', 0),
+        'acciones_registradas': por_estado.get('Registrado', 0),
+        'acciones_mes': sum(int(del_mes) for _, _, del_mes, _ in filas),
+        # Fecha fin ya pasada y sin completar ni cancelar
+        'acciones_vencidas': sum(int(vencidas) for estado, _, _, vencidas in filas
+                                 if estado not in ('Completado', 'Cancelado'))
+    }
+
+
+def _fecha(valor):
+    return valor.isoformat() if valor else None
+
+
+def resumen_dashboard(meses=6, recientes=5, hoy=None):
+    """
+    Datos de /dashboard y /admin/dashboard en un solo diccionario compacto:
+    indicadores, reportes y acciones recientes (solo lo que muestran las
+    tablas) y acciones por mes desde el resumen mensual.
+    """
+    hoy = hoy or date.today()
+
+    reportes = db.session.query(
+        ReporteAccionPreventiva.id, ReporteAccionPreventiva.folio, ReporteAccionPreventiva.fecha_reporte,
+        TipoReporte.nombre, OficinaRegional.nombre, EstatusGeneral.nombre
+    ).outerjoin(TipoReporte, ReporteAccionPreventiva.tipo_reporte_id == TipoReporte.id
+    ).outerjoin(OficinaRegional, ReporteAccionPreventiva.oficina_regional_id == OficinaRegional.id
+    ).outerjoin(EstatusGeneral, ReporteAccionPreventiva.estatus_actual_id == EstatusGeneral.id
+    ).order_by(ReporteAccionPreventiva.fecha_creacion.desc()).limit(recientes).all()
+
+    acciones = db.session.query(
+        AccionPreventiva.id, AccionPreventiva.folio, AccionPreventiva.fecha_registro, AccionPreventiva.region,
+        AccionPreventiva.nivel_impacto, AccionPreventiva.estado_accion, AccionPreventiva.porcentaje_avance
+    ).order_by(AccionPreventiva.fecha_creacion.desc(), AccionPreventiva.id.desc()).limit(recientes).all()
+
+    return {
+        'reportes': obtener_stats_reportes(hoy),
+        'acciones': obtener_stats_acciones(hoy),
+        'reportes_recientes': [{
+            'id': r[0], 'folio': r[1], 'fecha_reporte': _fecha(r[2]),
+            'tipo_reporte': r[3], 'oficina_regional': r[4], 'estatus': r[5]
+        } for r in reportes],
+        'acciones_recientes': [{
+            'id': a[0], 'folio': a[1], 'fecha_registro': _fecha(a[2]), 'region': a[3],
+            'nivel_impacto': a[4], 'estado_accion': a[5], 'porcentaje_avance': a[6]
+        } for a in acciones],
+        'acciones_por_mes': [{'mes': mes, 'total': total}
+                             for mes, total in resumen_mensual.acciones_por_mes(meses, hoy).items()]
+    }
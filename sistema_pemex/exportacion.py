@@ -0,0 +1,196 @@
+"""
+Exportación de acciones y reportes a CSV/XLSX con memoria constante.
+
+Las filas se leen con yield_per (cursor del lado del servidor) y se escriben
+conforme llegan: el CSV se envía al cliente renglón por renglón y el XLSX se
+arma con el modo write_only de openpyxl, que vuelca cada fila a disco. El orden
+de columnas de los reportes sigue la hoja "PROPUESTA PROB BR" del libro base
+(250515 Propuesta base para Ap y prob 2025).
+
+Los textos capturados se exportan siempre como texto: en el CSV los que
+empiezan con =, +, -, @, tabulador o retorno llevan un apóstrofo al inicio y
+en el XLSX se escriben como celda de texto, de modo que Excel nunca los
+evalúa como fórmula.
+"""
+import csv
+import io
+import json
+import tempfile
+
+from models import db, AccionPreventiva, ReporteAccionPreventiva, TipoAtencion
+import perfiles_carga
+
+LOTE = 1000
+# Caracteres con los que Excel interpreta una celda como fórmula
+INICIO_FORMULA = ('=', '+', '-', '@', '\t', '\r')
+
+
+def _fecha(valor):
+    return valor.strftime('%d/%m/%Y') if valor else ''
+
+
+def _nombre(relacion):
+    return relacion.nombre if relacion else ''
+
+
+# (encabezado, función que extrae el valor de la fila)
+COLUMNAS_REPORTES = [
+    ('#', lambda r, c: r.numero_registro),
+    ('Nombre de la persona responsable de la captura', lambda r, c: r.responsable_captura.nombre_completo if r.responsable_captura else ''),
+    ('Oficina Regional', lambda r, c: _nombre(r.oficina_regional)),
+    ('Año de reporte', lambda r, c: r.año_reporte),
+    ('Folio', lambda r, c: r.folio),
+    ('Tipo de Reporte', lambda r, c: _nombre(r.tipo_reporte)),
+    ('Fecha de Reporte', lambda r, c: _fecha(r.fecha_reporte)),
+    ('Entidad Federativa', lambda r, c: _nombre(r.entidad_federativa)),
+    ('Municipio(s)', lambda r, c: _nombre(r.municipio)),
+    ('Fecha de Inicio de Problemática / Conflicto', lambda r, c: _fecha(r.fecha_inicio_problematica)),
+    ('Descripción del Evento', lambda r, c: r.descripcion_evento),
+    ('Exigencia y/o reclamación', lambda r, c: r.exigencia_reclamacion),
+    ('Impacto en caso de no atender', lambda r, c: r.impacto_no_atender),
+    ('Acciones a realizar', lambda r, c: r.acciones_realizar),
+    ('Tipo de atención', lambda r, c: c.tipos_atencion(r.tipos_atencion)),
+    ('Otro tipo de atención', lambda r, c: r.otro_tipo_atencion),
+    ('Compromisos y/o Acuerdos tomados', lambda r, c: r.compromisos_acuerdos),
+    ('Fecha de Obtención de la LSO', lambda r, c: _fecha(r.fecha_obtencion_lso)),
+    ('Días de Duración de Cierre', lambda r, c: r.dias_duracion_cierre),
+    ('Grupo de Interés / Localidad', lambda r, c: r.grupo_interes_localidad),
+    ('Representantes y/o Líderes', lambda r, c: r.representantes_lideres),
+    ('Actores Internos', lambda r, c: _nombre(r.actor_interno)),
+    ('Otros actores internos', lambda r, c: r.otro_actor_interno),
+    ('Actores Externos', lambda r, c: r.actores_externos),
+    ('Instalación Estratégica Relacionada y/o Afectada', lambda r, c: r.instalacion_estrategica),
+    ('Proyectos Relacionados y/o Afectados', lambda r, c: r.proyectos_relacionados),
+    ('Tipo de Problemática o Conflicto Social', lambda r, c: _nombre(r.tipo_problematica)),
+    ('Otro Tipo de Problemática o Conflicto Social', lambda r, c: r.otro_tipo_problematica),
+    ('Área Involucrada', lambda r, c: r.area_involucrada),
+    ('Grado de Clasificación', lambda r, c: _nombre(r.grado_clasificacion)),
+    ('Descripción del Estatus al cierre de mes', lambda r, c: r.descripcion_estatus_cierre),
+    ('Estatus Actual', lambda r, c: _nombre(r.estatus_actual)),
+    ('Grado de Probabilidad del cierre de mes', lambda r, c: _nombre(r.grado_probabilidad)),
+]
+
+COLUMNAS_ACCIONES = [
+    ('#', lambda a, c: a.id),
+    ('Nombre de la persona responsable de la captura', lambda a, c: a.usuario.nombre_completo if a.usuario else ''),
+    ('Región', lambda a, c: a.region),
+    ('Año de reporte', lambda a, c: a.fecha_registro.year if a.fecha_registro else ''),
+    ('Folio', lambda a, c: a.folio),
+    ('Fecha de Registro', lambda a, c: _fecha(a.fecha_registro)),
+    ('Entidad Federativa', lambda a, c: a.estado),
+    ('Municipio', lambda a, c: a.municipio),
+    ('Localidad', lambda a, c: a.localidad),
+    ('Activo', lambda a, c: a.activo),
+    ('Instalación', lambda a, c: a.instalacion),
+    ('Tipo de Problemática', lambda a, c: a.tipo_problematica),
+    ('Descripción de la Problemática', lambda a, c: a.descripcion_problematica),
+    ('Actor Social', lambda a, c: a.actor_social),
+    ('Nivel de Impacto', lambda a, c: a.nivel_impacto),
+    ('Acción Preventiva', lambda a, c: a.accion_preventiva),
+    ('Fecha de Inicio', lambda a, c: _fecha(a.fecha_inicio)),
+    ('Fecha de Fin', lambda a, c: _fecha(a.fecha_fin)),
+    ('Presupuesto', lambda a, c: float(a.presupuesto) if a.presupuesto is not None else ''),
+    ('Responsable', lambda a, c: a.responsable),
+    ('Área Responsable', lambda a, c: a.area_responsable),
+    ('Observaciones', lambda a, c: a.observaciones),
+    ('Estatus', lambda a, c: a.estado_accion),
+    ('% de Avance', lambda a, c: a.porcentaje_avance),
+    ('Última Actualización', lambda a, c: _fecha(a.fecha_ultima_actualizacion)),
+]
+
+
+class _Contexto:
+    """Datos auxiliares que se cargan una sola vez por exportación"""
+
+    def __init__(self):
+        self._tipos_atencion = None
+
+    def tipos_atencion(self, ids_json):
+        if not ids_json:
+            return ''
+        if self._tipos_atencion is None:
+            self._tipos_atencion = dict(db.session.query(TipoAtencion.id, TipoAtencion.nombre).all())
+        try:
+            ids = json.loads(ids_json)
+        except ValueError:
+            return ''
+        return ', '.join(self._tipos_atencion.get(i, str(i)) for i in ids)
+
+
+def filas(consulta, columnas):
+    """Genera el encabezado y después una lista de valores por registro"""
+    contexto = _Contexto()
+    yield [encabezado for encabezado, _ in columnas]
+    # Se ejecuta como select() 2.0: el Query heredado aplica unique() a los
+    # joinedload, lo que obligaría a leer todo el resultado antes de emitir
+    for registro in db.session.scalars(consulta.statement.execution_options(yield_per=LOTE)):
+        yield [extraer(registro, contexto) for _, extraer in columnas]
+
+
+def consulta_reportes():
+    return ReporteAccionPreventiva.query.options(
+        *perfiles_carga.opciones(ReporteAccionPreventiva, 'exportacion')
+    ).order_by(ReporteAccionPreventiva.id)
+
+
+def consulta_acciones(consulta_base=None):
+    consulta = consulta_base if consulta_base is not None else AccionPreventiva.query
+    return consulta.options(
+        *perfiles_carga.opciones(AccionPreventiva, 'exportacion')
+    ).order_by(AccionPreventiva.id)
+
+
+def _texto_csv(valor):
+    if valor is None:
+        return ''
+    if isinstance(valor, str) and valor.startswith(INICIO_FORMULA):
+        return "'" + valor
+    return valor
+
+
+def generar_csv(renglones):
+    """Genera el CSV en bloques de texto; incluye BOM para que Excel respete acentos"""
+    buffer = io.StringIO()
+    escritor = csv.writer(buffer)
+    yield '\ufeff'
+
+    for i, renglon in enumerate(renglones, 1):
+        escritor.writerow([_texto_csv(v) for v in renglon])
+        if i % LOTE == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate(0)
+
+    yield buffer.getvalue()
+
+
+def generar_xlsx(renglones, titulo, tamano_bloque=64 * 1024):
+    """
+    Escribe un XLSX en modo write_only sobre un archivo temporal y lo regresa
+    en bloques. openpyxl es una dependencia opcional: se importa aquí.
+    """
+    from openpyxl import Workbook
+    from openpyxl.cell import WriteOnlyCell
+
+    libro = Workbook(write_only=True)
+    hoja = libro.create_sheet(title=titulo[:31])
+
+    def texto(valor):
+        # openpyxl guarda como fórmula cualquier cadena que empiece con '='
+        if isinstance(valor, str) and valor.startswith('='):
+            celda = WriteOnlyCell(hoja, valor)
+            celda.data_type = 's'
+            return celda
+        return valor
+
+    for renglon in renglones:
+        hoja.append([texto(v) for v in renglon])
+
+    with tempfile.TemporaryFile() as archivo:
+        libro.save(archivo)
+        archivo.seek(0)
+        while True:
+            bloque = archivo.read(tamano_bloque)
+            if not bloque:
+                break
+            yield bloque
@@ -0,0 +1,135 @@
+"""
+Asignación de folios con secuencias en base de datos.
+
+Cada combinación (prefijo, tipo, año) tiene una fila en secuencias_folio. El
+incremento se hace con un UPDATE ... SET ultimo_valor = ultimo_valor + n, que
+bloquea la fila (MySQL) o la base (SQLite) hasta el commit, así que dos
+capturistas nunca reciben el mismo número. La asignación ocurre dentro de la
+transacción del llamador: si el registro falla y se hace rollback, el número
+se libera y la secuencia queda sin huecos.
+
+Los folios que llegan ya asignados (importaciones) adelantan su secuencia con
+avanzar_por_folios(), para que los números que se generen después no los
+repitan.
+"""
+import re
+from datetime import date
+
+from sqlalchemy import update
+from sqlalchemy.exc import IntegrityError
+
+from models import db, SecuenciaFolio
+
+FOLIO_ACCION = re.compile(r'^AP-(?:(DRAFT)-)?(\d{4})-(\d+)$')
+FOLIO_REPORTE = re.compile(r'^([A-Z0-9]+)-([A-Z0-9]+)-(\d{4})-(\d+)$')
+
+
+def reservar(prefijo, tipo='', anio=None, cantidad=1):
+    """
+    Reserva `cantidad` números consecutivos de la secuencia y regresa el
+    primero. Para cantidad > 1 el bloque es [primero, primero + cantidad).
+    """
+    if cantidad < 1:
+        raise ValueError('La cantidad de folios a reservar debe ser positiva')
+    anio = anio if anio is not None else date.today().year
+    clave = (SecuenciaFolio.prefijo == prefijo, SecuenciaFolio.tipo == tipo, SecuenciaFolio.anio == anio)
+
+    for _ in range(3):
+        resultado = db.session.execute(
+            update(SecuenciaFolio)
+            .where(*clave)
+            .values(ultimo_valor=SecuenciaFolio.ultimo_valor + cantidad)
+            .execution_options(synchronize_session=False)
+        )
+        if resultado.rowcount:
+            ultimo = db.session.query(SecuenciaFolio.ultimo_valor).filter(*clave).scalar()
+            return ultimo - cantidad + 1
+
+        # Primera vez que se usa la secuencia: crearla. Si otra transacción la
+        # creó al mismo tiempo, el índice único lo detecta y se reintenta el UPDATE.
+        try:
+            with db.session.begin_nested():
+                db.session.add(SecuenciaFolio(prefijo=prefijo, tipo=tipo, anio=anio, ultimo_valor=cantidad))
+            return 1
+        except IntegrityError:
+            continue
+
+    raise RuntimeError(f'No se pudo reservar folio para {prefijo}-{tipo}-{anio}')
+
+
+def avanzar(prefijo, tipo, anio, minimo):
+    """Lleva la secuencia al menos a `minimo` (nunca la regresa)"""
+    clave = (SecuenciaFolio.prefijo == prefijo, SecuenciaFolio.tipo == tipo, SecuenciaFolio.anio == anio)
+    for _ in range(3):
+        db.session.execute(
+            update(SecuenciaFolio)
+            .where(*clave, SecuenciaFolio.ultimo_valor < minimo)
+            .values(ultimo_valor=minimo)
+            .execution_options(synchronize_session=False)
+        )
+        if db.session.query(SecuenciaFolio.id).filter(*clave).first():
+            return
+        try:
+            with db.session.begin_nested():
+                db.session.add(SecuenciaFolio(prefijo=prefijo, tipo=tipo, anio=anio, ultimo_valor=minimo))
+            return
+        except IntegrityError:
+            continue
+
+    raise RuntimeError(f'No se pudo avanzar el folio {prefijo}-{tipo}-{anio}')
+
+
+def _secuencia_de(folio, reporte):
+    """((prefijo, tipo, año), número) del folio, o None si no tiene el formato generado"""
+    if reporte:
+        coincidencia = FOLIO_REPORTE.match(folio)
+        if coincidencia:
+            oficina, tipo, anio, numero = coincidencia.groups()
+            return (oficina, tipo, int(anio)), int(numero)
+    else:
+        coincidencia = FOLIO_ACCION.match(folio)
+        if coincidencia:
+            borrador, anio, numero = coincidencia.groups()
+            return ('AP', borrador or '', int(anio)), int(numero)
+    return None
+
+
+def avanzar_por_folios(lista, reporte=False):
+    """
+    Adelanta cada secuencia hasta el mayor número de los folios ya asignados
+    de `lista` (folios de acción o, con reporte=True, de reporte).
+    """
+    maximos = {}
+    for folio in lista:
+        secuencia = _secuencia_de(folio, reporte) if folio else None
+        if secuencia:
+            clave, numero = secuencia
+            maximos[clave] = max(maximos.get(clave, 0), numero)
+    for (prefijo, tipo, anio), numero in sorted(maximos.items()):
+        avanzar(prefijo, tipo, anio, numero)
+
+
+def folio_reporte(oficina_abrev, tipo_abrev, anio=None):
+    """Folio de reporte con formato OFICINA-TIPO-AÑO-NNN"""
+    anio = anio if anio is not None else date.today().year
+    return f"{oficina_abrev}-{tipo_abrev}-{anio}-{reservar(oficina_abrev, tipo_abrev, anio):03d}"
+
+
+def folio_accion(borrador=False, anio=None):
+    """Folio de acción preventiva con formato AP-AÑO-NNNNN (AP-DRAFT-... para borradores)"""
+    anio = anio if anio is not None else date.today().year
+    tipo = 'DRAFT' if borrador else ''
+    prefijo = 'AP-DRAFT' if borrador else 'AP'
+    return f"{prefijo}-{anio}-{reservar('AP', tipo, anio):05d}"
+
+
+def folios_accion_bloque(cantidad, anio=None):
+    """Reserva un bloque de folios de acción para cargas masivas"""
+    anio = anio if anio is not None else date.today().year
+    primero = reservar('AP', '', anio, cantidad)
+    return [f"AP-{anio}-{numero:05d}" for numero in range(primero, primero + cantidad)]
+
+
+def numero_registro_reporte():
+    """Siguiente número de registro global de reportes"""
+    return reservar('REPORTE', 'REGISTRO', 0)
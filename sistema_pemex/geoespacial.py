@@ -0,0 +1,429 @@
+"""
+Consultas geoespaciales sobre las coordenadas de las acciones preventivas.
+
+coordenadas_x es la longitud y coordenadas_y la latitud, en grados. Cada
+acción con coordenadas válidas tiene una fila en ubicaciones_acciones:
+- en MySQL, la columna punto (POINT generado a partir de x, y) con índice
+  SPATIAL, que se consulta con MBRContains;
+- en los demás motores, la celda de una cuadrícula fija de GRADOS_CELDA
+  grados con índice (celda, x, y); un rectángulo se traduce a un rango de
+  celdas por cada fila de la cuadrícula que cruza.
+
+El agrupamiento del mapa agrega por una cuadrícula cuyo tamaño depende del
+zoom, así que la vista de todo el país regresa unos cientos de grupos y no
+cada acción.
+
+Las filas se actualizan en la misma transacción que la acción mediante
+eventos de sesión; las cargas masivas llaman a indexar_folios() o
+reconstruir().
+"""
+import heapq
+import math
+
+from sqlalchemy import (event, func, insert, update, select, delete, cast, text, literal, or_, tuple_,
+                        bindparam, Integer, inspect as sa_inspect)
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from models import db, AccionPreventiva, UbicacionAccion, GrupoUbicacion
+
+LIMITE_DEFAULT = 200
+LIMITE_MAXIMO = 2000
+RADIO_MAXIMO_KM = 500
+KM_POR_GRADO = 111.32
+RADIO_TIERRA_KM = 6371.0
+
+# Cuadrícula fija del índice (~11 km por lado en el ecuador)
+GRADOS_CELDA = 0.1
+COLUMNAS_CELDA = int(360 / GRADOS_CELDA)
+# Con más filas de celdas que esto se recorre un solo rango de celdas
+MAX_RANGOS_CELDA = 32
+
+# Celdas de agrupamiento por cada tesela de 256 px del mapa; los grupos de
+# los zooms 0..ZOOM_GRUPOS están precalculados en ubicaciones_grupos
+CELDAS_POR_TESELA = 4
+ZOOM_GRUPOS = 8
+ZOOM_MAXIMO = 20
+
+LOTE_INDEXACION = 5000
+
+
+class GeoespacialError(ValueError):
+    """Parámetros de consulta inválidos"""
+
+
+def coordenadas_validas(x, y):
+    return x is not None and y is not None and -180 <= x <= 180 and -90 <= y <= 90
+
+
+def celda(x, y):
+    """Número de celda de la cuadrícula del índice"""
+    fila = min(math.floor((y + 90) / GRADOS_CELDA), int(180 / GRADOS_CELDA) - 1)
+    columna = min(math.floor((x + 180) / GRADOS_CELDA), COLUMNAS_CELDA - 1)
+    return fila * COLUMNAS_CELDA + columna
+
+
+def distancia_km(x1, y1, x2, y2):
+    """Distancia haversine entre dos puntos (longitud, latitud)"""
+    p1, p2 = math.radians(y1), math.radians(y2)
+    dp, dl = p2 - p1, math.radians(x2 - x1)
+    a = math.sin(dp / 2) ** 2 + math.cos(p1) * math.cos(p2) * math.sin(dl / 2) ** 2
+    return 2 * RADIO_TIERRA_KM * math.asin(min(1.0, math.sqrt(a)))
+
+
+def _tamano(zoom):
+    """Lado en grados de la celda de agrupamiento del zoom"""
+    return 360 / (2 ** zoom) / CELDAS_POR_TESELA
+
+
+def celda_zoom(zoom, x, y):
+    """(fila, columna) de la cuadrícula de agrupamiento del zoom"""
+    tamano = _tamano(zoom)
+    return math.floor((y + 90) / tamano), math.floor((x + 180) / tamano)
+
+
+def _piso(expresion, dialecto):
+    # Mismo cálculo que celda_zoom() en SQL. En SQLite no siempre existe
+    # floor(); el valor nunca es negativo, así que truncar es lo mismo
+    return cast(expresion, Integer) if dialecto == 'sqlite' else func.floor(expresion)
+
+
+# ========== INDEXACIÓN ==========
+
+def _fila(accion_id, x, y):
+    return {'accion_id': accion_id, 'x': x, 'y': y, 'celda': celda(x, y)}
+
+
+def _quitar(conexion, condicion):
+    """Borra las ubicaciones que cumplen la condición y las regresa como (id, x, y)"""
+    anteriores = conexion.execute(
+        select(UbicacionAccion.accion_id, UbicacionAccion.x, UbicacionAccion.y).where(condicion)
+    ).all()
+    if anteriores:
+        conexion.execute(delete(UbicacionAccion).where(condicion))
+    return anteriores
+
+
+def _agregar(conexion, puntos):
+    """Inserta las ubicaciones (id, x, y) por lotes"""
+    for inicio in range(0, len(puntos), LOTE_INDEXACION):
+        conexion.execute(insert(UbicacionAccion), [_fila(*p) for p in puntos[inicio:inicio + LOTE_INDEXACION]])
+
+
+def _sumar_grupo(conexion, grupo):
+    """
+    Suma un grupo nuevo que otra transacción creó al mismo tiempo: UPDATE
+    sobre la clave y, si aún no existe, INSERT en un savepoint (reintenta si
+    el índice único lo rechaza)
+    """
+    clave = (GrupoUbicacion.zoom == grupo['zoom'], GrupoUbicacion.fila == grupo['fila'],
+             GrupoUbicacion.columna == grupo['columna'])
+    for _ in range(3):
+        resultado = conexion.execute(update(GrupoUbicacion).where(*clave).values(
+            total=GrupoUbicacion.total + grupo['total'],
+            suma_x=GrupoUbicacion.suma_x + grupo['suma_x'],
+            suma_y=GrupoUbicacion.suma_y + grupo['suma_y'],
+            suma_ids=GrupoUbicacion.suma_ids + grupo['suma_ids'],
+        ))
+        if resultado.rowcount:
+            return
+        try:
+            with conexion.begin_nested():
+                conexion.execute(insert(GrupoUbicacion), [grupo])
+            return
+        except IntegrityError:
+            continue
+
+    raise RuntimeError(f"No se pudo actualizar el grupo {grupo['zoom']}/{grupo['fila']}/{grupo['columna']}")
+
+
+def _actualizar_grupos(conexion, quitados, agregados):
+    """Resta los puntos quitados y suma los agregados en los grupos de cada zoom"""
+    deltas = {}
+    for signo, puntos in ((-1, quitados), (1, agregados)):
+        for accion_id, x, y in puntos:
+            for zoom in range(ZOOM_GRUPOS + 1):
+                delta = deltas.setdefault((zoom, *celda_zoom(zoom, x, y)), [0, 0.0, 0.0, 0])
+                delta[0] += signo
+                delta[1] += signo * x
+                delta[2] += signo * y
+                delta[3] += signo * accion_id
+    if not deltas:
+        return
+
+    claves = list(deltas)
+    existentes = {}
+    for inicio in range(0, len(claves), LOTE_INDEXACION // 10):
+        existentes.update(((z, f, c), i) for i, z, f, c in conexion.execute(
+            select(GrupoUbicacion.id, GrupoUbicacion.zoom, GrupoUbicacion.fila, GrupoUbicacion.columna)
+            .where(tuple_(GrupoUbicacion.zoom, GrupoUbicacion.fila, GrupoUbicacion.columna)
+                   .in_(claves[inicio:inicio + LOTE_INDEXACION // 10]))
+            .with_for_update()
+        ))
+
+    actualizar, nuevos = [], []
+    for clave, (total, suma_x, suma_y, suma_ids) in deltas.items():
+        valores = {'d_total': total, 'd_x': suma_x, 'd_y': suma_y, 'd_ids': suma_ids}
+        if clave in existentes:
+            actualizar.append({'g_id': existentes[clave], **valores})
+        elif total > 0:
+            zoom, fila, columna = clave
+            nuevos.append({'zoom': zoom, 'fila': fila, 'columna': columna, 'total': total,
+                           'suma_x': suma_x, 'suma_y': suma_y, 'suma_ids': suma_ids})
+
+    if actualizar:
+        conexion.execute(update(GrupoUbicacion).where(GrupoUbicacion.id == bindparam('g_id')).values(
+            total=GrupoUbicacion.total + bindparam('d_total'),
+            suma_x=GrupoUbicacion.suma_x + bindparam('d_x'),
+            suma_y=GrupoUbicacion.suma_y + bindparam('d_y'),
+            suma_ids=GrupoUbicacion.suma_ids + bindparam('d_ids'),
+        ), actualizar)
+        if quitados:
+            conexion.execute(delete(GrupoUbicacion).where(
+                GrupoUbicacion.id.in_([a['g_id'] for a in actualizar]), GrupoUbicacion.total <= 0
+            ))
+    if nuevos:
+        # SELECT ... FOR UPDATE no bloquea claves que no existen: si otra
+        # transacción creó alguno de estos grupos, se suman uno por uno
+        try:
+            with conexion.begin_nested():
+                conexion.execute(insert(GrupoUbicacion), nuevos)
+        except IntegrityError:
+            for grupo in nuevos:
+                _sumar_grupo(conexion, grupo)
+
+
+def _reindexar(conexion, condicion):
+    """Reemplaza las ubicaciones (y sus grupos) de las acciones que cumplen la condición"""
+    quitados = _quitar(conexion, UbicacionAccion.accion_id.in_(select(AccionPreventiva.id).where(condicion)))
+    agregados = [(accion_id, x, y) for accion_id, x, y in conexion.execute(
+        select(AccionPreventiva.id, AccionPreventiva.coordenadas_x, AccionPreventiva.coordenadas_y)
+        .where(condicion, AccionPreventiva.coordenadas_x.isnot(None), AccionPreventiva.coordenadas_y.isnot(None))
+    ) if coordenadas_validas(x, y)]
+    _agregar(conexion, agregados)
+    _actualizar_grupos(conexion, quitados, agregados)
+
+
+def indexar_folios(folios):
+    """Indexa acciones recién insertadas por executemany; no hace commit"""
+    if folios:
+        _reindexar(db.session.connection(), AccionPreventiva.folio.in_(list(folios)))
+
+
+def reconstruir():
+    """Regenera todas las ubicaciones y grupos (después de cargas masivas o migraciones)"""
+    conexion = db.session.connection()
+    dialecto = conexion.dialect.name
+    conexion.execute(delete(UbicacionAccion))
+    conexion.execute(delete(GrupoUbicacion))
+
+    # Por páginas de id para no mantener un cursor abierto mientras se inserta
+    total, ultimo = 0, 0
+    while True:
+        pagina = conexion.execute(
+            select(AccionPreventiva.id, AccionPreventiva.coordenadas_x, AccionPreventiva.coordenadas_y)
+            .where(AccionPreventiva.id > ultimo, AccionPreventiva.coordenadas_x.isnot(None),
+                   AccionPreventiva.coordenadas_y.isnot(None))
+            .order_by(AccionPreventiva.id).limit(LOTE_INDEXACION)
+        ).all()
+        if not pagina:
+            break
+        puntos = [p for p in pagina if coordenadas_validas(p[1], p[2])]
+        _agregar(conexion, puntos)
+        total += len(puntos)
+        ultimo = pagina[-1][0]
+
+    # Los grupos se calculan en SQL, un GROUP BY por zoom
+    for zoom in range(ZOOM_GRUPOS + 1):
+        tamano = _tamano(zoom)
+        fila = _piso((UbicacionAccion.y + 90) / tamano, dialecto)
+        columna = _piso((UbicacionAccion.x + 180) / tamano, dialecto)
+        conexion.execute(insert(GrupoUbicacion).from_select(
+            ['zoom', 'fila', 'columna', 'total', 'suma_x', 'suma_y', 'suma_ids'],
+            select(literal(zoom), fila, columna, func.count(), func.sum(UbicacionAccion.x),
+                   func.sum(UbicacionAccion.y), func.sum(UbicacionAccion.accion_id)).group_by(fila, columna)
+        ))
+    db.session.commit()
+    return total
+
+
+def _coordenadas_cambiaron(objeto):
+    estado = sa_inspect(objeto)
+    return (estado.attrs.coordenadas_x.history.has_changes()
+            or estado.attrs.coordenadas_y.history.has_changes())
+
+
+@event.listens_for(Session, 'after_flush')
+def _sincronizar_ubicaciones(session, flush_context):
+    por_indexar = [o for o in session.new if isinstance(o, AccionPreventiva)]
+    por_indexar += [o for o in session.dirty if isinstance(o, AccionPreventiva) and _coordenadas_cambiaron(o)]
+    por_borrar = {o.id for o in session.deleted if isinstance(o, AccionPreventiva)}
+    por_borrar.update(o.id for o in por_indexar)
+    if not por_borrar:
+        return
+
+    conexion = session.connection()
+    quitados = _quitar(conexion, UbicacionAccion.accion_id.in_(por_borrar))
+    agregados = [(o.id, o.coordenadas_x, o.coordenadas_y) for o in por_indexar
+                 if coordenadas_validas(o.coordenadas_x, o.coordenadas_y)]
+    _agregar(conexion, agregados)
+    _actualizar_grupos(conexion, quitados, agregados)
+
+
+# ========== CONSULTA ==========
+
+def _validar_rectangulo(oeste, sur, este, norte):
+    if None in (oeste, sur, este, norte):
+        raise GeoespacialError('Se requieren oeste, sur, este y norte')
+    if not (coordenadas_validas(oeste, sur) and coordenadas_validas(este, norte)):
+        raise GeoespacialError('Coordenadas fuera de rango (longitud ±180, latitud ±90)')
+    if oeste > este or sur > norte:
+        raise GeoespacialError('El rectángulo debe cumplir oeste <= este y sur <= norte')
+
+
+def _condicion_rectangulo(dialecto, oeste, sur, este, norte):
+    """Condición sobre ubicaciones_acciones que usa el índice del motor"""
+    if dialecto == 'mysql':
+        return text(
+            'MBRContains(ST_MakeEnvelope(POINT(:oeste, :sur), POINT(:este, :norte)), ubicaciones_acciones.punto)'
+        ).bindparams(oeste=oeste, sur=sur, este=este, norte=norte)
+
+    primera, ultima = celda(oeste, sur), celda(este, norte)
+    columna_oeste, columna_este = primera % COLUMNAS_CELDA, ultima % COLUMNAS_CELDA
+    filas = range(primera // COLUMNAS_CELDA, ultima // COLUMNAS_CELDA + 1)
+    if len(filas) > MAX_RANGOS_CELDA:
+        rango = UbicacionAccion.celda.between(primera, ultima)
+    else:
+        rango = or_(*(UbicacionAccion.celda.between(fila * COLUMNAS_CELDA + columna_oeste,
+                                                    fila * COLUMNAS_CELDA + columna_este) for fila in filas))
+    return rango & UbicacionAccion.x.between(oeste, este) & UbicacionAccion.y.between(sur, norte)
+
+
+def _acciones(ids, distancias=None):
+    """Datos de las acciones para pintarlas en el mapa, en el orden de ids"""
+    if not ids:
+        return []
+    filas = db.session.execute(select(
+        AccionPreventiva.id, AccionPreventiva.folio, AccionPreventiva.coordenadas_x, AccionPreventiva.coordenadas_y,
+        AccionPreventiva.region, AccionPreventiva.instalacion, AccionPreventiva.estado_accion,
+        AccionPreventiva.nivel_impacto
+    ).where(AccionPreventiva.id.in_(ids))).all()
+    por_id = {fila.id: fila for fila in filas}
+
+    acciones = []
+    for accion_id in ids:
+        fila = por_id.get(accion_id)
+        if fila is None:
+            continue
+        accion = {
+            'id': fila.id,
+            'folio': fila.folio,
+            'x': fila.coordenadas_x,
+            'y': fila.coordenadas_y,
+            'region': fila.region,
+            'instalacion': fila.instalacion,
+            'estado_accion': fila.estado_accion,
+            'nivel_impacto': fila.nivel_impacto,
+        }
+        if distancias is not None:
+            accion['distancia_km'] = round(distancias[accion_id], 3)
+        acciones.append(accion)
+    return acciones
+
+
+def _limite(limite):
+    return min(max(limite or LIMITE_DEFAULT, 1), LIMITE_MAXIMO)
+
+
+def en_rectangulo(oeste, sur, este, norte, limite=LIMITE_DEFAULT):
+    """
+    Acciones dentro del rectángulo, en el orden del índice (no se ordenan
+    para no recorrer todas las coincidencias). Regresa {'acciones',
+    'truncado'}; truncado indica que había más de `limite` y conviene usar
+    agrupar().
+    """
+    _validar_rectangulo(oeste, sur, este, norte)
+    limite = _limite(limite)
+    condicion = _condicion_rectangulo(db.engine.dialect.name, oeste, sur, este, norte)
+    ids = [i for (i,) in db.session.execute(
+        select(UbicacionAccion.accion_id).where(condicion).limit(limite + 1)
+    )]
+    return {'acciones': _acciones(ids[:limite]), 'truncado': len(ids) > limite}
+
+
+def cercanas(x, y, radio_km, limite=LIMITE_DEFAULT):
+    """
+    Acciones a no más de radio_km del punto, de la más cercana a la más
+    lejana. Se filtra por el rectángulo que contiene al círculo con el índice
+    y la distancia exacta se calcula aquí.
+    """
+    if x is None or y is None or radio_km is None:
+        raise GeoespacialError('Se requieren x, y y radio_km')
+    if not coordenadas_validas(x, y):
+        raise GeoespacialError('Coordenadas fuera de rango (longitud ±180, latitud ±90)')
+    if not 0 < radio_km <= RADIO_MAXIMO_KM:
+        raise GeoespacialError(f'radio_km debe estar entre 0 y {RADIO_MAXIMO_KM}')
+    limite = _limite(limite)
+
+    delta_y = radio_km / KM_POR_GRADO
+    delta_x = min(180.0, radio_km / (KM_POR_GRADO * max(math.cos(math.radians(y)), 0.01)))
+    oeste, este = max(-180.0, x - delta_x), min(180.0, x + delta_x)
+    sur, norte = max(-90.0, y - delta_y), min(90.0, y + delta_y)
+
+    condicion = _condicion_rectangulo(db.engine.dialect.name, oeste, sur, este, norte)
+    candidatos = db.session.execute(
+        select(UbicacionAccion.accion_id, UbicacionAccion.x, UbicacionAccion.y).where(condicion)
+    ).all()
+
+    distancias = {}
+    for accion_id, cx, cy in candidatos:
+        distancia = distancia_km(x, y, cx, cy)
+        if distancia <= radio_km:
+            distancias[accion_id] = distancia
+    ids = heapq.nsmallest(limite, distancias, key=distancias.get)
+    return {'acciones': _acciones(ids, distancias), 'total': len(distancias)}
+
+
+def agrupar(zoom, oeste=-180.0, sur=-90.0, este=180.0, norte=90.0):
+    """
+    Grupos de acciones para el mapa: cuadrícula de 360 / 2**zoom /
+    CELDAS_POR_TESELA grados. Cada grupo trae el centroide de sus acciones y
+    el total; los de una sola acción traen además su id. Se incluyen las
+    celdas que tocan el rectángulo.
+
+    Hasta ZOOM_GRUPOS se leen los grupos precalculados; con más zoom el
+    rectángulo visible es chico y se agrega en SQL sobre el índice.
+    """
+    if zoom is None or not 0 <= zoom <= ZOOM_MAXIMO:
+        raise GeoespacialError(f'zoom debe estar entre 0 y {ZOOM_MAXIMO}')
+    _validar_rectangulo(oeste, sur, este, norte)
+
+    if zoom <= ZOOM_GRUPOS:
+        fila_sur, columna_oeste = celda_zoom(zoom, oeste, sur)
+        fila_norte, columna_este = celda_zoom(zoom, este, norte)
+        filas = db.session.execute(
+            select(GrupoUbicacion.total, GrupoUbicacion.suma_x, GrupoUbicacion.suma_y, GrupoUbicacion.suma_ids)
+            .where(GrupoUbicacion.zoom == zoom,
+                   GrupoUbicacion.fila.between(fila_sur, fila_norte),
+                   GrupoUbicacion.columna.between(columna_oeste, columna_este),
+                   GrupoUbicacion.total > 0)
+        ).all()
+    else:
+        dialecto = db.engine.dialect.name
+        tamano = _tamano(zoom)
+        fila = _piso((UbicacionAccion.y + 90) / tamano, dialecto)
+        columna = _piso((UbicacionAccion.x + 180) / tamano, dialecto)
+        filas = db.session.execute(
+            select(func.count(), func.sum(UbicacionAccion.x), func.sum(UbicacionAccion.y),
+                   func.sum(UbicacionAccion.accion_id))
+            .where(_condicion_rectangulo(dialecto, oeste, sur, este, norte)).group_by(fila, columna)
+        ).all()
+
+    grupos = []
+    for total, suma_x, suma_y, suma_ids in filas:
+        grupo = {'x': round(suma_x / total, 6), 'y': round(suma_y / total, 6), 'total': total}
+        if total == 1:
+            grupo['id'] = int(suma_ids)
+        grupos.append(grupo)
+    grupos.sort(key=lambda g: -g['total'])
+    return {'zoom': zoom, 'grados_celda': _tamano(zoom), 'total': sum(g['total'] for g in grupos), 'grupos': grupos}
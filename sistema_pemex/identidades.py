@@ -0,0 +1,121 @@
+"""
+Caché de identidades para Flask-Login.
+
+load_user() se ejecuta en cada petición autenticada, incluidas las de
+catálogos y las que responde la caché de respuestas. En lugar del objeto
+Usuario completo, aquí se guarda un Principal con lo que las vistas y
+plantillas usan de current_user (id, rol, nombre_completo, activo) en una LRU
+en proceso acotada y con TTL corto, de modo que la mayoría de las peticiones
+no consultan la tabla usuarios.
+
+Una transacción que escribe un Usuario (alta, edición, baja lógica)
+descarta su entrada al confirmarse (eventos de sesión). Como la LRU es por
+proceso, los demás procesos ven el cambio al vencer el TTL.
+
+Variables de entorno:
+    IDENTIDADES_CACHE_TTL  segundos que vive una entrada (default 30, 0 desactiva)
+    IDENTIDADES_CACHE_MAX  número máximo de usuarios en la caché (default 1024)
+"""
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from flask_login import UserMixin
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from models import db, Usuario
+
+TTL_SEGUNDOS = int(os.environ.get('IDENTIDADES_CACHE_TTL', 30))
+MAX_ENTRADAS = int(os.environ.get('IDENTIDADES_CACHE_MAX', 1024))
+
+_entradas = OrderedDict()
+_lock = threading.Lock()
+_estadisticas = {'aciertos': 0, 'fallos': 0}
+
+
+class Principal(UserMixin):
+    """Identidad del usuario autenticado, sin sesión de base de datos"""
+
+    def __init__(self, id, rol, nombre_completo, activo):
+        self.id = id
+        self.rol = rol
+        self.nombre_completo = nombre_completo
+        self.activo = activo
+
+    @property
+    def is_active(self):
+        return bool(self.activo)
+
+    def __repr__(self):
+        return f'<Principal {self.id} {self.rol}>'
+
+
+def _consultar(usuario_id):
+    fila = db.session.query(
+        Usuario.id, Usuario.rol, Usuario.nombre, Usuario.apellido_paterno,
+        Usuario.apellido_materno, Usuario.activo
+    ).filter(Usuario.id == usuario_id).first()
+    if not fila:
+        return None
+    nombre = ' '.join(n for n in (fila.nombre, fila.apellido_paterno, fila.apellido_materno) if n)
+    return Principal(fila.id, fila.rol, nombre, fila.activo)
+
+
+def cargar(usuario_id):
+    """Principal del usuario (None si no existe), desde la caché si está vigente"""
+    ahora = time.monotonic()
+    with _lock:
+        entrada = _entradas.get(usuario_id)
+        if entrada and entrada[0] > ahora:
+            _entradas.move_to_end(usuario_id)
+            _estadisticas['aciertos'] += 1
+            return entrada[1]
+        _estadisticas['fallos'] += 1
+
+    principal = _consultar(usuario_id)
+    if principal and TTL_SEGUNDOS > 0:
+        with _lock:
+            _entradas[usuario_id] = (ahora + TTL_SEGUNDOS, principal)
+            _entradas.move_to_end(usuario_id)
+            while len(_entradas) > MAX_ENTRADAS:
+                _entradas.popitem(last=False)
+    return principal
+
+
+def invalidar(usuario_ids=None):
+    """Descarta las identidades indicadas (todas si usuario_ids es None)"""
+    with _lock:
+        if usuario_ids is None:
+            _entradas.clear()
+        else:
+            for usuario_id in usuario_ids:
+                _entradas.pop(usuario_id, None)
+
+
+def estadisticas():
+    with _lock:
+        return {'entradas': len(_entradas), 'max_entradas': MAX_ENTRADAS, 'ttl': TTL_SEGUNDOS,
+                **_estadisticas}
+
+
+# ========== INVALIDACIÓN AUTOMÁTICA ==========
+
+@event.listens_for(Session, 'after_flush')
+def _registrar_usuarios(session, flush_context):
+    ids = {o.id for coleccion in (session.dirty, session.deleted) for o in coleccion if isinstance(o, Usuario)}
+    if ids:
+        session.info.setdefault('identidades_escritas', set()).update(ids)
+
+
+@event.listens_for(Session, 'after_commit')
+def _invalidar_al_confirmar(session):
+    ids = session.info.pop('identidades_escritas', None)
+    if ids:
+        invalidar(ids)
+
+
+@event.listens_for(Session, 'after_rollback')
+def _descartar_usuarios(session):
+    session.info.pop('identidades_escritas', None)
@@ -0,0 +1,494 @@
+"""
+Importación masiva de registros históricos desde CSV o Excel.
+
+El archivo se lee en streaming (csv.reader / openpyxl en modo read_only), cada
+fila se valida en memoria contra los catálogos con catalogos.resolver() y las
+filas válidas se insertan por lotes con bulk_insert_mappings (executemany),
+un commit por lote. Después de cada lote se escribe un checkpoint JSON junto
+al archivo; si la importación se interrumpe, al repetirla se continúa desde
+la última fila confirmada.
+
+El formato esperado es el de las exportaciones (exportacion.py), que a su vez
+sigue el libro base; también se aceptan los encabezados originales del libro.
+"""
+import csv
+import hashlib
+import json
+import os
+import unicodedata
+from collections import Counter, defaultdict
+from datetime import date, datetime
+
+from sqlalchemy.exc import IntegrityError
+
+from models import (db, AccionPreventiva, ReporteAccionPreventiva, ReporteTipoAtencion,
+                    OficinaRegional, TipoReporte, EntidadFederativa, Municipio, ActorInterno,
+                    TipoAtencion, TipoProblematica, GradoClasificacion)
+import catalogos
+import folios
+import resumen_mensual
+import busqueda
+import geoespacial
+import marcas
+import cache_respuestas
+
+LOTE_DEFAULT = 1000
+MAX_ERRORES_RESPUESTA = 500
+INTENTOS_FOLIO = 5
+EXTENSIONES = ('.csv', '.xlsx', '.xlsm')
+
+
+class ErrorFila(ValueError):
+    """Error de validación de una fila; el mensaje se muestra en el reporte"""
+
+
+# ========== CONVERSIÓN DE VALORES ==========
+
+def _texto(valor):
+    if valor is None:
+        return ''
+    return str(valor).strip()
+
+
+def _fecha(valor):
+    if valor in (None, ''):
+        return None
+    if isinstance(valor, datetime):
+        return valor.date()
+    if isinstance(valor, date):
+        return valor
+    texto = _texto(valor)
+    for formato in ('%d/%m/%Y', '%Y-%m-%d', '%d-%m-%Y'):
+        try:
+            return datetime.strptime(texto, formato).date()
+        except ValueError:
+            continue
+    raise ErrorFila(f'Fecha no válida: "{texto}"')
+
+
+def _entero(valor):
+    if valor in (None, ''):
+        return None
+    try:
+        return int(float(str(valor).replace('%', '').strip()))
+    except ValueError:
+        raise ErrorFila(f'Número no válido: "{valor}"')
+
+
+def _decimal(valor):
+    if valor in (None, ''):
+        return None
+    try:
+        return float(str(valor).replace('$', '').replace(',', '').strip())
+    except ValueError:
+        raise ErrorFila(f'Importe no válido: "{valor}"')
+
+
+def normalizar_encabezado(encabezado):
+    """Primera línea del encabezado, sin acentos ni mayúsculas ni espacios extra"""
+    texto = _texto(encabezado).split('\n')[0]
+    texto = unicodedata.normalize('NFKD', texto).encode('ascii', 'ignore').decode()
+    return ' '.join(texto.lower().split())
+
+
+# ========== FORMATOS ==========
+
+# campo -> (encabezados aceptados, conversión, requerido)
+CAMPOS_ACCIONES = {
+    'folio': (('Folio',), _texto, False),
+    'region': (('Región',), _texto, True),
+    'fecha_registro': (('Fecha de Registro',), _fecha, True),
+    'estado': (('Entidad Federativa',), _texto, True),
+    'municipio': (('Municipio',), _texto, True),
+    'localidad': (('Localidad',), _texto, True),
+    'activo': (('Activo',), _texto, True),
+    'instalacion': (('Instalación',), _texto, True),
+    'tipo_problematica': (('Tipo de Problemática',), _texto, True),
+    'descripcion_problematica': (('Descripción de la Problemática',), _texto, True),
+    'actor_social': (('Actor Social',), _texto, True),
+    'nivel_impacto': (('Nivel de Impacto',), _texto, True),
+    'accion_preventiva': (('Acción Preventiva',), _texto, True),
+    'fecha_inicio': (('Fecha de Inicio',), _fecha, True),
+    'fecha_fin': (('Fecha de Fin',), _fecha, True),
+    'presupuesto': (('Presupuesto',), _decimal, False),
+    'responsable': (('Responsable',), _texto, True),
+    'area_responsable': (('Área Responsable',), _texto, True),
+    'observaciones': (('Observaciones',), _texto, False),
+    'estado_accion': (('Estatus',), _texto, False),
+    'porcentaje_avance': (('% de Avance',), _entero, False),
+}
+
+CAMPOS_REPORTES = {
+    'folio': (('Folio',), _texto, False),
+    'oficina_regional': (('Oficina Regional',), _texto, True),
+    'año_reporte': (('Año de reporte',), _entero, False),
+    'tipo_reporte': (('Tipo de Reporte',), _texto, True),
+    'fecha_reporte': (('Fecha de Reporte',), _fecha, True),
+    'entidad_federativa': (('Entidad Federativa',), _texto, True),
+    'municipio': (('Municipio(s)',), _texto, True),
+    'fecha_inicio_problematica': (('Fecha de Inicio de Problemática / Conflicto',), _fecha, False),
+    'descripcion_evento': (('Descripción del Evento',), _texto, True),
+    'exigencia_reclamacion': (('Exigencia y/o reclamación', 'Exigencia y/o reclamacion'), _texto, True),
+    'impacto_no_atender': (('Impacto en caso de no atender',
+                            'Impacto en caso de no atender las solicitudes, peticiones o demandas.'), _texto, True),
+    'acciones_realizar': (('Acciones a realizar',), _texto, True),
+    'tipo_atencion': (('Tipo de atención',), _texto, False),
+    'otro_tipo_atencion': (('Otro tipo de atención',
+                            'En caso de seleccionar OTRO tipo de atencición, describirla'), _texto, False),
+    'compromisos_acuerdos': (('Compromisos y/o Acuerdos tomados',), _texto, False),
+    'fecha_obtencion_lso': (('Fecha de Obtención de la LSO',), _fecha, False),
+    'dias_duracion_cierre': (('Días de Duración de Cierre', 'Dias de Duración de Cierre'), _entero, False),
+    'grupo_interes_localidad': (('Grupo de Interés / Localidad',), _texto, True),
+    'representantes_lideres': (('Representantes y/o Líderes', 'Representantes y/o Lideres'), _texto, False),
+    'actor_interno': (('Actores Internos',), _texto, True),
+    'otro_actor_interno': (('Otros actores internos', 'Agregar otros actores internos en su caso'), _texto, False),
+    'actores_externos': (('Actores Externos', 'Actores Exernos'), _texto, False),
+    'instalacion_estrategica': (('Instalación Estratégica Relacionada y/o Afectada',
+                                 'Instalacion Estrátegica Relacionada y/o Afectada'), _texto, False),
+    'proyectos_relacionados': (('Proyectos Relacionados y/o Afectados',), _texto, False),
+    'tipo_problematica': (('Tipo de Problemática o Conflicto Social',), _texto, False),
+    'otro_tipo_problematica': (('Otro Tipo de Problemática o Conflicto Social',
+                                'En caso de elegir OTRO Tipo de Problemática o Conflicto Social, describirlo'), _texto, False),
+    'area_involucrada': (('Área Involucrada', 'Area Involucrada (Accion Preventiva) o'), _texto, False),
+    'grado_clasificacion': (('Grado de Clasificación',), _texto, False),
+    'descripcion_estatus_cierre': (('Descripción del Estatus al cierre de mes',), _texto, False),
+}
+
+
+def _mapa_columnas(encabezados, campos):
+    """Relaciona cada campo con el índice de su columna en el archivo"""
+    posiciones = {normalizar_encabezado(e): i for i, e in enumerate(encabezados) if e is not None}
+    mapa = {}
+    for campo, (aceptados, _, requerido) in campos.items():
+        for encabezado in aceptados:
+            indice = posiciones.get(normalizar_encabezado(encabezado))
+            if indice is not None:
+                mapa[campo] = indice
+                break
+        else:
+            if requerido:
+                raise ValueError(f'Falta la columna "{aceptados[0]}" en el archivo')
+    return mapa
+
+
+def _leer_valores(renglon, mapa, campos):
+    valores = {}
+    for campo, indice in mapa.items():
+        _, convertir, requerido = campos[campo]
+        valor = convertir(renglon[indice] if indice < len(renglon) else None)
+        if requerido and valor in (None, ''):
+            raise ErrorFila(f'El campo {campos[campo][0][0]} es requerido')
+        valores[campo] = valor
+    return valores
+
+
+# ========== VALIDACIÓN Y ARMADO DE FILAS ==========
+
+def _fila_accion(valores, usuario_id):
+    return {
+        **{k: v for k, v in valores.items() if k != 'folio'},
+        'folio': valores.get('folio') or None,
+        'estado_accion': valores.get('estado_accion') or 'Registrado',
+        'porcentaje_avance': valores.get('porcentaje_avance') or 0,
+        'observaciones': valores.get('observaciones', ''),
+        'usuario_id': usuario_id,
+    }
+
+
+def _fila_reporte(valores, usuario_id):
+    try:
+        oficina_id, oficina_abrev = catalogos.resolver(OficinaRegional, valores['oficina_regional'], 'Oficina Regional')
+        tipo_id, tipo_abrev = catalogos.resolver(TipoReporte, valores['tipo_reporte'], 'Tipo de Reporte')
+        entidad_id = catalogos.resolver_id(EntidadFederativa, valores['entidad_federativa'], 'Entidad Federativa')
+        municipio_id = catalogos.resolver_id(Municipio, valores['municipio'], 'Municipio(s)',
+                                             entidad_federativa_id=entidad_id)
+        actor_id = catalogos.resolver_id(ActorInterno, valores['actor_interno'], 'Actores Internos')
+        tipos_atencion = [catalogos.resolver_id(TipoAtencion, nombre, 'Tipo de atención')
+                          for nombre in valores.get('tipo_atencion', '').split(',') if nombre.strip()]
+        problematica_id = (catalogos.resolver_id(TipoProblematica, valores['tipo_problematica'],
+                                                 'Tipo de Problemática o Conflicto Social')
+                           if valores.get('tipo_problematica') else None)
+        clasificacion_id = (catalogos.resolver_id(GradoClasificacion, valores['grado_clasificacion'],
+                                                  'Grado de Clasificación')
+                            if valores.get('grado_clasificacion') else None)
+    except catalogos.CatalogoError as e:
+        raise ErrorFila(str(e))
+
+    omitidos = {'oficina_regional', 'tipo_reporte', 'entidad_federativa', 'municipio', 'actor_interno',
+                'tipo_atencion', 'tipo_problematica', 'grado_clasificacion', 'folio'}
+    fila = {k: v for k, v in valores.items() if k not in omitidos}
+    fila.update({
+        'folio': valores.get('folio') or None,
+        'año_reporte': valores.get('año_reporte') or valores['fecha_reporte'].year,
+        'responsable_captura_id': usuario_id,
+        'oficina_regional_id': oficina_id,
+        'tipo_reporte_id': tipo_id,
+        'entidad_federativa_id': entidad_id,
+        'municipio_id': municipio_id,
+        'actor_interno_id': actor_id,
+        'tipo_problematica_id': problematica_id,
+        'grado_clasificacion_id': clasificacion_id,
+        'tipos_atencion': json.dumps(tipos_atencion),
+        '_prefijo_folio': (oficina_abrev, tipo_abrev),
+        '_tipos_atencion': tipos_atencion,
+    })
+    return fila
+
+
+# ========== INSERCIÓN POR LOTES ==========
+
+def _folios_existentes(modelo, folios_lote):
+    if not folios_lote:
+        return set()
+    return {f for (f,) in db.session.query(modelo.folio).filter(modelo.folio.in_(folios_lote)).all()}
+
+
+def _insertar_acciones(lote):
+    # Los folios del archivo adelantan su secuencia para que el bloque no los repita
+    folios.avanzar_por_folios([fila['folio'] for fila in lote if fila['folio']])
+    # Un bloque de folios por año de registro en lugar de una reserva por fila
+    sin_folio = defaultdict(list)
+    for fila in lote:
+        if not fila['folio']:
+            sin_folio[fila['fecha_registro'].year].append(fila)
+    for anio, filas in sin_folio.items():
+        for fila, folio in zip(filas, folios.folios_accion_bloque(len(filas), anio)):
+            fila['folio'] = folio
+
+    db.session.bulk_insert_mappings(AccionPreventiva, lote)
+    busqueda.indexar_folios(AccionPreventiva, [f['folio'] for f in lote])
+    geoespacial.indexar_folios([f['folio'] for f in lote])
+    marcas.tocar()
+    cache_respuestas.etiquetar('dashboard')
+
+    resumen_mensual.registrar_movimientos(Counter(
+        (f['fecha_registro'], f['region'], f['estado_accion'], f['nivel_impacto']) for f in lote
+    ))
+
+
+def _insertar_reportes(lote):
+    folios.avanzar_por_folios([fila['folio'] for fila in lote if fila['folio']], reporte=True)
+    primero = folios.reservar('REPORTE', 'REGISTRO', 0, len(lote))
+    sin_folio = defaultdict(list)
+    for i, fila in enumerate(lote):
+        fila['numero_registro'] = primero + i
+        if not fila['folio']:
+            sin_folio[fila['_prefijo_folio'] + (fila['año_reporte'],)].append(fila)
+
+    # Mismo formato que folios.folio_reporte(), reservando un bloque por secuencia
+    for (oficina_abrev, tipo_abrev, anio), filas in sin_folio.items():
+        inicial = folios.reservar(oficina_abrev, tipo_abrev, anio, len(filas))
+        for numero, fila in enumerate(filas, inicial):
+            fila['folio'] = f"{oficina_abrev}-{tipo_abrev}-{anio}-{numero:03d}"
+
+    tipos_por_folio = {f['folio']: f.pop('_tipos_atencion') for f in lote}
+    for fila in lote:
+        fila.pop('_prefijo_folio')
+    db.session.bulk_insert_mappings(ReporteAccionPreventiva, lote)
+    busqueda.indexar_folios(ReporteAccionPreventiva, list(tipos_por_folio))
+    marcas.tocar()
+    cache_respuestas.etiquetar('dashboard')
+
+    ids = dict(db.session.query(ReporteAccionPreventiva.folio, ReporteAccionPreventiva.id)
+               .filter(ReporteAccionPreventiva.folio.in_(list(tipos_por_folio))).all())
+    db.session.bulk_insert_mappings(ReporteTipoAtencion, [
+        {'reporte_id': ids[folio], 'tipo_atencion_id': tipo_id}
+        for folio, tipos in tipos_por_folio.items() for tipo_id in tipos
+    ])
+
+
+FORMATOS = {
+    'acciones': (CAMPOS_ACCIONES, _fila_accion, _insertar_acciones, AccionPreventiva),
+    'reportes': (CAMPOS_REPORTES, _fila_reporte, _insertar_reportes, ReporteAccionPreventiva),
+}
+
+
+# ========== LECTURA DEL ARCHIVO ==========
+
+def leer_renglones(ruta):
+    """Genera los renglones del archivo (CSV o XLSX) como listas de valores"""
+    if ruta.lower().endswith(('.xlsx', '.xlsm')):
+        from openpyxl import load_workbook
+
+        libro = load_workbook(ruta, read_only=True, data_only=True)
+        try:
+            for renglon in libro.worksheets[0].iter_rows(values_only=True):
+                yield list(renglon)
+        finally:
+            libro.close()
+    else:
+        with open(ruta, newline='', encoding='utf-8-sig') as archivo:
+            yield from csv.reader(archivo)
+
+
+def _saltar_hasta_encabezados(renglones, campos):
+    """El libro base tiene títulos antes de los encabezados: se busca el renglón de 'Folio'"""
+    for numero, renglon in enumerate(renglones, 1):
+        normalizados = {normalizar_encabezado(v) for v in renglon if v is not None}
+        if 'folio' in normalizados:
+            return numero, renglon
+    raise ValueError('No se encontró el renglón de encabezados (columna "Folio")')
+
+
+# ========== CHECKPOINT ==========
+
+def ruta_checkpoint(ruta):
+    return f'{ruta}.checkpoint.json'
+
+
+def _leer_checkpoint(ruta):
+    try:
+        with open(ruta_checkpoint(ruta)) as archivo:
+            return json.load(archivo)
+    except (OSError, ValueError):
+        return None
+
+
+def _escribir_checkpoint(ruta, estado):
+    temporal = ruta_checkpoint(ruta) + '.tmp'
+    with open(temporal, 'w') as archivo:
+        json.dump(estado, archivo)
+    os.replace(temporal, ruta_checkpoint(ruta))
+
+
+# ========== PROCESO PRINCIPAL ==========
+
+def importar(ruta, tipo, usuario_id, lote=LOTE_DEFAULT, reanudar=True, progreso=None):
+    """
+    Importa el archivo y regresa un resumen con el número de filas insertadas,
+    rechazadas y la lista de errores por fila ({'fila': n, 'error': mensaje}).
+    Con reanudar=True se omiten las filas ya confirmadas en un intento previo.
+    `progreso`, si se indica, se llama con el número de filas procesadas.
+    """
+    campos, armar_fila, insertar, modelo = FORMATOS[tipo]
+
+    estado = (_leer_checkpoint(ruta) if reanudar else None) or {
+        'tipo': tipo, 'ultima_fila': 0, 'insertadas': 0, 'errores': []
+    }
+    if estado['tipo'] != tipo:
+        raise ValueError('El checkpoint existente corresponde a otro tipo de importación')
+
+    renglones = leer_renglones(ruta)
+    fila_encabezados, encabezados = _saltar_hasta_encabezados(renglones, campos)
+    mapa = _mapa_columnas(encabezados, campos)
+
+    pendientes = []
+    folios_archivo = set()
+
+    def sin_numero(filas):
+        # Copias: insertar() asigna folios y retira campos auxiliares
+        return [{k: v for k, v in fila.items() if k != '_fila'} for fila in filas]
+
+    def insertar_lote(filas):
+        """
+        Inserta el lote en un savepoint. Si choca con un índice único (folio
+        capturado por otra vía, por ejemplo), reintenta fila por fila y
+        registra como error solo las que fallan. Cuando lo ocupado es un folio
+        generado, la secuencia salta ese número y la fila se reintenta.
+        """
+        try:
+            with db.session.begin_nested():
+                insertar(sin_numero(filas))
+            return len(filas)
+        except IntegrityError:
+            pass
+
+        insertadas = 0
+        for fila in filas:
+            for _ in range(INTENTOS_FOLIO):
+                copia = sin_numero([fila])
+                try:
+                    with db.session.begin_nested():
+                        insertar(copia)
+                    insertadas += 1
+                    error = None
+                    break
+                except IntegrityError as e:
+                    error = e
+                    if fila['folio']:
+                        break
+                    # El rollback del savepoint regresó la secuencia; se adelanta fuera de él
+                    folios.avanzar_por_folios([copia[0]['folio']], reporte=tipo == 'reportes')
+            if error is not None:
+                estado['errores'].append({'fila': fila['_fila'], 'error': f'Valor duplicado: {error.orig}'})
+        return insertadas
+
+    def confirmar(ultima_fila):
+        if pendientes:
+            existentes = _folios_existentes(modelo, [f['folio'] for f in pendientes if f['folio']])
+            for fila in [f for f in pendientes if f['folio'] in existentes]:
+                estado['errores'].append({'fila': fila['_fila'], 'error': f"El folio {fila['folio']} ya existe"})
+            validas = [f for f in pendientes if f['folio'] not in existentes]
+            if validas:
+                estado['insertadas'] += insertar_lote(validas)
+        db.session.commit()
+        estado['ultima_fila'] = ultima_fila
+        _escribir_checkpoint(ruta, estado)
+        pendientes.clear()
+        if progreso:
+            progreso(ultima_fila)
+
+    numero = fila_encabezados
+    try:
+        for numero, renglon in enumerate(renglones, fila_encabezados + 1):
+            if numero <= estado['ultima_fila'] or not any(v not in (None, '') for v in renglon):
+                continue
+            try:
+                fila = armar_fila(_leer_valores(renglon, mapa, campos), usuario_id)
+                if fila['folio'] and fila['folio'] in folios_archivo:
+                    raise ErrorFila(f"El folio {fila['folio']} está repetido en el archivo")
+                if fila['folio']:
+                    folios_archivo.add(fila['folio'])
+                fila['_fila'] = numero
+                pendientes.append(fila)
+            except ErrorFila as e:
+                estado['errores'].append({'fila': numero, 'error': str(e)})
+
+            if len(pendientes) >= lote:
+                confirmar(numero)
+
+        confirmar(max(numero, estado['ultima_fila']))
+    except Exception:
+        db.session.rollback()
+        raise
+
+    os.remove(ruta_checkpoint(ruta))
+    return {
+        'insertadas': estado['insertadas'],
+        'rechazadas': len(estado['errores']),
+        'errores': estado['errores'],
+    }
+
+
+def guardar_archivo(archivo, directorio):
+    """
+    Guarda un archivo subido en bloques y lo nombra por su SHA-1: si la misma
+    carga se repite después de una interrupción, encuentra su checkpoint.
+    """
+    extension = os.path.splitext(archivo.filename or '')[1].lower()
+    if extension not in EXTENSIONES:
+        raise ValueError('Solo se aceptan archivos .csv o .xlsx')
+
+    os.makedirs(directorio, exist_ok=True)
+    huella = hashlib.sha1()
+    temporal = os.path.join(directorio, f'carga_{os.getpid()}_{id(archivo)}.tmp')
+    with open(temporal, 'wb') as destino:
+        while True:
+            bloque = archivo.stream.read(64 * 1024)
+            if not bloque:
+                break
+            huella.update(bloque)
+            destino.write(bloque)
+
+    ruta = os.path.join(directorio, huella.hexdigest() + extension)
+    os.replace(temporal, ruta)
+    return ruta
+
+
+def escribir_reporte_errores(errores, ruta):
+    """Guarda el reporte de errores por fila en CSV"""
+    with open(ruta, 'w', newline='', encoding='utf-8-sig') as archivo:
+        escritor = csv.writer(archivo)
+        escritor.writerow(['Fila', 'Error'])
+        for error in errores:
+            escritor.writerow([error['fila'], error['error']])
@@ -0,0 +1,198 @@
+"""
+Perfilado por petición: consultas SQL, tiempo de base de datos y de render.
+
+Se activa con PERFILADO=1. Si está desactivado, init_app() no registra nada
+(ni eventos de SQLAlchemy ni señales de Flask ni la ruta de métricas), así
+que no tiene costo. Con el perfilado activo, cada respuesta lleva el
+encabezado Server-Timing y los acumulados por endpoint se publican en
+/admin/metrics en formato de texto de Prometheus.
+
+Variables de entorno:
+    PERFILADO                     1 para activar
+    PERFILADO_CONSULTA_LENTA_MS   umbral del log de consultas lentas (0 = sin log)
+    METRICAS_TOKEN                token Bearer para que Prometheus lea
+                                  /admin/metrics sin sesión de administrador
+"""
+import hmac
+import logging
+import os
+import threading
+import time
+
+from flask import (g, has_request_context, request, jsonify, Response,
+                   request_started, request_finished, before_render_template, template_rendered)
+from flask_login import current_user
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+log_consultas_lentas = logging.getLogger('pemex.consultas_lentas')
+
+# Límites (en segundos) de los buckets del histograma de latencia
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def activo():
+    return os.environ.get('PERFILADO', '').strip().lower() in ('1', 'true', 'si', 'sí')
+
+
+class _Endpoint:
+    """Acumulados de un endpoint desde que arrancó el proceso"""
+
+    __slots__ = ('peticiones', 'buckets', 'duracion_total', 'consultas', 'tiempo_bd', 'tiempo_render',
+                 'consulta_maxima')
+
+    def __init__(self):
+        self.peticiones = 0
+        self.buckets = [0] * len(BUCKETS)
+        self.duracion_total = 0.0
+        self.consultas = 0
+        self.tiempo_bd = 0.0
+        self.tiempo_render = 0.0
+        self.consulta_maxima = 0.0
+
+
+_endpoints = {}
+_lock = threading.Lock()
+_umbral_lento = 0.0
+
+
+# ========== EVENTOS ==========
+
+def _antes_de_consulta(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault('perfilado_inicio', []).append(time.perf_counter())
+
+
+def _despues_de_consulta(conn, cursor, statement, parameters, context, executemany):
+    duracion = time.perf_counter() - conn.info['perfilado_inicio'].pop()
+
+    if _umbral_lento and duracion >= _umbral_lento:
+        endpoint = request.endpoint if has_request_context() else None
+        log_consultas_lentas.warning('%.1f ms [%s] %s', duracion * 1000, endpoint or '-', ' '.join(statement.split()))
+
+    perfil = g.get('perfil') if has_request_context() else None
+    if perfil is None:
+        return
+    perfil['consultas'] += 1
+    perfil['tiempo_bd'] += duracion
+    if duracion > perfil['consulta_maxima']:
+        perfil['consulta_maxima'] = duracion
+
+
+def _error_de_consulta(contexto):
+    inicios = contexto.connection.info.get('perfilado_inicio') if contexto.connection is not None else None
+    if inicios:
+        inicios.pop()
+
+
+def _inicio_peticion(sender, **extra):
+    g.perfil = {'inicio': time.perf_counter(), 'consultas': 0, 'tiempo_bd': 0.0,
+                'consulta_maxima': 0.0, 'tiempo_render': 0.0, 'inicio_render': []}
+
+
+def _antes_de_render(sender, template, context, **extra):
+    perfil = g.get('perfil')
+    if perfil is not None:
+        perfil['inicio_render'].append(time.perf_counter())
+
+
+def _despues_de_render(sender, template, context, **extra):
+    perfil = g.get('perfil')
+    if perfil is not None and perfil['inicio_render']:
+        perfil['tiempo_render'] += time.perf_counter() - perfil['inicio_render'].pop()
+
+
+def _fin_peticion(sender, response, **extra):
+    perfil = g.pop('perfil', None)
+    if perfil is None:
+        return
+    duracion = time.perf_counter() - perfil['inicio']
+
+    response.headers['Server-Timing'] = ', '.join([
+        f"db;dur={perfil['tiempo_bd'] * 1000:.1f};desc=\"{perfil['consultas']} consultas\"",
+        f"sql-max;dur={perfil['consulta_maxima'] * 1000:.1f}",
+        f"render;dur={perfil['tiempo_render'] * 1000:.1f}",
+        f"total;dur={duracion * 1000:.1f}",
+    ])
+
+    clave = (request.endpoint or 'sin_ruta', request.method)
+    with _lock:
+        acumulado = _endpoints.get(clave)
+        if acumulado is None:
+            acumulado = _endpoints[clave] = _Endpoint()
+        acumulado.peticiones += 1
+        acumulado.duracion_total += duracion
+        for i, limite in enumerate(BUCKETS):
+            if duracion <= limite:
+                acumulado.buckets[i] += 1
+        acumulado.consultas += perfil['consultas']
+        acumulado.tiempo_bd += perfil['tiempo_bd']
+        acumulado.tiempo_render += perfil['tiempo_render']
+        acumulado.consulta_maxima = max(acumulado.consulta_maxima, perfil['consulta_maxima'])
+
+
+# ========== EXPOSICIÓN ==========
+
+def _etiquetas(endpoint, metodo, **extra):
+    pares = [('endpoint', endpoint), ('method', metodo)] + list(extra.items())
+    return '{' + ','.join(f'{k}="{v}"' for k, v in pares) + '}'
+
+
+def texto_prometheus():
+    """Acumulados en formato de exposición de texto de Prometheus"""
+    with _lock:
+        copia = {clave: (e.peticiones, list(e.buckets), e.duracion_total, e.consultas, e.tiempo_bd,
+                         e.tiempo_render, e.consulta_maxima)
+                 for clave, e in _endpoints.items()}
+
+    lineas = [
+        '# HELP pemex_http_request_duration_seconds Duración de las peticiones por endpoint',
+        '# TYPE pemex_http_request_duration_seconds histogram',
+    ]
+    for (endpoint, metodo), (peticiones, buckets, duracion, *_) in sorted(copia.items()):
+        for limite, cuenta in zip(BUCKETS, buckets):
+            lineas.append(f'pemex_http_request_duration_seconds_bucket{_etiquetas(endpoint, metodo, le=limite)} {cuenta}')
+        lineas.append(f'pemex_http_request_duration_seconds_bucket{_etiquetas(endpoint, metodo, le="+Inf")} {peticiones}')
+        lineas.append(f'pemex_http_request_duration_seconds_sum{_etiquetas(endpoint, metodo)} {duracion:.6f}')
+        lineas.append(f'pemex_http_request_duration_seconds_count{_etiquetas(endpoint, metodo)} {peticiones}')
+
+    series = [
+        ('pemex_db_queries_total', 'counter', 'Consultas SQL ejecutadas', 3),
+        ('pemex_db_time_seconds_total', 'counter', 'Tiempo acumulado en la base de datos', 4),
+        ('pemex_render_time_seconds_total', 'counter', 'Tiempo acumulado en render de plantillas', 5),
+        ('pemex_db_slowest_query_seconds', 'gauge', 'Consulta SQL más lenta observada', 6),
+    ]
+    for nombre, tipo, ayuda, indice in series:
+        lineas += [f'# HELP {nombre} {ayuda}', f'# TYPE {nombre} {tipo}']
+        for (endpoint, metodo), valores in sorted(copia.items()):
+            lineas.append(f'{nombre}{_etiquetas(endpoint, metodo)} {valores[indice]}')
+
+    return '\n'.join(lineas) + '\n'
+
+
+def metricas():
+    """Vista /admin/metrics: administrador con sesión o token Bearer de METRICAS_TOKEN"""
+    token = os.environ.get('METRICAS_TOKEN')
+    # Comparación en tiempo constante; en bytes porque el encabezado puede traer no-ASCII
+    autorizado = bool(token) and hmac.compare_digest(request.headers.get('Authorization', '').encode(),
+                                                     f'Bearer {token}'.encode())
+    if not autorizado and not (current_user.is_authenticated and current_user.rol == 'Administrador'):
+        return jsonify({'success': False, 'error': 'No autorizado'}), 403
+    return Response(texto_prometheus(), mimetype='text/plain; version=0.0.4')
+
+
+def init_app(app):
+    """Registra eventos, señales y la ruta de métricas solo si PERFILADO está activo"""
+    global _umbral_lento
+    if not activo():
+        return
+
+    _umbral_lento = float(os.environ.get('PERFILADO_CONSULTA_LENTA_MS', 200)) / 1000
+
+    event.listen(Engine, 'before_cursor_execute', _antes_de_consulta)
+    event.listen(Engine, 'after_cursor_execute', _despues_de_consulta)
+    event.listen(Engine, 'handle_error', _error_de_consulta)
+    request_started.connect(_inicio_peticion, app)
+    before_render_template.connect(_antes_de_render, app)
+    template_rendered.connect(_despues_de_render, app)
+    request_finished.connect(_fin_peticion, app)
+    app.add_url_rule('/admin/metrics', 'admin_metrics', metricas)
@@ -0,0 +1,95 @@
+"""
+Listado paginado de acciones preventivas.
+
+Usa paginación por llave (keyset/seek) sobre (fecha_creacion, id): cada página
+continúa desde la última fila de la anterior con un WHERE sobre esa pareja en
+lugar de un OFFSET, de modo que la página 5,000 cuesta lo mismo que la primera.
+Los filtros de estado_accion, region y nivel_impacto están respaldados por
+índices compuestos (filtro, fecha_creacion, id) declarados en models.py.
+"""
+import base64
+from datetime import datetime
+
+from sqlalchemy import tuple_
+
+from models import AccionPreventiva
+import perfiles_carga
+
+LIMITE_DEFAULT = 50
+LIMITE_MAXIMO = 200
+
+FILTROS_EXACTOS = ('estado_accion', 'region', 'nivel_impacto')
+
+
+def filtros_desde_args(args):
+    """Extrae los filtros del query string; ignora los vacíos o mal formados"""
+    filtros = {campo: args.get(campo) for campo in FILTROS_EXACTOS if args.get(campo)}
+
+    for campo in ('fecha_desde', 'fecha_hasta'):
+        valor = args.get(campo)
+        if valor:
+            try:
+                filtros[campo] = datetime.strptime(valor, '%Y-%m-%d').date()
+            except ValueError:
+                pass
+
+    return filtros
+
+
+def codificar_cursor(accion):
+    """Cursor opaco a partir de la última acción de la página"""
+    crudo = f"{accion.fecha_creacion.isoformat()}|{accion.id}"
+    return base64.urlsafe_b64encode(crudo.encode()).decode()
+
+
+def decodificar_cursor(cursor):
+    """Regresa (fecha_creacion, id) o None si el cursor no es válido"""
+    try:
+        fecha, id_ = base64.urlsafe_b64decode(cursor.encode()).decode().split('|')
+        return datetime.fromisoformat(fecha), int(id_)
+    except (ValueError, UnicodeDecodeError):
+        return None
+
+
+def consulta_filtrada(filtros):
+    """Consulta de acciones con los filtros aplicados, sin orden ni límite"""
+    consulta = AccionPreventiva.query
+
+    for campo in FILTROS_EXACTOS:
+        if campo in filtros:
+            consulta = consulta.filter(getattr(AccionPreventiva, campo) == filtros[campo])
+
+    if 'fecha_desde' in filtros:
+        consulta = consulta.filter(AccionPreventiva.fecha_registro >= filtros['fecha_desde'])
+    if 'fecha_hasta' in filtros:
+        consulta = consulta.filter(AccionPreventiva.fecha_registro <= filtros['fecha_hasta'])
+
+    return consulta
+
+
+def pagina_acciones(filtros, cursor=None, limite=LIMITE_DEFAULT, orden='desc', perfil='listado'):
+    """
+    Regresa (acciones, siguiente_cursor). siguiente_cursor es None en la
+    última página. `orden` es 'desc' (más recientes primero) o 'asc'.
+    `perfil` es el perfil de carga anticipada de perfiles_carga.
+    """
+    limite = min(max(limite, 1), LIMITE_MAXIMO)
+    llave = tuple_(AccionPreventiva.fecha_creacion, AccionPreventiva.id)
+
+    consulta = consulta_filtrada(filtros).options(*perfiles_carga.opciones(AccionPreventiva, perfil))
+
+    posicion = decodificar_cursor(cursor) if cursor else None
+    if posicion:
+        consulta = consulta.filter(llave > posicion if orden == 'asc' else llave < posicion)
+
+    if orden == 'asc':
+        consulta = consulta.order_by(AccionPreventiva.fecha_creacion.asc(), AccionPreventiva.id.asc())
+    else:
+        consulta = consulta.order_by(AccionPreventiva.fecha_creacion.desc(), AccionPreventiva.id.desc())
+
+    # Se pide una fila extra para saber si existe una página siguiente
+    filas = consulta.limit(limite + 1).all()
+    acciones = filas[:limite]
+    siguiente = codificar_cursor(acciones[-1]) if len(filas) > limite else None
+
+    return acciones, siguiente
@@ -0,0 +1,79 @@
+"""
+Marcas de modificación para respuestas HTTP condicionales.
+
+La tabla marcas_modificacion guarda, por nombre, un contador de versión y la
+fecha de la última escritura. La marca 'dashboard' sube con cualquier alta,
+cambio real o baja de acciones preventivas, reportes o de los catálogos que
+muestra el dashboard: un evento after_flush de la sesión la deja pendiente y
+after_commit la sube en una transacción corta aparte, así que las
+transacciones de captura no se serializan en esa fila y un rollback no la
+mueve. Las cargas masivas que escriben con executemany llaman a tocar().
+/api/dashboard/summary deriva su ETag de la versión, de modo que una petición
+condicional se resuelve leyendo una sola fila.
+"""
+from datetime import datetime
+from itertools import chain
+
+from sqlalchemy import event, select, update, insert
+from sqlalchemy.orm import Session
+
+from models import (db, MarcaModificacion, AccionPreventiva, ReporteAccionPreventiva, TipoReporte,
+                    OficinaRegional, EstatusGeneral)
+
+DASHBOARD = 'dashboard'
+MODELOS_DASHBOARD = (AccionPreventiva, ReporteAccionPreventiva, TipoReporte, OficinaRegional, EstatusGeneral)
+
+
+def tocar(nombre=DASHBOARD):
+    """Marca pendiente que sube al confirmarse la transacción actual; no hace commit"""
+    db.session.info.setdefault('marcas_pendientes', set()).add(nombre)
+
+
+def subir(nombre, conexion):
+    """Sube la versión de la marca con `conexion`"""
+    resultado = conexion.execute(
+        update(MarcaModificacion).where(MarcaModificacion.nombre == nombre)
+        .values(version=MarcaModificacion.version + 1, fecha_modificacion=datetime.utcnow())
+    )
+    if resultado.rowcount == 0:
+        conexion.execute(insert(MarcaModificacion).values(nombre=nombre, version=1,
+                                                          fecha_modificacion=datetime.utcnow()))
+
+
+def leer(nombre=DASHBOARD):
+    """(version, fecha_modificacion) de la marca; (0, None) si no existe"""
+    fila = db.session.execute(
+        select(MarcaModificacion.version, MarcaModificacion.fecha_modificacion)
+        .where(MarcaModificacion.nombre == nombre)
+    ).first()
+    return (fila[0], fila[1]) if fila else (0, None)
+
+
+def _modifica_dashboard(session):
+    if any(isinstance(objeto, MODELOS_DASHBOARD) for objeto in chain(session.new, session.deleted)):
+        return True
+    # session.dirty incluye objetos con atributos asignados al mismo valor
+    return any(isinstance(objeto, MODELOS_DASHBOARD) and session.is_modified(objeto) for objeto in session.dirty)
+
+
+@event.listens_for(Session, 'after_flush')
+def _tocar_dashboard(session, flush_context):
+    if _modifica_dashboard(session):
+        session.info.setdefault('marcas_pendientes', set()).add(DASHBOARD)
+
+
+@event.listens_for(Session, 'after_commit')
+def _subir_al_confirmar(session):
+    # after_commit también se emite al liberar un savepoint; la marca espera al commit real
+    if session.in_nested_transaction():
+        return
+    pendientes = session.info.pop('marcas_pendientes', None)
+    if pendientes:
+        with db.engine.begin() as conexion:
+            for nombre in sorted(pendientes):
+                subir(nombre, conexion)
+
+
+@event.listens_for(Session, 'after_rollback')
+def _descartar_marcas(session):
+    session.info.pop('marcas_pendientes', None)
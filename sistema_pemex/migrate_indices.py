@@ -0,0 +1,54 @@
+"""
+Script para crear en una base existente los índices declarados en models.py
+
+db.create_all() solo crea tablas nuevas; las tablas que ya existen en MySQL no
+reciben los índices agregados después en __table_args__. Este script compara
+los índices declarados contra los existentes y crea los que faltan. Un índice
+se omite si ya existe otro con el mismo nombre o con las mismas columnas al
+inicio (por ejemplo, el índice que MySQL crea para cada llave foránea).
+"""
+from sqlalchemy import inspect
+
+from app import app
+from models import db
+
+
+def _columnas_existentes(inspector, tabla):
+    indices = inspector.get_indexes(tabla)
+    for restriccion in inspector.get_unique_constraints(tabla):
+        indices.append({'name': restriccion['name'], 'column_names': restriccion['column_names']})
+    return indices
+
+
+def migrate_indices():
+    with app.app_context():
+        inspector = inspect(db.engine)
+        tablas_existentes = set(inspector.get_table_names())
+        creados = 0
+
+        for tabla in db.metadata.sorted_tables:
+            if tabla.name not in tablas_existentes:
+                continue
+
+            existentes = _columnas_existentes(inspector, tabla.name)
+            nombres = {i['name'] for i in existentes}
+
+            for indice in tabla.indexes:
+                columnas = [c.name for c in indice.columns]
+                cubierto = any(i['column_names'][:len(columnas)] == columnas for i in existentes)
+
+                if indice.name in nombres or cubierto:
+                    continue
+
+                try:
+                    indice.create(bind=db.engine)
+                    creados += 1
+                    print(f"✓ Índice {indice.name} creado en {tabla.name} ({', '.join(columnas)})")
+                except Exception as e:
+                    print(f"✗ Error creando índice {indice.name}: {e}")
+
+        print(f"✓ Migración de índices completada ({creados} creados)")
+
+
+if __name__ == "__main__":
+    migrate_indices()
@@ -1,8 +1,10 @@
 from flask_sqlalchemy import SQLAlchemy
 from flask_login import UserMixin
 from datetime import datetime, date
-from werkzeug.security import generate_password_hash, check_password_hash
-from sqlalchemy import Numeric
+import json
+import contrasenas
+from sqlalchemy import Numeric, DDL, event
+from sqlalchemy.dialects import mysql
 
 # Esta instancia se importará en app.py
 db = SQLAlchemy()
@@ -39,10 +41,10 @@ class Usuario(UserMixin, db.Model):
         return ' '.join(nombres)
     
     def set_password(self, password):
-        self.password_hash = generate_password_hash(password)
+        self.password_hash = contrasenas.generar(password)
     
     def check_password(self, password):
-        return check_password_hash(self.password_hash, password)
+        return contrasenas.verificar(self.password_hash, password)
     
     def to_dict(self):
         """Convierte el usuario a diccionario para JSON"""
@@ -160,6 +162,19 @@ class EstatusGeneral(db.Model):
 # Tabla principal de reportes
 class ReporteAccionPreventiva(db.Model):
     __tablename__ = 'reportes_accion_preventiva'
+    __table_args__ = (
+        # Listados recientes y filtros del dashboard
+        db.Index('ix_reportes_fecha_creacion', 'fecha_creacion'),
+        db.Index('ix_reportes_fecha_reporte', 'fecha_reporte'),
+        db.Index('ix_reportes_estatus_fecha_reporte', 'estatus_actual_id', 'fecha_reporte'),
+        # Llaves foráneas (SQLite no las indexa automáticamente)
+        db.Index('ix_reportes_responsable_captura', 'responsable_captura_id'),
+        db.Index('ix_reportes_oficina_regional', 'oficina_regional_id'),
+        db.Index('ix_reportes_tipo_reporte', 'tipo_reporte_id'),
+        db.Index('ix_reportes_entidad_federativa', 'entidad_federativa_id'),
+        db.Index('ix_reportes_municipio', 'municipio_id'),
+        db.Index('ix_reportes_actor_interno', 'actor_interno_id'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     numero_registro = db.Column(db.Integer, unique=True, nullable=False)
@@ -222,6 +237,8 @@ class ReporteAccionPreventiva(db.Model):
     fecha_actualizacion = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
     # Relaciones
+    estatus_actual = db.relationship('EstatusGeneral', foreign_keys=[estatus_actual_id])
+    grado_probabilidad = db.relationship('EstatusGeneral', foreign_keys=[grado_probabilidad_id])
     seguimientos = db.relationship('SeguimientoCompromiso', backref='reporte', lazy=True)
     historial_ediciones = db.relationship('HistorialEdicion', backref='reporte', lazy=True)
     
@@ -231,6 +248,9 @@ class ReporteAccionPreventiva(db.Model):
 # Tabla de seguimiento de compromisos
 class SeguimientoCompromiso(db.Model):
     __tablename__ = 'seguimiento_compromisos'
+    __table_args__ = (
+        db.Index('ix_seguimiento_compromisos_reporte', 'reporte_id'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     reporte_id = db.Column(db.Integer, db.ForeignKey('reportes_accion_preventiva.id'), nullable=False)
@@ -257,9 +277,39 @@ class SeguimientoCompromiso(db.Model):
     fecha_actualizacion = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     responsable_captura_id = db.Column(db.Integer, db.ForeignKey('usuarios.id'), nullable=False)
 
+# Avances mensuales normalizados (una fila por compromiso y mes, derivada de
+# avances_mensuales); la llave primaria sirve los recorridos por compromiso
+class AvanceMensualCompromiso(db.Model):
+    __tablename__ = 'avances_mensuales_compromiso'
+    __table_args__ = (
+        # Recorridos por periodo (avance de todos los compromisos en un rango de meses)
+        db.Index('ix_avances_mensuales_periodo', 'anio', 'mes', 'seguimiento_id'),
+    )
+
+    seguimiento_id = db.Column(db.Integer, db.ForeignKey('seguimiento_compromisos.id', ondelete='CASCADE'),
+                               primary_key=True, autoincrement=False)
+    anio = db.Column(db.SmallInteger, primary_key=True, autoincrement=False)
+    mes = db.Column(db.SmallInteger, primary_key=True, autoincrement=False)
+    porcentaje = db.Column(db.SmallInteger, nullable=False)
+
+    def __repr__(self):
+        return f'<AvanceMensualCompromiso {self.seguimiento_id} {self.anio}-{self.mes:02d} {self.porcentaje}%>'
+
+# Compromisos con avances modificados desde el último cálculo de cumplimiento
+class CumplimientoPendiente(db.Model):
+    __tablename__ = 'cumplimiento_pendientes'
+
+    seguimiento_id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+
+    def __repr__(self):
+        return f'<CumplimientoPendiente {self.seguimiento_id}>'
+
 # Tabla para el historial de ediciones
 class HistorialEdicion(db.Model):
     __tablename__ = 'historial_ediciones'
+    __table_args__ = (
+        db.Index('ix_historial_reporte_fecha', 'reporte_id', 'fecha_edicion'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     reporte_id = db.Column(db.Integer, db.ForeignKey('reportes_accion_preventiva.id'), nullable=False)
@@ -275,6 +325,11 @@ class HistorialEdicion(db.Model):
 # Tabla para tipos de atención seleccionados (relación muchos a muchos)
 class ReporteTipoAtencion(db.Model):
     __tablename__ = 'reporte_tipo_atencion'
+    __table_args__ = (
+        db.Index('ix_reporte_tipo_atencion_reporte', 'reporte_id'),
+        # Reportes por tipo de atención (tipos_atencion.reportes_por_tipo)
+        db.Index('ix_reporte_tipo_atencion_tipo_reporte', 'tipo_atencion_id', 'reporte_id'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     reporte_id = db.Column(db.Integer, db.ForeignKey('reportes_accion_preventiva.id'), nullable=False)
@@ -290,6 +345,15 @@ class ReporteTipoAtencion(db.Model):
 
 class AccionPreventiva(db.Model):
     __tablename__ = 'acciones_preventivas'
+    __table_args__ = (
+        # Paginación por llave del listado y sus filtros
+        db.Index('ix_acciones_fecha_creacion_id', 'fecha_creacion', 'id'),
+        db.Index('ix_acciones_estado_fecha_creacion', 'estado_accion', 'fecha_creacion', 'id'),
+        db.Index('ix_acciones_region_fecha_creacion', 'region', 'fecha_creacion', 'id'),
+        db.Index('ix_acciones_impacto_fecha_creacion', 'nivel_impacto', 'fecha_creacion', 'id'),
+        db.Index('ix_acciones_fecha_registro', 'fecha_registro'),
+        db.Index('ix_acciones_usuario', 'usuario_id'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     folio = db.Column(db.String(50), unique=True, nullable=False)
@@ -377,6 +441,9 @@ class AccionPreventiva(db.Model):
 # Tabla para seguimiento de acciones preventivas
 class SeguimientoAccion(db.Model):
     __tablename__ = 'seguimiento_acciones'
+    __table_args__ = (
+        db.Index('ix_seguimiento_acciones_accion_fecha', 'accion_id', 'fecha_seguimiento'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     accion_id = db.Column(db.Integer, db.ForeignKey('acciones_preventivas.id'), nullable=False)
@@ -410,3 +477,250 @@ class SeguimientoAccion(db.Model):
             'fecha_creacion': self.fecha_creacion.isoformat() if self.fecha_creacion else None,
             'usuario_seguimiento': self.usuario.nombre_completo if self.usuario else None
         }
+
+# Secuencias para la asignación de folios (una fila por prefijo, tipo y año)
+class SecuenciaFolio(db.Model):
+    __tablename__ = 'secuencias_folio'
+    __table_args__ = (
+        db.UniqueConstraint('prefijo', 'tipo', 'anio', name='uq_secuencia_folio_clave'),
+    )
+    
+    id = db.Column(db.Integer, primary_key=True)
+    prefijo = db.Column(db.String(20), nullable=False)  # Abreviatura de oficina regional o 'AP'
+    tipo = db.Column(db.String(20), nullable=False, default='')  # Abreviatura del tipo de reporte
+    anio = db.Column(db.Integer, nullable=False)
+    ultimo_valor = db.Column(db.Integer, nullable=False, default=0)
+    
+    def __repr__(self):
+        return f'<SecuenciaFolio {self.prefijo}-{self.tipo}-{self.anio}: {self.ultimo_valor}>'
+
+# Resumen mensual materializado de acciones preventivas (para gráficas de tendencia)
+class ResumenMensualAccion(db.Model):
+    __tablename__ = 'acciones_resumen_mensual'
+    __table_args__ = (
+        db.UniqueConstraint('anio', 'mes', 'region', 'estado_accion', 'nivel_impacto',
+                            name='uq_resumen_mensual_clave'),
+    )
+    
+    id = db.Column(db.Integer, primary_key=True)
+    anio = db.Column(db.Integer, nullable=False)
+    mes = db.Column(db.Integer, nullable=False)
+    region = db.Column(db.String(100), nullable=False)
+    estado_accion = db.Column(db.String(50), nullable=False)
+    nivel_impacto = db.Column(db.String(50), nullable=False)
+    total = db.Column(db.Integer, nullable=False, default=0)
+    
+    def __repr__(self):
+        return f'<ResumenMensualAccion {self.anio}-{self.mes:02d} {self.region} {self.estado_accion}: {self.total}>'
+
+# Documento de búsqueda de texto completo (uno por acción o reporte)
+class DocumentoBusqueda(db.Model):
+    __tablename__ = 'busqueda_documentos'
+    __table_args__ = (
+        db.UniqueConstraint('tipo', 'registro_id', name='uq_busqueda_documento'),
+        # En MySQL el índice FULLTEXT; en SQLite la tabla virtual FTS5 de abajo
+        db.Index('ix_busqueda_texto', 'texto', mysql_prefix='FULLTEXT').ddl_if(dialect='mysql'),
+        db.Index('ix_busqueda_region', 'region'),
+        db.Index('ix_busqueda_estado', 'estado'),
+    )
+    
+    id = db.Column(db.Integer, primary_key=True)
+    tipo = db.Column(db.String(20), nullable=False)  # 'accion' o 'reporte'
+    registro_id = db.Column(db.Integer, nullable=False)
+    folio = db.Column(db.String(50), nullable=False)
+    region = db.Column(db.String(200), nullable=False, default='')
+    estado = db.Column(db.String(100), nullable=False, default='')
+    # Colación sin acentos para que MATCH ... AGAINST no distinga "acción" de "accion"
+    texto = db.Column(db.Text().with_variant(mysql.MEDIUMTEXT(collation='utf8mb4_unicode_ci'), 'mysql'),
+                      nullable=False)
+    
+    def __repr__(self):
+        return f'<DocumentoBusqueda {self.tipo} {self.folio}>'
+
+# Índice FTS5 de contenido externo sobre busqueda_documentos, mantenido por triggers
+for _sentencia in (
+    "CREATE VIRTUAL TABLE IF NOT EXISTS busqueda_fts USING fts5("
+    "texto, content='busqueda_documentos', content_rowid='id', tokenize='unicode61 remove_diacritics 2')",
+    "CREATE TRIGGER IF NOT EXISTS busqueda_fts_ai AFTER INSERT ON busqueda_documentos BEGIN "
+    "INSERT INTO busqueda_fts(rowid, texto) VALUES (new.id, new.texto); END",
+    "CREATE TRIGGER IF NOT EXISTS busqueda_fts_ad AFTER DELETE ON busqueda_documentos BEGIN "
+    "INSERT INTO busqueda_fts(busqueda_fts, rowid, texto) VALUES ('delete', old.id, old.texto); END",
+    "CREATE TRIGGER IF NOT EXISTS busqueda_fts_au AFTER UPDATE ON busqueda_documentos BEGIN "
+    "INSERT INTO busqueda_fts(busqueda_fts, rowid, texto) VALUES ('delete', old.id, old.texto); "
+    "INSERT INTO busqueda_fts(rowid, texto) VALUES (new.id, new.texto); END",
+):
+    event.listen(DocumentoBusqueda.__table__, 'after_create', DDL(_sentencia).execute_if(dialect='sqlite'))
+event.listen(DocumentoBusqueda.__table__, 'before_drop',
+             DDL('DROP TABLE IF EXISTS busqueda_fts').execute_if(dialect='sqlite'))
+
+# Ubicación de una acción con coordenadas, para consultas por área, radio y mapa
+class UbicacionAccion(db.Model):
+    __tablename__ = 'ubicaciones_acciones'
+    __table_args__ = (
+        # Cuadrícula del índice en SQLite; en MySQL además la columna punto de abajo
+        db.Index('ix_ubicaciones_celda', 'celda', 'x', 'y'),
+    )
+    
+    accion_id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    x = db.Column(db.Float, nullable=False)  # longitud
+    y = db.Column(db.Float, nullable=False)  # latitud
+    celda = db.Column(db.Integer, nullable=False)
+    
+    def __repr__(self):
+        return f'<UbicacionAccion {self.accion_id} ({self.x}, {self.y})>'
+
+# En MySQL, POINT generado a partir de (x, y) con índice SPATIAL; el SRID
+# explícito es necesario para que el optimizador use el índice
+event.listen(UbicacionAccion.__table__, 'after_create', DDL(
+    "ALTER TABLE ubicaciones_acciones "
+    "ADD COLUMN punto POINT SRID 0 GENERATED ALWAYS AS (POINT(x, y)) STORED NOT NULL, "
+    "ADD SPATIAL INDEX ix_ubicaciones_punto (punto)"
+).execute_if(dialect='mysql'))
+
+# Grupos del mapa precalculados por zoom: celda (fila, columna) de la
+# cuadrícula del zoom con el total y las sumas para el centroide
+class GrupoUbicacion(db.Model):
+    __tablename__ = 'ubicaciones_grupos'
+    __table_args__ = (
+        db.UniqueConstraint('zoom', 'fila', 'columna', name='uq_ubicaciones_grupo'),
+    )
+    
+    id = db.Column(db.Integer, primary_key=True)
+    zoom = db.Column(db.Integer, nullable=False)
+    fila = db.Column(db.Integer, nullable=False)
+    columna = db.Column(db.Integer, nullable=False)
+    total = db.Column(db.Integer, nullable=False, default=0)
+    suma_x = db.Column(db.Float, nullable=False, default=0)
+    suma_y = db.Column(db.Float, nullable=False, default=0)
+    # Con total = 1 es el id de la única acción del grupo
+    suma_ids = db.Column(db.BigInteger, nullable=False, default=0)
+    
+    def __repr__(self):
+        return f'<GrupoUbicacion z{self.zoom} ({self.fila}, {self.columna}): {self.total}>'
+
+# Trabajo en segundo plano (cola en la base de datos; ver trabajos.py)
+class Trabajo(db.Model):
+    __tablename__ = 'trabajos'
+    __table_args__ = (
+        db.Index('ix_trabajos_estado_disponible', 'estado', 'disponible_en'),
+        db.Index('ix_trabajos_usuario_fecha', 'usuario_id', 'fecha_creacion'),
+    )
+    
+    id = db.Column(db.Integer, primary_key=True)
+    tipo = db.Column(db.String(50), nullable=False)
+    estado = db.Column(db.String(20), nullable=False, default='Pendiente')  # Pendiente, En Proceso, Completado, Fallido
+    parametros = db.Column(db.Text, nullable=False, default='{}')  # JSON
+    resultado = db.Column(db.Text, nullable=True)  # JSON
+    error = db.Column(db.Text, nullable=True)
+    
+    # Avance reportado por la tarea
+    porcentaje_avance = db.Column(db.Integer, nullable=False, default=0)
+    mensaje = db.Column(db.String(255), nullable=True)
+    
+    # Reintentos y bloqueo
+    intentos = db.Column(db.Integer, nullable=False, default=0)
+    max_intentos = db.Column(db.Integer, nullable=False, default=3)
+    disponible_en = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    trabajador = db.Column(db.String(100), nullable=True)
+    latido = db.Column(db.DateTime, nullable=True)  # última señal del trabajador que lo tiene
+    
+    # Auditoría
+    usuario_id = db.Column(db.Integer, db.ForeignKey('usuarios.id'), nullable=True)
+    fecha_creacion = db.Column(db.DateTime, default=datetime.utcnow)
+    fecha_inicio = db.Column(db.DateTime, nullable=True)
+    fecha_fin = db.Column(db.DateTime, nullable=True)
+    
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'tipo': self.tipo,
+            'estado': self.estado,
+            'porcentaje_avance': self.porcentaje_avance,
+            'mensaje': self.mensaje,
+            'resultado': json.loads(self.resultado) if self.resultado else None,
+            'error': self.error,
+            'intentos': self.intentos,
+            'max_intentos': self.max_intentos,
+            'disponible_en': self.disponible_en.isoformat() if self.disponible_en else None,
+            'fecha_creacion': self.fecha_creacion.isoformat() if self.fecha_creacion else None,
+            'fecha_inicio': self.fecha_inicio.isoformat() if self.fecha_inicio else None,
+            'fecha_fin': self.fecha_fin.isoformat() if self.fecha_fin else None
+        }
+    
+    def __repr__(self):
+        return f'<Trabajo {self.id} {self.tipo} {self.estado}>'
+
+# Marcas de modificación: versión y fecha de la última escritura de un
+# conjunto de tablas, para responder peticiones condicionales sin consultarlas
+class MarcaModificacion(db.Model):
+    __tablename__ = 'marcas_modificacion'
+    
+    nombre = db.Column(db.String(50), primary_key=True)
+    version = db.Column(db.BigInteger, nullable=False, default=0)
+    fecha_modificacion = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    
+    def __repr__(self):
+        return f'<MarcaModificacion {self.nombre} v{self.version}>'
+
+# La fila de cada marca existe desde que se crea la tabla; así tocarla siempre
+# es un UPDATE y no hay carrera entre dos primeras escrituras
+event.listen(MarcaModificacion.__table__, 'after_create', DDL(
+    "INSERT INTO marcas_modificacion (nombre, version, fecha_modificacion) "
+    "VALUES ('dashboard', 0, CURRENT_TIMESTAMP)"
+))
+
+# Documentos y evidencias, direccionados por el SHA-256 de su contenido (ver
+# documentos.py). documento_1/documento_2 de AccionPreventiva y
+# evidencia_documento de SeguimientoAccion guardan el sha256.
+class Documento(db.Model):
+    __tablename__ = 'documentos'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    sha256 = db.Column(db.String(64), unique=True, nullable=False)
+    tamano = db.Column(db.BigInteger, nullable=False)
+    tipo_mime = db.Column(db.String(100), nullable=False, default='application/octet-stream')
+    nombre_original = db.Column(db.String(255), nullable=True)  # el de la primera carga
+    clave = db.Column(db.String(255), nullable=False)  # ubicación en el almacén
+    miniatura = db.Column(db.String(255), nullable=True)  # clave de la miniatura (imágenes)
+    
+    # Auditoría
+    usuario_id = db.Column(db.Integer, db.ForeignKey('usuarios.id'), nullable=True)
+    fecha_creacion = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'sha256': self.sha256,
+            'tamano': self.tamano,
+            'tipo_mime': self.tipo_mime,
+            'nombre_original': self.nombre_original,
+            'miniatura': bool(self.miniatura),
+            'fecha_creacion': self.fecha_creacion.isoformat() if self.fecha_creacion else None
+        }
+    
+    def __repr__(self):
+        return f'<Documento {self.sha256[:12]} {self.tamano} bytes>'
+
+# Carga por bloques en curso; el contenido parcial vive en el almacén
+class CargaDocumento(db.Model):
+    __tablename__ = 'cargas_documento'
+    __table_args__ = (
+        db.Index('ix_cargas_documento_actualizacion', 'fecha_actualizacion'),
+    )
+    
+    id = db.Column(db.String(32), primary_key=True)  # uuid4 hex
+    nombre = db.Column(db.String(255), nullable=True)
+    tipo_mime = db.Column(db.String(100), nullable=True)
+    tamano = db.Column(db.BigInteger, nullable=True)  # total anunciado por el cliente
+    recibido = db.Column(db.BigInteger, nullable=False, default=0)
+    usuario_id = db.Column(db.Integer, db.ForeignKey('usuarios.id'), nullable=False)
+    fecha_creacion = db.Column(db.DateTime, default=datetime.utcnow)
+    fecha_actualizacion = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'nombre': self.nombre,
+            'tamano': self.tamano,
+            'recibido': self.recibido
+        }
@@ -0,0 +1,73 @@
+"""
+Perfiles de carga anticipada (eager loading) para las consultas de la app.
+
+Las relaciones de models.py son lazy=True: cada acceso a accion.usuario o a
+accion.seguimientos dentro de un ciclo dispara su propio SELECT. Cada perfil
+indica qué relaciones traer junto con la consulta principal:
+
+- 'listado': lo que muestran las tablas y to_dict() (JOIN de muchos-a-uno).
+- 'detalle': además, las colecciones de la vista de detalle (selectinload,
+  un SELECT ... IN por colección sin importar cuántas filas haya).
+- 'exportacion': solo las columnas relacionadas que se exportan.
+"""
+from functools import lru_cache
+
+from sqlalchemy.orm import joinedload, selectinload, configure_mappers
+
+from models import AccionPreventiva, SeguimientoAccion, ReporteAccionPreventiva, ReporteTipoAtencion
+
+
+@lru_cache(maxsize=None)
+def _perfiles():
+    # Las relaciones declaradas con backref existen hasta que se configuran los mappers
+    configure_mappers()
+
+    return {
+        AccionPreventiva: {
+            'listado': (
+                joinedload(AccionPreventiva.usuario),
+            ),
+            'detalle': (
+                joinedload(AccionPreventiva.usuario),
+                selectinload(AccionPreventiva.seguimientos).joinedload(SeguimientoAccion.usuario),
+            ),
+            'exportacion': (
+                joinedload(AccionPreventiva.usuario),
+            ),
+        },
+        ReporteAccionPreventiva: {
+            'listado': (
+                joinedload(ReporteAccionPreventiva.tipo_reporte),
+                joinedload(ReporteAccionPreventiva.oficina_regional),
+                joinedload(ReporteAccionPreventiva.estatus_actual),
+            ),
+            'detalle': (
+                joinedload(ReporteAccionPreventiva.tipo_reporte),
+                joinedload(ReporteAccionPreventiva.oficina_regional),
+                joinedload(ReporteAccionPreventiva.estatus_actual),
+                joinedload(ReporteAccionPreventiva.responsable_captura),
+                joinedload(ReporteAccionPreventiva.entidad_federativa),
+                joinedload(ReporteAccionPreventiva.municipio),
+                joinedload(ReporteAccionPreventiva.actor_interno),
+                selectinload(ReporteAccionPreventiva.reporte_tipos_atencion).joinedload(ReporteTipoAtencion.tipo_atencion),
+                selectinload(ReporteAccionPreventiva.seguimientos),
+            ),
+            'exportacion': (
+                joinedload(ReporteAccionPreventiva.tipo_reporte),
+                joinedload(ReporteAccionPreventiva.oficina_regional),
+                joinedload(ReporteAccionPreventiva.estatus_actual),
+                joinedload(ReporteAccionPreventiva.responsable_captura),
+                joinedload(ReporteAccionPreventiva.entidad_federativa),
+                joinedload(ReporteAccionPreventiva.municipio),
+                joinedload(ReporteAccionPreventiva.actor_interno),
+                joinedload(ReporteAccionPreventiva.tipo_problematica),
+                joinedload(ReporteAccionPreventiva.grado_clasificacion),
+                joinedload(ReporteAccionPreventiva.grado_probabilidad),
+            ),
+        },
+    }
+
+
+def opciones(modelo, perfil):
+    """Opciones de carga del perfil para usar con query.options(*opciones(...))"""
+    return _perfiles()[modelo][perfil]
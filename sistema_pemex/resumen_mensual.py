@@ -0,0 +1,175 @@
+"""
+Resumen mensual materializado de acciones preventivas.
+
+La tabla acciones_resumen_mensual guarda un contador por
+(año, mes, región, estado_accion, nivel_impacto). Se actualiza de forma
+incremental dentro de la misma transacción que crea o cambia de estado una
+acción, de modo que las gráficas de tendencia leen N meses con una sola
+consulta por rango sin volver a recorrer acciones_preventivas.
+
+Los contadores se incrementan con UPDATE total = total + delta. Si la
+clave aún no existe se inserta dentro de un savepoint; si otra transacción
+la creó al mismo tiempo, el índice único lo detecta y se reintenta el
+UPDATE (igual que folios.reservar), sin revertir la operación del usuario.
+"""
+from datetime import date
+
+from dateutil.relativedelta import relativedelta
+from sqlalchemy import bindparam, func, insert, tuple_, update
+from sqlalchemy.exc import IntegrityError
+
+from models import db, AccionPreventiva, ResumenMensualAccion
+
+
+def _sumar(clave, delta):
+    """Suma `delta` al contador de `clave` creándolo si no existe"""
+    condicion = [getattr(ResumenMensualAccion, campo) == valor for campo, valor in clave.items()]
+    for _ in range(3):
+        resultado = db.session.execute(
+            update(ResumenMensualAccion)
+            .where(*condicion)
+            .values(total=ResumenMensualAccion.total + delta)
+            .execution_options(synchronize_session=False)
+        )
+        if resultado.rowcount:
+            return
+        try:
+            with db.session.begin_nested():
+                db.session.add(ResumenMensualAccion(total=delta, **clave))
+            return
+        except IntegrityError:
+            continue
+
+    raise RuntimeError(f'No se pudo actualizar el resumen mensual {clave}')
+
+
+def registrar_movimiento(fecha_registro, region, estado_accion, nivel_impacto, delta=1):
+    """Suma `delta` al contador del mes de la acción; debe llamarse antes del commit"""
+    _sumar(dict(
+        anio=fecha_registro.year,
+        mes=fecha_registro.month,
+        region=region or '',
+        estado_accion=estado_accion or '',
+        nivel_impacto=nivel_impacto or ''
+    ), delta)
+
+
+def registrar_movimientos(conteo):
+    """
+    Versión por lotes de registrar_movimiento() para cargas masivas: `conteo`
+    mapea (fecha, región, estado, impacto) -> delta. Lee en una sola consulta
+    los contadores existentes del rango de meses afectado.
+    """
+    deltas = {}
+    for (fecha_registro, region, estado_accion, nivel_impacto), delta in conteo.items():
+        clave = (fecha_registro.year, fecha_registro.month, region or '', estado_accion or '', nivel_impacto or '')
+        deltas[clave] = deltas.get(clave, 0) + delta
+    if not deltas:
+        return
+
+    periodo = tuple_(ResumenMensualAccion.anio, ResumenMensualAccion.mes)
+    existentes = ResumenMensualAccion.query.filter(
+        periodo >= min(deltas)[:2], periodo <= max(deltas)[:2]
+    ).with_for_update().all()
+
+    # Un solo executemany para los contadores existentes
+    incrementos = []
+    for fila in existentes:
+        clave = (fila.anio, fila.mes, fila.region, fila.estado_accion, fila.nivel_impacto)
+        if clave in deltas:
+            incrementos.append({'fila_id': fila.id, 'delta': deltas.pop(clave)})
+    if incrementos:
+        db.session.execute(
+            update(ResumenMensualAccion.__table__)
+            .where(ResumenMensualAccion.id == bindparam('fila_id'))
+            .values(total=ResumenMensualAccion.total + bindparam('delta')),
+            incrementos
+        )
+
+    if not deltas:
+        return
+    # Las claves nuevas se insertan juntas; si otra transacción creó alguna
+    # mientras tanto, se suman una por una
+    nuevas = [dict(anio=anio, mes=mes, region=region, estado_accion=estado, nivel_impacto=impacto)
+              for anio, mes, region, estado, impacto in deltas]
+    try:
+        with db.session.begin_nested():
+            db.session.execute(insert(ResumenMensualAccion.__table__),
+                               [dict(clave, total=delta) for clave, delta in zip(nuevas, deltas.values())])
+    except IntegrityError:
+        for clave, delta in zip(nuevas, deltas.values()):
+            _sumar(clave, delta)
+
+
+def registrar_alta(accion):
+    """Cuenta una acción recién creada en su mes de registro"""
+    registrar_movimiento(accion.fecha_registro, accion.region,
+                         accion.estado_accion, accion.nivel_impacto, 1)
+
+
+def registrar_cambio_estado(accion, estado_anterior):
+    """Mueve una acción de su estado anterior al estado actual dentro de su mes"""
+    if estado_anterior == accion.estado_accion:
+        return
+    registrar_movimiento(accion.fecha_registro, accion.region,
+                         estado_anterior, accion.nivel_impacto, -1)
+    registrar_movimiento(accion.fecha_registro, accion.region,
+                         accion.estado_accion, accion.nivel_impacto, 1)
+
+
+def acciones_por_mes(meses=6, hoy=None):
+    """
+    Total de acciones registradas por mes para los últimos `meses` meses,
+    del mes en curso hacia atrás, con etiquetas '%b %Y'.
+    """
+    hoy = hoy or date.today()
+    inicio = hoy.replace(day=1) - relativedelta(months=meses - 1)
+
+    filas = db.session.query(
+        ResumenMensualAccion.anio,
+        ResumenMensualAccion.mes,
+        func.sum(ResumenMensualAccion.total)
+    ).filter(
+        tuple_(ResumenMensualAccion.anio, ResumenMensualAccion.mes) >= (inicio.year, inicio.month),
+        tuple_(ResumenMensualAccion.anio, ResumenMensualAccion.mes) <= (hoy.year, hoy.month)
+    ).group_by(ResumenMensualAccion.anio, ResumenMensualAccion.mes).all()
+
+    totales = {(anio, mes): int(total or 0) for anio, mes, total in filas}
+
+    resultado = {}
+    for i in range(meses):
+        fecha = hoy - relativedelta(months=i)
+        resultado[fecha.strftime('%b %Y')] = totales.get((fecha.year, fecha.month), 0)
+    return resultado
+
+
+def reconstruir_resumen():
+    """Recalcula la tabla completa a partir del histórico de acciones_preventivas"""
+    anio = func.extract('year', AccionPreventiva.fecha_registro)
+    mes = func.extract('month', AccionPreventiva.fecha_registro)
+
+    filas = db.session.query(
+        anio, mes,
+        AccionPreventiva.region,
+        AccionPreventiva.estado_accion,
+        AccionPreventiva.nivel_impacto,
+        func.count(AccionPreventiva.id)
+    ).group_by(
+        anio, mes,
+        AccionPreventiva.region,
+        AccionPreventiva.estado_accion,
+        AccionPreventiva.nivel_impacto
+    ).all()
+
+    db.session.query(ResumenMensualAccion).delete()
+    db.session.bulk_insert_mappings(ResumenMensualAccion, [{
+        'anio': int(fila[0]),
+        'mes': int(fila[1]),
+        'region': fila[2] or '',
+        'estado_accion': fila[3] or '',
+        'nivel_impacto': fila[4] or '',
+        'total': fila[5]
+    } for fila in filas])
+    db.session.commit()
+
+    return len(filas)
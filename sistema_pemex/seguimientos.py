@@ -0,0 +1,130 @@
+"""
+Registro de seguimientos de acciones preventivas por lotes.
+
+En la ronda mensual de avance un supervisor actualiza decenas de acciones a
+la vez. registrar_lote() valida cada elemento en memoria, carga todas las
+acciones de destino con una sola consulta IN, inserta los seguimientos con
+bulk_insert_mappings, aplica estado y porcentaje con bulk_update_mappings
+(un executemany cada uno) y confirma una sola vez. Los elementos inválidos
+se reportan individualmente sin impedir que se registren los demás.
+"""
+from collections import Counter
+from datetime import date, datetime
+
+from models import db, AccionPreventiva, SeguimientoAccion
+import resumen_mensual
+import marcas
+import cache_respuestas
+
+MAX_LOTE = 500
+CAMPOS_REQUERIDOS = ('accion_id', 'fecha_seguimiento', 'estado_nuevo', 'porcentaje_avance', 'responsable')
+
+
+class ErrorSeguimiento(ValueError):
+    """Error de validación de un elemento del lote"""
+
+
+def _validar(elemento):
+    """Convierte un elemento del lote a los valores de SeguimientoAccion"""
+    if not isinstance(elemento, dict):
+        raise ErrorSeguimiento('El elemento debe ser un objeto')
+    faltantes = [campo for campo in CAMPOS_REQUERIDOS if elemento.get(campo) in (None, '')]
+    if faltantes:
+        raise ErrorSeguimiento(f"Campos requeridos: {', '.join(faltantes)}")
+
+    try:
+        accion_id = int(elemento['accion_id'])
+    except (TypeError, ValueError):
+        raise ErrorSeguimiento('ID de acción inválido')
+    try:
+        fecha = datetime.strptime(str(elemento['fecha_seguimiento']), '%Y-%m-%d').date()
+    except ValueError:
+        raise ErrorSeguimiento('Fecha de seguimiento inválida, se espera AAAA-MM-DD')
+    try:
+        porcentaje = int(elemento['porcentaje_avance'])
+    except (TypeError, ValueError):
+        raise ErrorSeguimiento('Porcentaje de avance inválido')
+    if not 0 <= porcentaje <= 100:
+        raise ErrorSeguimiento('El porcentaje de avance debe estar entre 0 y 100')
+
+    return {
+        'accion_id': accion_id,
+        'fecha_seguimiento': fecha,
+        'estado_anterior': elemento.get('estado_anterior'),
+        'estado_nuevo': str(elemento['estado_nuevo']),
+        'porcentaje_avance': porcentaje,
+        'observaciones': elemento.get('observaciones', ''),
+        'responsable': str(elemento['responsable']),
+    }
+
+
+def registrar_lote(elementos, usuario_id):
+    """
+    Registra los seguimientos de `elementos` en una sola transacción y
+    regresa un resultado por elemento, en el mismo orden:
+    {'indice', 'accion_id', 'success', 'error'?}.
+    """
+    resultados = [None] * len(elementos)
+    validos = []
+    for indice, elemento in enumerate(elementos):
+        try:
+            validos.append((indice, _validar(elemento)))
+        except ErrorSeguimiento as e:
+            accion_id = elemento.get('accion_id') if isinstance(elemento, dict) else None
+            resultados[indice] = {'indice': indice, 'accion_id': accion_id, 'success': False, 'error': str(e)}
+
+    # Una sola consulta para todas las acciones de destino. Las filas quedan
+    # bloqueadas hasta el commit para que los deltas del resumen mensual
+    # partan del estado que se va a sobrescribir; se bloquean en orden de id
+    # para no entrar en deadlock con otro lote
+    ids = {valores['accion_id'] for _, valores in validos}
+    acciones = {}
+    if ids:
+        acciones = {fila.id: fila for fila in db.session.query(
+            AccionPreventiva.id, AccionPreventiva.estado_accion, AccionPreventiva.fecha_registro,
+            AccionPreventiva.region, AccionPreventiva.nivel_impacto
+        ).filter(AccionPreventiva.id.in_(ids)).order_by(AccionPreventiva.id).with_for_update()}
+
+    seguimientos = []
+    estado_actual = {}
+    actualizaciones = {}
+    hoy = date.today()
+    for indice, valores in validos:
+        accion = acciones.get(valores['accion_id'])
+        if not accion:
+            resultados[indice] = {'indice': indice, 'accion_id': valores['accion_id'],
+                                  'success': False, 'error': 'Acción no encontrada'}
+            continue
+
+        # Si una acción aparece más de una vez, cada seguimiento parte del anterior
+        previo = estado_actual.get(accion.id, accion.estado_accion)
+        if not valores['estado_anterior']:
+            valores['estado_anterior'] = previo
+        valores['usuario_id'] = usuario_id
+        seguimientos.append(valores)
+
+        estado_actual[accion.id] = valores['estado_nuevo']
+        actualizaciones[accion.id] = {
+            'id': accion.id,
+            'estado_accion': valores['estado_nuevo'],
+            'porcentaje_avance': valores['porcentaje_avance'],
+            'fecha_ultima_actualizacion': hoy,
+        }
+        resultados[indice] = {'indice': indice, 'accion_id': accion.id, 'success': True}
+
+    if seguimientos:
+        conteo = Counter()
+        for accion_id, estado_nuevo in estado_actual.items():
+            accion = acciones[accion_id]
+            if estado_nuevo != accion.estado_accion:
+                conteo[(accion.fecha_registro, accion.region, accion.estado_accion, accion.nivel_impacto)] -= 1
+                conteo[(accion.fecha_registro, accion.region, estado_nuevo, accion.nivel_impacto)] += 1
+
+        db.session.bulk_insert_mappings(SeguimientoAccion, seguimientos)
+        db.session.bulk_update_mappings(AccionPreventiva, list(actualizaciones.values()))
+        resumen_mensual.registrar_movimientos(conteo)
+        marcas.tocar()
+        cache_respuestas.etiquetar('dashboard', *(f'accion:{accion_id}' for accion_id in actualizaciones))
+        db.session.commit()
+
+    return resultados
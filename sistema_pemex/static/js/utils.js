@@ -153,7 +153,7 @@ const Utils = {
         };
         
         if (tipoReporte && oficinaRegional) {
-            return `${oficinasAbrev[oficinaRegional]}-${tiposAbrev[tipoReporte]}-XXX`;
+            return `${oficinasAbrev[oficinaRegional]}-${tiposAbrev[tipoReporte]}-${new Date().getFullYear()}-XXX`;
         }
         return '';
     },
@@ -0,0 +1,123 @@
+"""
+Tipos de atención de los reportes.
+
+reporte_tipo_atencion es la fuente de verdad: las búsquedas por tipo usan su
+índice (tipo_atencion_id, reporte_id) en lugar de recorrer los reportes y
+hacer json.loads de ReporteAccionPreventiva.tipos_atencion. La columna JSON
+se sigue escribiendo con los mismos ids para las pantallas y exportaciones
+que la leen.
+
+asignar() escribe ambas cosas. Si algún código cambia directamente la
+columna JSON de un reporte existente, un evento after_flush reemplaza sus
+filas en la tabla de relación en la misma transacción. Las cargas masivas
+(importacion, datos_sinteticos) ya insertan las filas de relación con
+executemany. migrar() llena la tabla para los reportes capturados antes de
+que existiera.
+"""
+import json
+
+from sqlalchemy import event, select, delete, insert, exists, inspect as sa_inspect
+from sqlalchemy.orm import Session
+
+from models import db, ReporteAccionPreventiva, ReporteTipoAtencion, TipoAtencion
+import perfiles_carga
+
+LOTE_MIGRACION = 10000
+LIMITE_DEFAULT = 50
+LIMITE_MAXIMO = 200
+
+
+def ids_de_json(texto):
+    """Ids enteros del JSON de tipos_atencion, sin repetidos; [] si no es válido"""
+    if not texto:
+        return []
+    try:
+        datos = json.loads(texto)
+    except ValueError:
+        return []
+    if not isinstance(datos, list):
+        datos = [datos]
+    ids = []
+    for valor in datos:
+        try:
+            valor = int(valor)
+        except (TypeError, ValueError):
+            continue
+        if valor not in ids:
+            ids.append(valor)
+    return ids
+
+
+def asignar(reporte, ids):
+    """Fija los tipos de atención del reporte en la tabla de relación y en la columna JSON"""
+    ids = list(dict.fromkeys(int(i) for i in ids))
+    reporte.tipos_atencion = json.dumps(ids)
+    if sa_inspect(reporte).persistent:
+        # El evento after_flush reemplaza las filas de relación del reporte
+        return
+    reporte.reporte_tipos_atencion.extend(ReporteTipoAtencion(tipo_atencion_id=i) for i in ids)
+
+
+def _reemplazar(conexion, reportes):
+    """Reemplaza las filas de relación de [(reporte_id, ids)]"""
+    conexion.execute(delete(ReporteTipoAtencion)
+                     .where(ReporteTipoAtencion.reporte_id.in_([r for r, _ in reportes])))
+    filas = [{'reporte_id': reporte_id, 'tipo_atencion_id': i} for reporte_id, ids in reportes for i in ids]
+    if filas:
+        conexion.execute(insert(ReporteTipoAtencion), filas)
+
+
+@event.listens_for(Session, 'after_flush')
+def _sincronizar_tipos(session, flush_context):
+    cambiados = [(o.id, ids_de_json(o.tipos_atencion)) for o in session.dirty
+                 if isinstance(o, ReporteAccionPreventiva)
+                 and sa_inspect(o).attrs.tipos_atencion.history.has_changes()]
+    if cambiados:
+        _reemplazar(session.connection(), cambiados)
+
+
+def migrar(lote=LOTE_MIGRACION):
+    """
+    Inserta las filas de relación de los reportes que no tienen ninguna, a
+    partir de su columna JSON. Los ids que ya no existen en el catálogo se
+    omiten. Es idempotente; regresa el número de filas insertadas.
+    """
+    validos = set(db.session.scalars(select(TipoAtencion.id)))
+    sin_relacion = ~exists().where(ReporteTipoAtencion.reporte_id == ReporteAccionPreventiva.id)
+    total, ultimo = 0, 0
+    while True:
+        pagina = db.session.execute(
+            select(ReporteAccionPreventiva.id, ReporteAccionPreventiva.tipos_atencion)
+            .where(ReporteAccionPreventiva.id > ultimo, sin_relacion)
+            .order_by(ReporteAccionPreventiva.id).limit(lote)
+        ).all()
+        if not pagina:
+            break
+        filas = [{'reporte_id': reporte_id, 'tipo_atencion_id': i}
+                 for reporte_id, texto in pagina for i in ids_de_json(texto) if i in validos]
+        if filas:
+            db.session.execute(insert(ReporteTipoAtencion), filas)
+        db.session.commit()
+        total += len(filas)
+        ultimo = pagina[-1][0]
+    return total
+
+
+def reportes_por_tipo(tipo_atencion_id, cursor=None, limite=LIMITE_DEFAULT):
+    """
+    Regresa (reportes, siguiente_cursor) con el tipo de atención, del id más
+    reciente al más antiguo. El cursor es el último id de la página anterior.
+    """
+    limite = min(max(limite, 1), LIMITE_MAXIMO)
+    ids = select(ReporteTipoAtencion.reporte_id).where(ReporteTipoAtencion.tipo_atencion_id == tipo_atencion_id)
+    if cursor:
+        ids = ids.where(ReporteTipoAtencion.reporte_id < cursor)
+    # Se pide una fila extra para saber si existe una página siguiente
+    ids = db.session.scalars(ids.order_by(ReporteTipoAtencion.reporte_id.desc()).limit(limite + 1)).all()
+    siguiente = ids[limite - 1] if len(ids) > limite else None
+    ids = ids[:limite]
+
+    reportes = ReporteAccionPreventiva.query.options(
+        *perfiles_carga.opciones(ReporteAccionPreventiva, 'listado')
+    ).filter(ReporteAccionPreventiva.id.in_(ids)).order_by(ReporteAccionPreventiva.id.desc()).all() if ids else []
+    return reportes, siguiente
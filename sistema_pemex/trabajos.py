@@ -0,0 +1,413 @@
+"""
+Cola de trabajos en segundo plano respaldada por la tabla trabajos.
+
+Las rutas encolan el trabajo con encolar() y responden de inmediato con su
+id; un trabajador (`flask trabajador`) toma los pendientes y ejecuta la
+función registrada con @tarea. La toma es optimista y funciona igual en
+MySQL y SQLite: UPDATE ... WHERE id = :id AND estado = 'Pendiente', y solo
+el trabajador cuyo UPDATE afectó la fila ejecuta el trabajo, así que varios
+hilos o procesos (en uno o varios servidores) comparten la misma cola.
+
+Si la tarea lanza una excepción se reintenta con espera exponencial
+(REINTENTO_BASE * 2**(intento - 1) segundos, con variación aleatoria) hasta
+max_intentos. Mientras el trabajador vive actualiza el latido de sus
+trabajos; los que quedan En Proceso sin latido por más de VENCIMIENTO (el
+proceso murió) vuelven a la cola o se marcan como fallidos.
+
+Variables de entorno:
+    TRABAJOS_CONCURRENCIA   hilos o procesos del trabajador (2)
+    TRABAJOS_MODO           'hilos' o 'procesos' (hilos)
+    TRABAJOS_INTERVALO      segundos de espera con la cola vacía (2)
+    TRABAJOS_RETENCION_DIAS días que se conservan los trabajos terminados y
+                            sus archivos de exportación (7)
+    TRABAJOS_LOCAL          1 para arrancar el trabajador en hilos dentro del
+                            proceso web (desarrollo o un solo servidor)
+"""
+import json
+import logging
+import multiprocessing
+import os
+import random
+import socket
+import threading
+import time
+from datetime import date, datetime, timedelta
+
+from flask import current_app
+from sqlalchemy import update, select, delete
+from sqlalchemy.exc import SQLAlchemyError
+
+from models import db, Trabajo
+import busqueda
+import cumplimiento
+import documentos
+import exportacion
+import geoespacial
+import importacion
+import listado_acciones
+import resumen_mensual
+
+log = logging.getLogger('pemex.trabajos')
+
+REINTENTO_BASE = 30  # segundos
+REINTENTO_MAXIMO = 3600
+VENCIMIENTO = timedelta(minutes=10)
+INTERVALO_LATIDO = 30  # segundos
+INTERVALO_PURGA = 3600  # segundos
+LARGO_ERROR = 4000
+
+_tareas = {}
+
+
+def tarea(nombre, max_intentos=3):
+    """Registra la función que ejecuta los trabajos de tipo `nombre`"""
+    def registrar(funcion):
+        _tareas[nombre] = (funcion, max_intentos)
+        return funcion
+    return registrar
+
+
+def nombre_trabajador():
+    return f'{socket.gethostname()}:{os.getpid()}'
+
+
+def _configuracion(nombre, default, tipo=int):
+    return tipo(os.environ.get(nombre, default))
+
+
+# ========== COLA ==========
+
+def encolar(tipo, parametros=None, usuario_id=None, max_intentos=None, unico=False):
+    """
+    Crea el trabajo y hace commit. Con unico=True, si ya hay uno del mismo
+    tipo y parámetros pendiente o en proceso, regresa ese en lugar de duplicarlo.
+    """
+    if tipo not in _tareas:
+        raise ValueError(f'Tipo de trabajo no registrado: {tipo}')
+    parametros = json.dumps(parametros or {}, sort_keys=True, default=str)
+
+    if unico:
+        existente = Trabajo.query.filter(
+            Trabajo.tipo == tipo, Trabajo.parametros == parametros,
+            Trabajo.estado.in_(['Pendiente', 'En Proceso'])
+        ).first()
+        if existente:
+            return existente
+
+    trabajo = Trabajo(tipo=tipo, parametros=parametros, usuario_id=usuario_id,
+                      max_intentos=max_intentos or _tareas[tipo][1], disponible_en=datetime.utcnow())
+    db.session.add(trabajo)
+    db.session.commit()
+    return trabajo
+
+
+def tomar(trabajador):
+    """Toma el siguiente trabajo disponible (o regresa None) y hace commit"""
+    ahora = datetime.utcnow()
+    candidatos = db.session.execute(
+        select(Trabajo.id).where(Trabajo.estado == 'Pendiente', Trabajo.disponible_en <= ahora)
+        .order_by(Trabajo.disponible_en, Trabajo.id).limit(5)
+    ).scalars().all()
+    db.session.commit()
+
+    for trabajo_id in candidatos:
+        tomado = db.session.execute(
+            update(Trabajo).where(Trabajo.id == trabajo_id, Trabajo.estado == 'Pendiente').values(
+                estado='En Proceso', trabajador=trabajador, latido=ahora, fecha_inicio=ahora,
+                intentos=Trabajo.intentos + 1, porcentaje_avance=0, mensaje=None
+            ).execution_options(synchronize_session=False)
+        ).rowcount
+        db.session.commit()
+        if tomado:
+            return db.session.get(Trabajo, trabajo_id)
+    return None
+
+
+def _actualizar(trabajo_id, propietario, **valores):
+    """
+    UPDATE en una conexión propia (no toca la transacción de la tarea), solo
+    si el trabajo sigue en manos de `propietario`
+    """
+    with db.engine.begin() as conexion:
+        return conexion.execute(update(Trabajo).where(
+            Trabajo.id == trabajo_id, Trabajo.trabajador == propietario, Trabajo.estado == 'En Proceso'
+        ).values(**valores)).rowcount
+
+
+def espera_reintento(intento):
+    """Segundos antes del siguiente intento: exponencial con ±20 % de variación"""
+    espera = min(REINTENTO_BASE * 2 ** (intento - 1), REINTENTO_MAXIMO)
+    return espera * random.uniform(0.8, 1.2)
+
+
+class Contexto:
+    """Lo que recibe la tarea además de sus parámetros"""
+
+    def __init__(self, trabajo, trabajador):
+        self.id = trabajo.id
+        self.usuario_id = trabajo.usuario_id
+        self.intento = trabajo.intentos
+        self.trabajador = trabajador
+        self._ultimo_avance = 0.0
+
+    def avance(self, porcentaje=None, mensaje=None):
+        """Registra el avance a lo más una vez por segundo; porcentaje None solo cambia el mensaje"""
+        ahora = time.monotonic()
+        if ahora - self._ultimo_avance < 1:
+            return
+        self._ultimo_avance = ahora
+        valores = {'latido': datetime.utcnow(), 'mensaje': mensaje[:255] if mensaje else None}
+        if porcentaje is not None:
+            valores['porcentaje_avance'] = min(max(int(porcentaje), 0), 99)
+        try:
+            _actualizar(self.id, self.trabajador, **valores)
+        except SQLAlchemyError:
+            log.warning('No se pudo registrar el avance del trabajo %s', self.id, exc_info=True)
+
+
+def ejecutar(trabajo, trabajador):
+    """Ejecuta un trabajo ya tomado y registra el resultado o el fallo"""
+    funcion, _ = _tareas.get(trabajo.tipo, (None, None))
+    contexto = Contexto(trabajo, trabajador)
+    intentos, max_intentos = trabajo.intentos, trabajo.max_intentos
+    parametros = json.loads(trabajo.parametros)
+    db.session.commit()
+
+    # Las ediciones de la tarea se atribuyen en el historial a quien encoló el trabajo
+    db.session.info['usuario_id'] = contexto.usuario_id
+    try:
+        if funcion is None:
+            raise LookupError(f'Tipo de trabajo no registrado: {trabajo.tipo}')
+        resultado = funcion(contexto, **parametros)
+        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        log.exception('Falló el trabajo %s (%s), intento %s de %s', contexto.id, trabajo.tipo, intentos, max_intentos)
+        error = f'{type(e).__name__}: {e}'[:LARGO_ERROR]
+        if intentos < max_intentos:
+            _actualizar(contexto.id, trabajador, estado='Pendiente', trabajador=None, error=error,
+                        disponible_en=datetime.utcnow() + timedelta(seconds=espera_reintento(intentos)))
+        else:
+            _actualizar(contexto.id, trabajador, estado='Fallido', error=error, fecha_fin=datetime.utcnow())
+        return False
+    finally:
+        # La sesión del hilo se reutiliza para el siguiente trabajo
+        db.session.info.pop('usuario_id', None)
+
+    _actualizar(contexto.id, trabajador, estado='Completado', porcentaje_avance=100, mensaje=None, error=None,
+                resultado=json.dumps(resultado, default=str), fecha_fin=datetime.utcnow())
+    return True
+
+
+def latido(trabajador):
+    """Renueva el latido de los trabajos en proceso de este trabajador"""
+    with db.engine.begin() as conexion:
+        conexion.execute(update(Trabajo).where(
+            Trabajo.trabajador == trabajador, Trabajo.estado == 'En Proceso'
+        ).values(latido=datetime.utcnow()))
+
+
+def recuperar_vencidos():
+    """Regresa a la cola (o marca como fallidos) los trabajos cuyo trabajador dejó de dar latido"""
+    limite = datetime.utcnow() - VENCIMIENTO
+    with db.engine.begin() as conexion:
+        vencidos = conexion.execute(update(Trabajo).where(
+            Trabajo.estado == 'En Proceso', Trabajo.latido < limite, Trabajo.intentos < Trabajo.max_intentos
+        ).values(estado='Pendiente', trabajador=None, disponible_en=datetime.utcnow(),
+                 error='El trabajador dejó de responder')).rowcount
+        fallidos = conexion.execute(update(Trabajo).where(
+            Trabajo.estado == 'En Proceso', Trabajo.latido < limite
+        ).values(estado='Fallido', fecha_fin=datetime.utcnow(),
+                 error='El trabajador dejó de responder')).rowcount
+    return vencidos + fallidos
+
+
+def purgar(dias=None):
+    """Borra los trabajos terminados hace más de `dias` días y sus archivos"""
+    dias = dias if dias is not None else _configuracion('TRABAJOS_RETENCION_DIAS', 7)
+    limite = datetime.utcnow() - timedelta(days=dias)
+    terminados = Trabajo.estado.in_(['Completado', 'Fallido'])
+    for (resultado,) in db.session.query(Trabajo.resultado).filter(
+        terminados, Trabajo.fecha_fin < limite, Trabajo.tipo.like('exportar_%')
+    ):
+        archivo = json.loads(resultado or '{}').get('archivo')
+        if archivo:
+            try:
+                os.remove(os.path.join(current_app.config['EXPORTACIONES_DIR'], archivo))
+            except OSError:
+                pass
+    borrados = db.session.execute(delete(Trabajo).where(terminados, Trabajo.fecha_fin < limite)).rowcount
+    db.session.commit()
+    return borrados
+
+
+# ========== TRABAJADOR ==========
+
+def _bucle(app, intervalo, parar, agotar):
+    """Un hilo del trabajador: toma y ejecuta trabajos hasta que se pida parar"""
+    trabajador = nombre_trabajador()
+    while not parar.is_set():
+        trabajo = None
+        with app.app_context():
+            try:
+                trabajo = tomar(trabajador)
+                if trabajo:
+                    ejecutar(trabajo, trabajador)
+            except Exception:
+                # El hilo sigue vivo; el trabajo, si quedó En Proceso, se recupera por vencimiento
+                log.exception('Error en el trabajador')
+            finally:
+                db.session.remove()
+        if trabajo is None:
+            if agotar:
+                return
+            parar.wait(intervalo)
+
+
+def _mantenimiento(app, parar):
+    """Latido, recuperación de vencidos y purga periódica"""
+    ultima_purga = 0.0
+    while not parar.wait(INTERVALO_LATIDO):
+        with app.app_context():
+            try:
+                latido(nombre_trabajador())
+                recuperar_vencidos()
+                if time.monotonic() - ultima_purga > INTERVALO_PURGA:
+                    purgar()
+                    documentos.purgar_cargas()
+                    ultima_purga = time.monotonic()
+            except SQLAlchemyError:
+                log.exception('Error en el mantenimiento de la cola de trabajos')
+            finally:
+                db.session.remove()
+
+
+def _proceso(intervalo, agotar):
+    """Punto de entrada de cada proceso en modo 'procesos'"""
+    from app import app
+    with app.app_context():
+        # Las conexiones heredadas del proceso padre no se comparten
+        db.engine.dispose(close=False)
+    ejecutar_trabajador(app, concurrencia=1, modo='hilos', intervalo=intervalo, agotar=agotar)
+
+
+def ejecutar_trabajador(app, concurrencia=None, modo=None, intervalo=None, agotar=False, parar=None):
+    """
+    Corre el trabajador hasta Ctrl+C o hasta `parar`; con agotar=True
+    termina cuando la cola queda vacía. En modo 'hilos' usa `concurrencia`
+    hilos en este proceso; en modo 'procesos', `concurrencia` procesos con
+    un hilo cada uno (para tareas que usan mucho CPU).
+    """
+    concurrencia = concurrencia or _configuracion('TRABAJOS_CONCURRENCIA', 2)
+    modo = modo or os.environ.get('TRABAJOS_MODO', 'hilos')
+    intervalo = intervalo if intervalo is not None else _configuracion('TRABAJOS_INTERVALO', 2, float)
+
+    if modo == 'procesos':
+        procesos = [multiprocessing.Process(target=_proceso, args=(intervalo, agotar), name=f'trabajador-{i}')
+                    for i in range(concurrencia)]
+        for proceso in procesos:
+            proceso.start()
+        try:
+            for proceso in procesos:
+                proceso.join()
+        except KeyboardInterrupt:
+            for proceso in procesos:
+                proceso.join(30)
+        return
+
+    parar = parar or threading.Event()
+    hilos = [threading.Thread(target=_bucle, args=(app, intervalo, parar, agotar), name=f'trabajador-{i}', daemon=True)
+             for i in range(concurrencia)]
+    for hilo in hilos:
+        hilo.start()
+    threading.Thread(target=_mantenimiento, args=(app, parar), name='trabajador-mantenimiento', daemon=True).start()
+    try:
+        while any(hilo.is_alive() for hilo in hilos):
+            for hilo in hilos:
+                hilo.join(0.5)
+    except KeyboardInterrupt:
+        # Los trabajos en curso terminan; no se toman nuevos
+        parar.set()
+        for hilo in hilos:
+            hilo.join()
+    parar.set()
+
+
+def init_app(app):
+    """Arranca un trabajador en hilos dentro del proceso web si TRABAJOS_LOCAL está activo"""
+    app.config.setdefault('EXPORTACIONES_DIR', os.environ.get(
+        'EXPORTACIONES_DIR', os.path.join(app.instance_path, 'exportaciones')))
+    if os.environ.get('TRABAJOS_LOCAL', '').strip().lower() not in ('1', 'true', 'si', 'sí'):
+        return
+    threading.Thread(target=ejecutar_trabajador, args=(app,), kwargs={'modo': 'hilos'},
+                     name='trabajador-local', daemon=True).start()
+
+
+# ========== TAREAS ==========
+
+def _exportar(contexto, consulta, columnas, nombre, formato):
+    """Escribe la exportación en EXPORTACIONES_DIR y regresa el nombre del archivo"""
+    total = consulta.order_by(None).count()
+    directorio = current_app.config['EXPORTACIONES_DIR']
+    os.makedirs(directorio, exist_ok=True)
+    archivo = f"{nombre}_{date.today().strftime('%Y%m%d')}_{contexto.id}.{formato}"
+    ruta = os.path.join(directorio, archivo)
+
+    def con_avance(renglones):
+        for i, renglon in enumerate(renglones):
+            if i % exportacion.LOTE == 0:
+                contexto.avance(i * 100 / (total + 1), f'{i} de {total} registros')
+            yield renglon
+
+    renglones = con_avance(exportacion.filas(consulta, columnas))
+    cuerpo = exportacion.generar_xlsx(renglones, nombre) if formato == 'xlsx' else exportacion.generar_csv(renglones)
+    with open(ruta + '.parcial', 'wb') as salida:
+        for bloque in cuerpo:
+            salida.write(bloque.encode('utf-8') if isinstance(bloque, str) else bloque)
+    os.replace(ruta + '.parcial', ruta)
+    return {'archivo': archivo, 'formato': formato, 'registros': total}
+
+
+@tarea('exportar_acciones')
+def _exportar_acciones(contexto, filtros=None, formato='csv'):
+    consulta = exportacion.consulta_acciones(
+        listado_acciones.consulta_filtrada(listado_acciones.filtros_desde_args(filtros or {}))
+    )
+    return _exportar(contexto, consulta, exportacion.COLUMNAS_ACCIONES, 'acciones_preventivas', formato)
+
+
+@tarea('exportar_reportes')
+def _exportar_reportes(contexto, formato='csv'):
+    return _exportar(contexto, exportacion.consulta_reportes(), exportacion.COLUMNAS_REPORTES, 'reportes', formato)
+
+
+@tarea('importar')
+def _importar(contexto, ruta, tipo, usuario_id, lote=importacion.LOTE_DEFAULT):
+    # Un reintento continúa desde el checkpoint del intento anterior
+    resultado = importacion.importar(
+        ruta, tipo, usuario_id, lote=lote, reanudar=True,
+        progreso=lambda fila: contexto.avance(None, f'{fila} filas procesadas')
+    )
+    os.remove(ruta)
+    resultado['errores'] = resultado['errores'][:importacion.MAX_ERRORES_RESPUESTA]
+    return resultado
+
+
+# Índices y resúmenes que se pueden regenerar en segundo plano
+RECONSTRUCCIONES = {
+    'resumen_mensual': resumen_mensual.reconstruir_resumen,
+    'busqueda': busqueda.reconstruir,
+    'ubicaciones': geoespacial.reconstruir,
+    'avances': cumplimiento.reconstruir,
+}
+
+
+@tarea('reconstruir', max_intentos=2)
+def _reconstruir(contexto, indice):
+    contexto.avance(None, f'Reconstruyendo {indice}')
+    return {'indice': indice, 'filas': RECONSTRUCCIONES[indice]()}
+
+
+@tarea('miniatura', max_intentos=2)
+def _miniatura(contexto, documento_id):
+    return {'documento_id': documento_id, 'miniatura': documentos.generar_miniatura(documento_id)}